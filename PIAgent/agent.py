@@ -1,6 +1,7 @@
 from google.adk.agents import Agent
 from .shared_libraries import constants
 from .prompts import root_prompt_text
+from .utils import compaction, context_cache, prefetch
 # Import the sub-agents
 from .sub_agents.onboarding_agent.agent import onboarding_agent
 from .sub_agents.comparision_agent.agent import comparision_agent # Import the comparison agent
@@ -15,5 +16,11 @@ root_agent = Agent(
         onboarding_agent,
         comparision_agent, # Add the comparison agent as a sub-agent
         business_analyst_agent,
-    ]
+    ],
+    # Re-warm the business the session already knows at the start of each turn.
+    before_agent_callback=prefetch.before_agent_callback,
+    # Long conversations reach the model as a rolling summary plus the latest turns; the instruction,
+    # tools and finished turns are then sent as Gemini cached content.
+    before_model_callback=[compaction.before_model_callback, context_cache.before_model_callback],
+    after_model_callback=context_cache.after_model_callback,
 )
\ No newline at end of file
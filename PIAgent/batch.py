@@ -0,0 +1,337 @@
+"""
+Nightly analytics for every business.
+
+Chat questions are answered one conversation at a time, and the expensive
+ones (forecasts, LLM reports) pay their full cost while the owner waits.
+This batch runs them ahead of time for all businesses in the `business`
+table. The tools store what they compute in `utils.insights`, keyed by the
+sales data watermark, so during the day the same questions are answered
+from the store until new sales arrive.
+
+Stages, in the order each business runs them:
+- reviews:   refresh Google Maps reviews of the business and its competitors,
+- rollups:   unfiltered sales totals by weekday, hour, item and category,
+- forecasts: the default 14-day sales forecast,
+- report:    the 30-day sales trends report and the business health report.
+
+Businesses are spread over a process pool. Each stage also has its own
+concurrency limit across all processes (`constants.BATCH_STAGE_CONCURRENCY`),
+so e.g. only two businesses call Gemini for reports at a time while
+rollups run on every process.
+
+Results the store already holds for a business's current data are not
+regenerated (a business without new sales costs no Gemini calls); `--force`
+recomputes everything.
+
+Every (business, stage) result is checkpointed in a SQLite file
+(`constants.BATCH_DB_PATH`). `--resume` picks a run up where it stopped:
+finished stages are skipped, failed and unfinished ones are run again.
+
+    python -m PIAgent.batch                              # all businesses, all stages
+    python -m PIAgent.batch --stages rollups,forecasts   # only some stages
+    python -m PIAgent.batch --business biz_1 --business biz_2
+    python -m PIAgent.batch --limit report=1 --processes 4
+    python -m PIAgent.batch --force                      # regenerate even for unchanged data
+    python -m PIAgent.batch --resume                     # continue the latest run
+    python -m PIAgent.batch --resume run_20250601_0200
+"""
+
+import argparse
+import contextlib
+import datetime
+import json
+import multiprocessing
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+
+from .shared_libraries import constants
+from .utils import insights
+from .utils.tracing import span
+
+STAGES = ("reviews", "rollups", "forecasts", "report")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS batch_runs (
+    run_id TEXT PRIMARY KEY,
+    stages TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    finished_at TEXT
+);
+CREATE TABLE IF NOT EXISTS batch_tasks (
+    run_id TEXT NOT NULL,
+    business_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    duration_ms REAL,
+    error TEXT,
+    finished_at TEXT,
+    PRIMARY KEY (run_id, business_id, stage)
+);
+"""
+
+# Per-stage semaphores of this process, shared with the other workers (see _init_worker).
+_stage_slots: Dict[str, Any] = {}
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+@contextlib.contextmanager
+def _connect():
+    connection = sqlite3.connect(constants.BATCH_DB_PATH, timeout=60, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    try:
+        yield connection
+    finally:
+        connection.close()
+
+
+# --- Stages ---
+
+def _stage_reviews(business_id: str, run_id: str) -> Dict[str, Any]:
+    from .sub_agents.comparision_agent.tools import _collect_and_store_reviews, db_get_competitors
+    competitor_ids = [c["competitor_id"] for c in db_get_competitors(business_id) if c.get("competitor_id")]
+    if not _collect_and_store_reviews(business_id, competitor_ids):
+        raise RuntimeError("Review collection failed (no Google Place ID or details for the business).")
+    return {"competitors": len(competitor_ids)}
+
+
+def _stage_rollups(business_id: str, run_id: str) -> Dict[str, Any]:
+    from .sub_agents.business_analyst_agent import tools as analyst
+    stored = 0
+    for dimension in analyst.ROLLUP_GROUP_BY:
+        for measure in analyst.ROLLUP_MEASURES:
+            result = analyst.agent_query_sales(business_id, group_by=dimension, measure=measure)
+            if "error" in result:
+                raise RuntimeError(result["error"])
+            stored += 1
+    return {"rollups": stored}
+
+
+def _stage_forecasts(business_id: str, run_id: str) -> Dict[str, Any]:
+    from .sub_agents.business_analyst_agent import tools as analyst
+    forecast = analyst.agent_forecast_sales(business_id)
+    if "error" in forecast:
+        raise RuntimeError(forecast["error"])
+    return {"items": len(forecast.get("items", []))}
+
+
+def _stage_report(business_id: str, run_id: str) -> Dict[str, Any]:
+    from .sub_agents.business_analyst_agent import tools as analyst
+    reports = {
+        "sales_trends_report": analyst.agent_analyze_sales_trends,
+        "health_report": analyst.agent_business_health_report,
+    }
+    for insight_type, tool in reports.items():
+        report = tool(business_id)
+        # These tools return their errors as text (and store only real reports).
+        if not report or report.startswith(("Error", "No ")):
+            raise RuntimeError(f"{insight_type}: {report}")
+    return {"reports": len(reports)}
+
+
+_STAGE_FUNCTIONS: Dict[str, Callable[[str, str], Dict[str, Any]]] = {
+    "reviews": _stage_reviews,
+    "rollups": _stage_rollups,
+    "forecasts": _stage_forecasts,
+    "report": _stage_report,
+}
+
+
+# --- Workers ---
+
+def _init_worker(stage_slots: Dict[str, Any]) -> None:
+    global _stage_slots
+    _stage_slots = stage_slots
+
+
+def _record(run_id: str, business_id: str, stage: str, status: str, duration_ms: float,
+            error: Optional[str] = None) -> None:
+    with _connect() as connection:
+        connection.execute(
+            "UPDATE batch_tasks SET status = ?, attempts = attempts + 1, duration_ms = ?, error = ?, finished_at = ? "
+            "WHERE run_id = ? AND business_id = ? AND stage = ?",
+            (status, round(duration_ms, 1), error, _now(), run_id, business_id, stage))
+
+
+def _run_business(run_id: str, business_id: str, stages: List[str], force: bool = False) -> Dict[str, str]:
+    """Runs the given stages of one business in order and checkpoints each one."""
+    outcome = {}
+    for stage in stages:
+        with _stage_slots[stage]:
+            started = time.perf_counter()
+            with span(f"batch.{stage}", business_id=business_id, **{"profitpilot.run_id": run_id}), \
+                    insights.batch_run(run_id, force):
+                try:
+                    _STAGE_FUNCTIONS[stage](business_id, run_id)
+                except Exception as e:
+                    print(f"Batch {run_id}: stage '{stage}' failed for business '{business_id}': {e}")
+                    _record(run_id, business_id, stage, "failed", (time.perf_counter() - started) * 1000.0, str(e))
+                    outcome[stage] = "failed"
+                    continue
+        _record(run_id, business_id, stage, "succeeded", (time.perf_counter() - started) * 1000.0)
+        outcome[stage] = "succeeded"
+    return outcome
+
+
+# --- Runs and checkpoints ---
+
+def _initialize() -> None:
+    with _connect() as connection:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(_SCHEMA)
+
+
+def create_run(business_ids: List[str], stages: List[str]) -> str:
+    """Records a new run with one pending task per business and stage, and returns its ID."""
+    _initialize()
+    run_id = datetime.datetime.now(datetime.timezone.utc).strftime("run_%Y%m%d_%H%M%S")
+    with _connect() as connection:
+        connection.execute("BEGIN IMMEDIATE")
+        suffix = 1
+        while connection.execute("SELECT 1 FROM batch_runs WHERE run_id = ?", (run_id,)).fetchone():
+            suffix += 1
+            run_id = f"{run_id.rsplit('-', 1)[0]}-{suffix}"
+        connection.execute("INSERT INTO batch_runs (run_id, stages, status, started_at) VALUES (?, ?, 'running', ?)",
+                           (run_id, json.dumps(stages), _now()))
+        connection.executemany(
+            "INSERT INTO batch_tasks (run_id, business_id, stage, status) VALUES (?, ?, ?, 'pending')",
+            [(run_id, business_id, stage) for business_id in business_ids for stage in stages])
+        connection.execute("COMMIT")
+    return run_id
+
+
+def latest_run_id() -> Optional[str]:
+    _initialize()
+    with _connect() as connection:
+        row = connection.execute("SELECT run_id FROM batch_runs ORDER BY started_at DESC LIMIT 1").fetchone()
+    return row["run_id"] if row else None
+
+
+def pending_work(run_id: str) -> Dict[str, List[str]]:
+    """Stages of each business in a run that have not succeeded yet, in stage order."""
+    _initialize()
+    with _connect() as connection:
+        rows = connection.execute(
+            "SELECT business_id, stage FROM batch_tasks WHERE run_id = ? AND status != 'succeeded' "
+            "ORDER BY business_id", (run_id,)).fetchall()
+    work: Dict[str, List[str]] = {}
+    for row in rows:
+        work.setdefault(row["business_id"], []).append(row["stage"])
+    return {business_id: sorted(stages, key=STAGES.index) for business_id, stages in work.items()}
+
+
+def run_summary(run_id: str) -> Dict[str, Dict[str, int]]:
+    """Task counts per stage and status for a run."""
+    with _connect() as connection:
+        rows = connection.execute(
+            "SELECT stage, status, COUNT(*) AS tasks FROM batch_tasks WHERE run_id = ? GROUP BY stage, status",
+            (run_id,)).fetchall()
+    summary: Dict[str, Dict[str, int]] = {}
+    for row in rows:
+        summary.setdefault(row["stage"], {})[row["status"]] = row["tasks"]
+    return summary
+
+
+def run_batch(run_id: str, processes: int = constants.BATCH_PROCESSES,
+              stage_limits: Optional[Dict[str, int]] = None, force: bool = False) -> Dict[str, Dict[str, int]]:
+    """
+    Runs every unfinished task of `run_id` and returns the run's task counts per stage
+    and status. With `processes` <= 1 the businesses run one after another in this
+    process (useful for debugging). With `force`, stored insights are regenerated
+    even when the business's data has not changed.
+    """
+    limits = dict(constants.BATCH_STAGE_CONCURRENCY, **(stage_limits or {}))
+    work = pending_work(run_id)
+    print(f"Batch {run_id}: {len(work)} businesses with unfinished stages.")
+
+    if processes <= 1:
+        _init_worker({stage: threading.BoundedSemaphore(max(1, limits[stage])) for stage in STAGES})
+        for business_id, stages in work.items():
+            _run_business(run_id, business_id, stages, force)
+    else:
+        # Spawned workers start with fresh API clients instead of forked copies of this process's.
+        context = multiprocessing.get_context("spawn")
+        stage_slots = {stage: context.BoundedSemaphore(max(1, limits[stage])) for stage in STAGES}
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                                 initializer=_init_worker, initargs=(stage_slots,)) as pool:
+            futures = {pool.submit(_run_business, run_id, business_id, stages, force): business_id
+                       for business_id, stages in work.items()}
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    outcome = future.result()
+                except Exception as e:   # a worker process died; its tasks stay unfinished for --resume
+                    outcome = {"error": str(e)}
+                print(f"Batch {run_id}: [{done}/{len(futures)}] {futures[future]}: {outcome}")
+
+    summary = run_summary(run_id)
+    finished = all(set(counts) == {"succeeded"} for counts in summary.values())
+    with _connect() as connection:
+        connection.execute("UPDATE batch_runs SET status = ?, finished_at = ? WHERE run_id = ?",
+                           ("completed" if finished else "incomplete", _now(), run_id))
+    return summary
+
+
+def _stage_list(value: str) -> List[str]:
+    stages = [s.strip() for s in value.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Unknown stage(s) {unknown}; choose from {', '.join(STAGES)}.")
+    return sorted(set(stages), key=STAGES.index)
+
+
+def _stage_limit(value: str) -> tuple:
+    stage, _, limit = value.partition("=")
+    if stage not in STAGES or not limit.isdigit() or int(limit) < 1:
+        raise argparse.ArgumentTypeError("Limits look like 'report=2' with a known stage and a positive number.")
+    return stage, int(limit)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Precompute ProfitPilot analytics for all businesses.")
+    parser.add_argument("--stages", type=_stage_list, default=list(STAGES),
+                        help=f"Comma separated stages to run (default: {','.join(STAGES)}).")
+    parser.add_argument("--business", action="append", default=None,
+                        help="Only this business (repeatable). Default: every business in the business table.")
+    parser.add_argument("--processes", type=int, default=constants.BATCH_PROCESSES,
+                        help=f"Worker processes (default: {constants.BATCH_PROCESSES}; 1 runs inline).")
+    parser.add_argument("--limit", type=_stage_limit, action="append", default=[],
+                        help="Concurrent businesses for one stage across all processes, e.g. report=2 (repeatable).")
+    parser.add_argument("--force", action="store_true",
+                        help="Regenerate stored insights even for businesses whose data has not changed.")
+    parser.add_argument("--resume", nargs="?", const="latest", default=None,
+                        help="Continue a previous run (default: the latest) instead of starting a new one.")
+    args = parser.parse_args(argv)
+
+    _initialize()
+    if args.resume:
+        run_id = latest_run_id() if args.resume == "latest" else args.resume
+        if not run_id or not run_summary(run_id):
+            print(f"No batch run '{args.resume}' to resume.")
+            return 1
+    else:
+        from .sub_agents.onboarding_agent.tools import db_list_business_ids
+        business_ids = args.business or db_list_business_ids()
+        if not business_ids:
+            print("No businesses found.")
+            return 1
+        run_id = create_run(business_ids, args.stages)
+
+    summary = run_batch(run_id, processes=args.processes, stage_limits=dict(args.limit), force=args.force)
+    print(f"\nBatch {run_id}:")
+    for stage in STAGES:
+        if stage in summary:
+            print(f"  {stage:<10} " + ", ".join(f"{status} {n}" for status, n in sorted(summary[stage].items())))
+    failed = any(status != "succeeded" for counts in summary.values() for status in counts)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
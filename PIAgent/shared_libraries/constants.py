@@ -21,3 +21,78 @@ STAGING_BUCKET = os.getenv("STAGING_BUCKET", "")
 BQ_DATASET_ID =os.getenv("BQ_DATASET_ID", "EMPTY")
 PROJECT_ID = os.getenv("GOOGLE_CLOUD_PROJECT", "EMPTY")
 GOOGLE_MAP_API_KEY = os.getenv("GOOGLE_MAP_API_KEY", "EMPTY")
+
+# --- Tracing ---
+# "" / "0" disables tracing, "local" writes spans to TRACE_FILE, "otel" uses the OpenTelemetry API.
+TRACING = os.getenv("PP_TRACING", "0")
+TRACE_FILE = os.getenv("PP_TRACE_FILE", "profitpilot_traces.jsonl")
+
+# --- BigQuery cost guard ---
+# Every query is submitted with maximum_bytes_billed; BigQuery rejects the job
+# before running it if the scan would exceed the limit.
+BQ_DEFAULT_MAX_BYTES_BILLED = int(os.getenv("PP_BQ_MAX_BYTES_BILLED", str(1024 ** 3)))  # 1 GiB
+BQ_TOOL_MAX_BYTES_BILLED = {
+    "db_get_sales_trends_data": 2 * 1024 ** 3,
+    "db_get_item_pricing_data": 2 * 1024 ** 3,
+    "db_get_transaction_items": 2 * 1024 ** 3,
+    "db_get_sales_cube_rows": 2 * 1024 ** 3,
+    "db_get_customer_purchases": 2 * 1024 ** 3,
+    "db_get_inventory_lots": 64 * 1024 ** 2,
+    "db_get_processed_reviews": 256 * 1024 ** 2,
+    "db_get_business_details": 64 * 1024 ** 2,
+    "db_get_competitors": 64 * 1024 ** 2,
+    "db_get_data_watermark": 256 * 1024 ** 2,
+    "db_get_inventory_version": 64 * 1024 ** 2,
+    "db_count_sales_lines": 256 * 1024 ** 2,
+    "db_list_business_ids": 64 * 1024 ** 2,
+}
+# Dry-run each query first and fail locally when the estimate is over the limit.
+BQ_DRY_RUN_GUARD = os.getenv("PP_BQ_DRY_RUN_GUARD", "0").lower() in ("1", "true", "yes")
+
+# --- Tool output budgets ---
+# Estimated tokens a tool result may add to the conversation before it is shortened (see utils/tool_output.py).
+TOOL_OUTPUT_MAX_TOKENS = int(os.getenv("PP_TOOL_OUTPUT_MAX_TOKENS", "2000"))
+TOOL_OUTPUT_TOOL_MAX_TOKENS = {
+    "db_get_processed_reviews": 1500,
+    "agent_list_jobs": 800,
+    # Gemini-written reports are the answer itself; only runaway ones are cut.
+    "agent_analyze_sales_trends": 4000,
+    "agent_provide_pricing_advice": 4000,
+    "agent_check_inventory_levels": 4000,
+    "agent_business_health_report": 5000,
+    "agent_call_competitive_edge_analyst": 5000,
+}
+
+# --- Conversation compaction ---
+# Above this many estimated tokens of history, older turns are sent as a rolling summary (see utils/compaction.py).
+COMPACTION_MAX_TOKENS = int(os.getenv("PP_COMPACTION_MAX_TOKENS", "24000"))
+# Estimated tokens of the most recent turns that are always sent as they are.
+COMPACTION_KEEP_TOKENS = int(os.getenv("PP_COMPACTION_KEEP_TOKENS", "8000"))
+
+# --- Gemini context caching ---
+# Agent instructions, tool declarations and the earlier turns of long sessions are sent as
+# Gemini cached content instead of being re-sent with every model call (see utils/context_cache.py).
+CONTEXT_CACHE = os.getenv("PP_CONTEXT_CACHE", "1").lower() in ("1", "true", "yes")
+CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("PP_CONTEXT_CACHE_TTL_SECONDS", "3600"))
+# Smallest prefix (estimated tokens) worth caching, and the growth of a session's history that
+# triggers a new cache. Gemini rejects caches below a model-specific minimum.
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("PP_CONTEXT_CACHE_MIN_TOKENS", "4096"))
+
+# --- Background jobs ---
+# Review collection and simulated data generation run as jobs from this SQLite queue.
+JOBS_DB_PATH = os.getenv("PP_JOBS_DB", "profitpilot_jobs.sqlite3")
+JOBS_MAX_WORKERS = int(os.getenv("PP_JOB_WORKERS", "2"))
+
+# --- Nightly batch and precomputed insights ---
+# Results of `python -m PIAgent.batch`, read by the chat tools during the day.
+INSIGHTS_DB_PATH = os.getenv("PP_INSIGHTS_DB", "profitpilot_insights.sqlite3")
+# Checkpoints of batch runs, so an interrupted run can be resumed.
+BATCH_DB_PATH = os.getenv("PP_BATCH_DB", "profitpilot_batch.sqlite3")
+BATCH_PROCESSES = int(os.getenv("PP_BATCH_PROCESSES", str(min(os.cpu_count() or 1, 8))))
+# Businesses running a stage at the same time, across all processes (API quotas, Gemini rate limits).
+BATCH_STAGE_CONCURRENCY = {
+    "reviews": 2,
+    "rollups": 8,
+    "forecasts": 4,
+    "report": 2,
+}
@@ -3,8 +3,14 @@
 from google.adk.agents.llm_agent import Agent
 
 from ...shared_libraries import constants
+from ...utils import compaction, context_cache, prefetch, tool_output
 # Import the new tools from the main tools.py file
-from .tools import agent_provide_pricing_advice, agent_analyze_sales_trends, agent_check_inventory_levels
+from .tools import (
+    agent_provide_pricing_advice, agent_analyze_sales_trends, agent_check_inventory_levels,
+    agent_forecast_sales, agent_simulate_price_changes, agent_find_product_bundles,
+    agent_detect_sales_anomalies, agent_query_sales, agent_analyze_customer_cohorts,
+    agent_check_expiring_stock, agent_record_stock_delivery, agent_business_health_report,
+)
 
 from ...prompts import business_analyst_prompt_text
 
@@ -17,5 +23,23 @@ business_analyst_agent = Agent(
         agent_provide_pricing_advice,
         agent_analyze_sales_trends,
         agent_check_inventory_levels,
+        agent_forecast_sales,
+        agent_simulate_price_changes,
+        agent_find_product_bundles,
+        agent_detect_sales_anomalies,
+        agent_query_sales,
+        agent_analyze_customer_cohorts,
+        agent_check_expiring_stock,
+        agent_record_stock_delivery,
+        agent_business_health_report,
+        tool_output.get_tool_output_page,
     ],
+    # Start loading the business's data in the background once a tool call names it.
+    before_tool_callback=prefetch.before_tool_callback,
+    # Results over their token budget reach the conversation shortened, with a handle for paging.
+    after_tool_callback=[prefetch.after_tool_callback, tool_output.after_tool_callback],
+    # Long conversations reach the model as a rolling summary plus the latest turns; the instruction,
+    # tools and finished turns are then sent as Gemini cached content.
+    before_model_callback=[compaction.before_model_callback, context_cache.before_model_callback],
+    after_model_callback=context_cache.after_model_callback,
 )
\ No newline at end of file
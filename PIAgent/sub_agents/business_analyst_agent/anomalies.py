@@ -0,0 +1,177 @@
+"""
+Streaming anomaly detection on daily unit sales per item.
+
+For every item and weekday the detector keeps a ring buffer of the last
+WINDOW_WEEKS values seen on that weekday. A new day is scored against the
+buffer for its weekday before being added to it:
+
+    expected = median(buffer)
+    scale    = max(1.4826 * MAD(buffer), sqrt(expected), 1) * sqrt(1 + (pi / 2) / n)
+    score    = (value - expected) / scale
+
+The median of the same weekday is the seasonal baseline, and the MAD
+(median absolute deviation) is its robust spread, so one past spike does
+not mask the next one. The sqrt(expected) floor is the Poisson noise of a
+count, which keeps slow sellers from being flagged on every sale, and the
+last factor adds the sampling error of a median of n values. Days with
+|score| >= SCORE_THRESHOLD are reported as spikes or drops.
+
+Each new day costs a fixed amount of work per item (one buffer slot), so
+the cached detector is advanced as sales land instead of re-reading
+history. The cached detector itself is never advanced: updates go to a
+`copy` that then replaces it in the cache.
+"""
+
+import copy
+import datetime
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+WINDOW_WEEKS = 8
+MIN_OBSERVATIONS = 4        # same-weekday values needed before a day is scored
+SCORE_THRESHOLD = 3.5
+MAD_SCALE = 1.4826          # makes the MAD comparable to a standard deviation
+EVENT_RETENTION_DAYS = 180
+SEASON_LENGTH = 7
+
+
+class AnomalyDetector:
+    """Rolling same-weekday median/MAD state and recent anomalies for the items of one business."""
+
+    def __init__(self, last_date: datetime.date):
+        self.item_ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.item_names: Dict[str, str] = {}
+        self.history = np.full((0, SEASON_LENGTH, WINDOW_WEEKS), np.nan)
+        self.position = np.zeros(SEASON_LENGTH, dtype=int)   # next ring buffer slot per weekday
+        self.started = np.zeros(0, dtype=bool)               # item has had its first sale
+        self.last_date = last_date                           # last day added
+        self.first_date = last_date + datetime.timedelta(days=1)
+        self.events: List[Dict[str, Any]] = []
+
+    def _ensure_items(self, item_ids: List[str], item_names: Dict[str, str]) -> None:
+        new = [item_id for item_id in item_ids if item_id not in self.index]
+        for item_id in new:
+            self.index[item_id] = len(self.item_ids)
+            self.item_ids.append(item_id)
+            self.item_names[item_id] = item_names.get(item_id) or item_id
+        if new:
+            self.history = np.concatenate(
+                [self.history, np.full((len(new), SEASON_LENGTH, WINDOW_WEEKS), np.nan)])
+            self.started = np.concatenate([self.started, np.zeros(len(new), dtype=bool)])
+
+    def copy(self) -> "AnomalyDetector":
+        """Returns an independent copy to update while other callers keep using this one."""
+        other = copy.copy(self)
+        other.item_ids, other.index, other.item_names = list(self.item_ids), dict(self.index), dict(self.item_names)
+        other.history, other.position, other.started = self.history.copy(), self.position.copy(), self.started.copy()
+        other.events = list(self.events)
+        return other
+
+    def update(self, item_ids: List[str], item_names: Dict[str, str], y_new: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Scores and then adds the days after `last_date`.
+
+        Args:
+            item_ids (List[str]): Item ID of each row of `y_new`; unknown items are added.
+            item_names (Dict[str, str]): item_id -> item_name.
+            y_new (np.ndarray): (len(item_ids), n_new_days) daily units; items not listed sold 0.
+
+        Returns:
+            List[Dict[str, Any]]: The anomalies found in the new days.
+        """
+        self._ensure_items(item_ids, item_names)
+        y = np.zeros((len(self.item_ids), y_new.shape[1]))
+        if item_ids:
+            y[[self.index[item_id] for item_id in item_ids]] = y_new
+
+        found = []
+        for t in range(y.shape[1]):
+            day = self.last_date + datetime.timedelta(days=t + 1)
+            weekday = day.weekday()
+            values = y[:, t]
+            self.started |= values > 0
+            window = self.history[:, weekday]
+            scored = self.started & (np.count_nonzero(~np.isnan(window), axis=1) >= MIN_OBSERVATIONS)
+            if scored.any():
+                found.extend(self._score(day, values, window, scored))
+            # Items are only tracked from their first sale, so leading zeros do not become the baseline.
+            window[:, self.position[weekday]] = np.where(self.started, values, np.nan)
+            self.position[weekday] = (self.position[weekday] + 1) % WINDOW_WEEKS
+
+        self.last_date += datetime.timedelta(days=y.shape[1])
+        self.events.extend(found)
+        cutoff = self.last_date - datetime.timedelta(days=EVENT_RETENTION_DAYS)
+        if self.first_date <= cutoff:
+            self.first_date = cutoff + datetime.timedelta(days=1)
+            self.events = [event for event in self.events if event["date"] > cutoff]
+        return found
+
+    def _score(self, day: datetime.date, values: np.ndarray, window: np.ndarray,
+               scored: np.ndarray) -> List[Dict[str, Any]]:
+        rows = np.flatnonzero(scored)
+        past = window[rows]
+        expected = np.nanmedian(past, axis=1)
+        mad = np.nanmedian(np.abs(past - expected[:, None]), axis=1)
+        n = np.count_nonzero(~np.isnan(past), axis=1)
+        scale = np.maximum(np.maximum(MAD_SCALE * mad, np.sqrt(np.maximum(expected, 0.0))), 1.0)
+        scale *= np.sqrt(1 + (np.pi / 2) / n)
+        score = (values[rows] - expected) / scale
+        flagged = np.flatnonzero(np.abs(score) >= SCORE_THRESHOLD)
+        return [
+            {
+                "date": day,
+                "item_id": self.item_ids[rows[k]],
+                "item_name": self.item_names[self.item_ids[rows[k]]],
+                "units": round(float(values[rows[k]]), 2),
+                "expected_units": round(float(expected[k]), 2),
+                "score": round(float(score[k]), 2),
+                "direction": "spike" if score[k] > 0 else "drop",
+            }
+            for k in flagged
+        ]
+
+    def anomalies(self, start_date: Optional[datetime.date] = None, end_date: Optional[datetime.date] = None,
+                  item_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Retained anomalies in [start_date, end_date], strongest first."""
+        events = [
+            event for event in self.events
+            if (start_date is None or event["date"] >= start_date)
+            and (end_date is None or event["date"] <= end_date)
+            and (item_id is None or event["item_id"] == item_id)
+        ]
+        return sorted(events, key=lambda event: -abs(event["score"]))
+
+
+def build_detector(item_ids: List[str], item_names: Dict[str, str], y: np.ndarray,
+                   start_date: datetime.date) -> AnomalyDetector:
+    """Creates a detector by streaming the (n_items, n_days) history that starts on `start_date`."""
+    detector = AnomalyDetector(start_date - datetime.timedelta(days=1))
+    detector.update(item_ids, item_names, y)
+    return detector
+
+
+# --- Detector cache ---
+
+_cache_lock = threading.Lock()
+_detectors: Dict[str, AnomalyDetector] = {}
+
+
+def get_cached_detector(business_id: str) -> Optional[AnomalyDetector]:
+    with _cache_lock:
+        return _detectors.get(business_id)
+
+
+def store_detector(business_id: str, detector: AnomalyDetector) -> None:
+    with _cache_lock:
+        _detectors[business_id] = detector
+
+
+def clear_cache(business_id: Optional[str] = None) -> None:
+    with _cache_lock:
+        if business_id is None:
+            _detectors.clear()
+        else:
+            _detectors.pop(business_id, None)
@@ -0,0 +1,139 @@
+"""
+Market basket analysis: which items are bought together.
+
+Each item's transactions arrive as an array of distinct integer keys; the
+keys are encoded as row numbers of a sparse binary transaction x item matrix
+X (SciPy CSR). Then:
+- item support is the column sums of X,
+- pair co-occurrence counts are the upper triangle of X.T @ X,
+- triple counts for the strongest pairs come from one more sparse product:
+  the element-wise product of the pair's two columns (baskets holding both)
+  times X.
+
+Each rule reports support (share of baskets), confidence (P(B | A)) and lift
+(how much more often A and B appear together than if bought independently).
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from scipy import sparse
+
+MAX_TRIPLE_PAIRS = 200
+
+
+def build_basket_matrix(transactions: Sequence[np.ndarray]) -> sparse.csr_matrix:
+    """
+    Encodes each item's distinct integer transaction keys as a binary CSR matrix
+    (column j holds the transactions of `transactions[j]`).
+
+    Returns:
+        sparse.csr_matrix: The (n_transactions, n_items) binary matrix.
+    """
+    lengths = np.array([len(keys) for keys in transactions], dtype=np.int64)
+    keys = np.concatenate(transactions) if len(transactions) else np.zeros(0, dtype=np.int64)
+    _, txn_codes = np.unique(keys, return_inverse=True)
+    item_codes = np.repeat(np.arange(len(transactions)), lengths)
+    return sparse.csr_matrix(
+        (np.ones(len(txn_codes), dtype=np.float32), (txn_codes, item_codes)),
+        shape=(int(txn_codes.max()) + 1 if len(txn_codes) else 0, len(transactions)),
+    )
+
+
+def _rule(antecedent: List[int], consequent: int, count: float, counts: np.ndarray,
+          antecedent_count: float, n_transactions: int, labels: np.ndarray) -> Dict[str, Any]:
+    support = count / n_transactions
+    confidence = count / antecedent_count
+    return {
+        "items": [str(labels[i]) for i in antecedent] + [str(labels[consequent])],
+        "if_bought": [str(labels[i]) for i in antecedent],
+        "then_also": str(labels[consequent]),
+        "baskets": int(count),
+        "support": round(float(support), 4),
+        "confidence": round(float(confidence), 3),
+        "lift": round(float(confidence / (counts[consequent] / n_transactions)), 2),
+    }
+
+
+def find_associations(matrix: sparse.csr_matrix, item_labels: np.ndarray, min_support: float = 0.01,
+                      min_confidence: float = 0.1, min_lift: float = 1.0, max_rules: int = 20,
+                      include_triples: bool = True, focus_item: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Finds frequent pairs and triples and ranks the resulting rules by lift.
+
+    Args:
+        matrix (sparse.csr_matrix): Binary transaction x item matrix from `build_basket_matrix`.
+        item_labels (np.ndarray): Item label of each column (e.g. item names).
+        min_support (float): Minimum share of baskets containing the whole itemset.
+        min_confidence (float): Minimum P(consequent | antecedent).
+        min_lift (float): Minimum lift (1.0 = no association).
+        max_rules (int): Maximum number of pair and of triple rules returned.
+        include_triples (bool): Also mine 3-item sets from the strongest pairs.
+        focus_item (Optional[str]): Only return rules involving this item label.
+
+    Returns:
+        Dict[str, Any]: 'transactions', 'multi_item_share', 'pair_rules', 'triple_rules'.
+    """
+    n_transactions, n_items = matrix.shape
+    if n_transactions == 0 or n_items < 2:
+        return {"transactions": n_transactions, "multi_item_share": 0.0, "pair_rules": [], "triple_rules": []}
+    min_count = max(2.0, np.ceil(min_support * n_transactions))
+    counts = np.asarray(matrix.sum(axis=0)).ravel()
+    basket_sizes = np.diff(matrix.indptr)
+    focus = None
+    if focus_item is not None:
+        matches = np.flatnonzero(np.char.lower(item_labels.astype(str)) == focus_item.lower())
+        focus = int(matches[0]) if matches.size else -1
+
+    # Apriori: only items that are frequent on their own can be in a frequent pair.
+    frequent = np.flatnonzero(counts >= min_count)
+    x = matrix[:, frequent].tocsc()
+    co = sparse.triu(x.T @ x, k=1).tocoo()
+    keep = co.data >= min_count
+    pair_a, pair_b, pair_count = frequent[co.row[keep]], frequent[co.col[keep]], co.data[keep]
+
+    # Both directions of every pair, scored as arrays before any rule dicts are built.
+    antecedents = np.concatenate([pair_a, pair_b])
+    consequents = np.concatenate([pair_b, pair_a])
+    both_counts = np.concatenate([pair_count, pair_count])
+    confidence = both_counts / counts[antecedents]
+    lift = confidence / (counts[consequents] / n_transactions)
+    selected = (confidence >= min_confidence) & (lift >= min_lift)
+    if focus is not None:
+        selected &= (antecedents == focus) | (consequents == focus)
+    order = np.flatnonzero(selected)
+    order = order[np.lexsort((-both_counts[order], -lift[order]))][:max_rules]
+    pair_rules = [
+        _rule([int(antecedents[k])], int(consequents[k]), both_counts[k], counts, counts[antecedents[k]],
+              n_transactions, item_labels)
+        for k in order
+    ]
+
+    triple_rules = []
+    if include_triples and len(pair_count):
+        top = np.argsort(-pair_count)[:MAX_TRIPLE_PAIRS]
+        a_cols, b_cols = pair_a[top], pair_b[top]
+        csc = matrix.tocsc()
+        both = csc[:, a_cols].multiply(csc[:, b_cols]).tocsc()      # baskets with both items of each pair
+        triple_counts = (both.T @ matrix).tocoo()                     # pairs x items
+        frequent_pairs = dict(zip(zip(pair_a.tolist(), pair_b.tolist()), pair_count.tolist()))
+        for p, c, count in zip(triple_counts.row, triple_counts.col, triple_counts.data):
+            a, b = int(a_cols[p]), int(b_cols[p])
+            if c <= b or count < min_count:
+                continue  # each triple once (a < b < c)
+            if (a, c) not in frequent_pairs or (b, c) not in frequent_pairs:
+                continue
+            if focus is not None and focus not in (a, b, c):
+                continue
+            for (x1, x2), consequent in (((a, b), c), ((a, c), b), ((b, c), a)):
+                rule = _rule([x1, x2], consequent, count, counts, frequent_pairs[(x1, x2)], n_transactions, item_labels)
+                if rule["confidence"] >= min_confidence and rule["lift"] >= min_lift:
+                    triple_rules.append(rule)
+        triple_rules.sort(key=lambda r: (-r["lift"], -r["baskets"]))
+
+    return {
+        "transactions": int(n_transactions),
+        "multi_item_share": round(float((basket_sizes > 1).mean()), 3),
+        "pair_rules": pair_rules[:max_rules],
+        "triple_rules": triple_rules[:max_rules],
+    }
@@ -0,0 +1,233 @@
+"""
+Customer cohort and retention analytics.
+
+Input is one row per customer and purchase day (orders, revenue, profit).
+Customer IDs are integer-encoded once with `np.unique`, and the rows are
+sorted by (customer, day) with `np.lexsort`. In that order:
+- a customer's rows are contiguous, so their first purchase (cohort),
+  number of purchase days and spend come from the group start positions
+  and `np.add.reduceat`,
+- a customer active several times in one period appears in adjacent rows,
+  so distinct (customer, period) pairs are found by comparing neighbours,
+- gaps between consecutive purchases are plain differences.
+
+Everything else is `np.bincount` over (cohort, age) keys; no per-customer
+Python objects are built.
+
+Rows only cover the history asked for, so a customer's first row there is not
+necessarily their first purchase. Given each customer's real first purchase
+date, customers acquired before the history are left out of the cohorts (their
+early periods were not read) and only counted in the summary; a first cohort
+whose period starts before the history is flagged `partial_period`.
+
+Lifetime value is estimated per cohort over LTV_HORIZON periods: the
+cohort's own active share and value per active customer where observed,
+then the business-wide retention curve (pooled over all cohorts that reached
+each age, extrapolated geometrically beyond the oldest cohort) for the
+periods it has not lived through yet.
+"""
+
+import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+LTV_HORIZON = {"month": 12, "week": 26}
+MAX_RETENTION_PERIODS = {"month": 12, "week": 12}
+MAX_PERIOD_RETENTION = 0.99
+
+_EPOCH = datetime.date(1970, 1, 1)
+
+
+def _periods(days: np.ndarray, period: str) -> np.ndarray:
+    """Period index of each day number (days since 1970-01-01)."""
+    if period == "month":
+        return days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    if period == "week":
+        return (days + 3) // 7   # weeks starting on Monday; 1970-01-01 was a Thursday
+    raise ValueError("period must be 'month' or 'week'.")
+
+
+def _day_numbers(values: Sequence[Any]) -> np.ndarray:
+    """Days since 1970-01-01 of dates; each distinct date (there are few) is converted once."""
+    if isinstance(values, np.ndarray):
+        return values.astype("datetime64[D]").astype(np.int64)
+    converted: Dict[Any, int] = {}
+
+    def day(value: Any) -> int:
+        if value not in converted:
+            converted[value] = int(np.datetime64(value, "D").astype(np.int64))
+        return converted[value]
+
+    return np.fromiter((day(value) for value in values), dtype=np.int64, count=len(values))
+
+
+def _period_label(index: int, period: str) -> str:
+    if period == "month":
+        return str(np.datetime64(int(index), "M"))
+    return (_EPOCH + datetime.timedelta(days=int(index) * 7 - 3)).isoformat()
+
+
+def analyze_cohorts(customer_ids: Sequence[Any], dates: Sequence[Any], orders: np.ndarray,
+                    revenue: np.ndarray, profit: np.ndarray, period: str = "month",
+                    first_purchase_dates: Optional[Sequence[Any]] = None,
+                    history_start: Optional[datetime.date] = None) -> Dict[str, Any]:
+    """
+    Computes first-purchase cohorts, retention, repeat rate, purchase frequency and LTV.
+
+    Args:
+        customer_ids (Sequence[Any]): Customer of each row.
+        dates (Sequence[Any]): Purchase day of each row (datetime.date, datetime64 or ISO string).
+        orders, revenue, profit (np.ndarray): Transactions, revenue and profit of each row.
+        period (str): Cohort and retention period, 'month' or 'week'.
+        first_purchase_dates (Optional[Sequence[Any]]): First purchase day (over the whole
+            history) of each row's customer. Defaults to their first day in the rows.
+        history_start (Optional[datetime.date]): First day the rows cover.
+
+    Returns:
+        Dict[str, Any]: 'summary' (figures over the customers acquired in the history, plus
+                        those acquired earlier) and 'cohorts' (one entry per first-purchase
+                        period, oldest first).
+    """
+    ids = np.asarray(customer_ids, dtype=str)
+    days = _day_numbers(dates)
+    orders = np.asarray(orders, dtype=float)
+    revenue = np.asarray(revenue, dtype=float)
+    profit = np.asarray(profit, dtype=float)
+    earlier = {"customers_acquired_before_history": 0, "revenue_from_earlier_customers": 0.0}
+    if first_purchase_dates is not None and history_start is not None and len(ids):
+        first_days = _day_numbers(first_purchase_dates)
+        before = first_days < (history_start - _EPOCH).days
+        earlier = {"customers_acquired_before_history": int(np.unique(ids[before]).size),
+                   "revenue_from_earlier_customers": round(float(revenue[before].sum()), 2)}
+        ids, days, orders, revenue, profit = ids[~before], days[~before], orders[~before], revenue[~before], profit[~before]
+
+    n_rows = len(ids)
+    if n_rows == 0:
+        return {"summary": dict({"customers": 0}, **earlier), "cohorts": []}
+
+    customer_labels, customer = np.unique(ids, return_inverse=True)
+
+    order = np.lexsort((days, customer))
+    customer, days, orders, revenue, profit = customer[order], days[order], orders[order], revenue[order], profit[order]
+    n_customers = len(customer_labels)
+
+    new_customer = np.empty(n_rows, dtype=bool)
+    new_customer[0] = True
+    new_customer[1:] = customer[1:] != customer[:-1]
+    starts = np.flatnonzero(new_customer)
+
+    row_period = _periods(days, period)
+    first_period = row_period[starts]                        # per customer
+    cohort_of_row = np.repeat(first_period, np.diff(np.append(starts, n_rows)))
+    age = row_period - cohort_of_row
+
+    purchase_days = np.diff(np.append(starts, n_rows))       # per customer
+    customer_orders = np.add.reduceat(orders, starts)
+    customer_revenue = np.add.reduceat(revenue, starts)
+    repeat = purchase_days > 1
+
+    # Gaps between consecutive purchase days of the same customer.
+    same_customer_next = ~new_customer[1:]
+    gaps = (days[1:] - days[:-1])[same_customer_next]
+
+    # Distinct (customer, age) pairs are adjacent in (customer, day) order.
+    new_pair = new_customer.copy()
+    new_pair[1:] |= age[1:] != age[:-1]
+
+    first_cohort = int(first_period.min())
+    n_cohorts = int(first_period.max()) - first_cohort + 1
+    last_period = int(row_period.max())
+    n_ages = last_period - first_cohort + 1   # the oldest cohort's lifetime, even if nobody was active late in it
+    cohort = first_period - first_cohort
+    cohort_size = np.bincount(cohort, minlength=n_cohorts).astype(float)
+
+    cell = (cohort_of_row - first_cohort) * n_ages + age
+    active = np.bincount(cell[new_pair], minlength=n_cohorts * n_ages).reshape(n_cohorts, n_ages)
+    cell_revenue = np.bincount(cell, weights=revenue, minlength=n_cohorts * n_ages).reshape(n_cohorts, n_ages)
+    cell_profit = np.bincount(cell, weights=profit, minlength=n_cohorts * n_ages).reshape(n_cohorts, n_ages)
+
+    # Ages a cohort has lived through: up to the last period in the data.
+    observed_ages = last_period - (first_cohort + np.arange(n_cohorts)) + 1      # per cohort
+    observed = np.arange(n_ages)[None, :] < observed_ages[:, None]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share = np.where(cohort_size[:, None] > 0, active / cohort_size[:, None], 0.0)
+        pooled_active = (active * observed).sum(axis=0)
+        pooled_size = (cohort_size[:, None] * observed).sum(axis=0)
+        pooled_share = np.where(pooled_size > 0, pooled_active / pooled_size, 0.0)
+        value_per_active = np.where(active > 0, cell_revenue / active, 0.0)
+        profit_per_active = np.where(active > 0, cell_profit / active, 0.0)
+        pooled_value = np.where(pooled_active > 0, cell_revenue.sum(axis=0) / pooled_active, 0.0)
+        pooled_profit = np.where(pooled_active > 0, cell_profit.sum(axis=0) / pooled_active, 0.0)
+
+    horizon = LTV_HORIZON[period]
+    curve = np.zeros(horizon)
+    curve[:min(horizon, n_ages)] = pooled_share[:horizon]
+    value_curve = np.zeros(horizon)
+    profit_curve = np.zeros(horizon)
+    value_curve[:min(horizon, n_ages)] = pooled_value[:horizon]
+    profit_curve[:min(horizon, n_ages)] = pooled_profit[:horizon]
+    known = min(horizon, n_ages)
+    if known < horizon:
+        # Beyond the oldest cohort, keep shrinking by the typical period-over-period retention
+        # after the first period (no projection when no customer has come back yet).
+        later = pooled_share[1:known]
+        if later.size >= 2:
+            rate = float(np.median(later[1:] / np.maximum(later[:-1], 1e-12)))
+        else:
+            rate = float(later[0]) if later.size else 0.0
+        rate = min(max(rate, 0.0), MAX_PERIOD_RETENTION)
+        curve[known:] = curve[known - 1] * rate ** np.arange(1, horizon - known + 1)
+        value_curve[known:] = value_curve[known - 1]
+        profit_curve[known:] = profit_curve[known - 1]
+
+    repeat_rate = np.bincount(cohort, weights=repeat, minlength=n_cohorts) / np.maximum(cohort_size, 1)
+    orders_per_customer = np.bincount(cohort, weights=customer_orders, minlength=n_cohorts) / np.maximum(cohort_size, 1)
+    revenue_per_customer = np.bincount(cohort, weights=customer_revenue, minlength=n_cohorts) / np.maximum(cohort_size, 1)
+
+    # The period the history starts in is only partly covered unless the history starts on its first day.
+    partial_period = None
+    if history_start is not None:
+        start_day = (history_start - _EPOCH).days
+        partial_period = int(_periods(np.array([start_day]), period)[0])
+        if int(_periods(np.array([start_day - 1]), period)[0]) != partial_period:
+            partial_period = None
+
+    cohorts: List[Dict[str, Any]] = []
+    max_retention = MAX_RETENTION_PERIODS[period]
+    for c in np.flatnonzero(cohort_size > 0):
+        lived = int(min(observed_ages[c], horizon))
+        # Unlived periods follow the pooled curve, scaled to where this cohort is now.
+        anchor = lived - 1
+        scale = share[c, anchor] / curve[anchor] if lived > 1 and curve[anchor] > 0 else 1.0
+        projected_share = np.concatenate([share[c, :lived], curve[lived:] * scale])
+        projected_value = np.concatenate([value_per_active[c, :lived], value_curve[lived:]])
+        projected_profit = np.concatenate([profit_per_active[c, :lived], profit_curve[lived:]])
+        cohorts.append({
+            "cohort": _period_label(first_cohort + c, period),
+            "customers": int(cohort_size[c]),
+            "repeat_rate": round(float(repeat_rate[c]), 3),
+            "orders_per_customer": round(float(orders_per_customer[c]), 2),
+            "revenue_per_customer": round(float(revenue_per_customer[c]), 2),
+            "retention": [round(float(v), 3) for v in share[c, :min(observed_ages[c], max_retention)]],
+            f"estimated_ltv_revenue_{horizon}_{period}s": round(float(projected_share @ projected_value), 2),
+            f"estimated_ltv_profit_{horizon}_{period}s": round(float(projected_share @ projected_profit), 2),
+        })
+        if first_cohort + c == partial_period:
+            cohorts[-1]["partial_period"] = True
+
+    summary = {
+        "customers": int(n_customers),
+        "repeat_rate": round(float(repeat.mean()), 3),
+        "orders_per_customer": round(float(customer_orders.mean()), 2),
+        "revenue_per_customer": round(float(customer_revenue.mean()), 2),
+        "average_order_value": round(float(revenue.sum() / max(orders.sum(), 1.0)), 2),
+        "median_days_between_purchases": float(np.median(gaps)) if gaps.size else None,
+        "retention_curve": [round(float(v), 3) for v in curve[:max_retention]],
+        "period": period,
+        "first_cohort": _period_label(first_cohort, period),
+        "last_period": _period_label(last_period, period),
+        **earlier,
+    }
+    return {"summary": summary, "cohorts": cohorts}
@@ -0,0 +1,267 @@
+"""
+In-memory columnar sales cube for slice-and-dice questions.
+
+Sales are loaded once per business at the grain (date, hour, item, payment
+method), already summed by BigQuery, and kept as parallel NumPy columns:
+integer codes for the dimensions and float arrays for the measures. A query
+filters with boolean masks, folds the group-by codes into one key with
+`np.ravel_multi_index` and sums every measure with `np.bincount`, so
+questions like "revenue by hour last month" or "best weekday for glazed
+donuts" never go back to BigQuery.
+
+Refreshes only re-read the days from the last loaded day on (that day may
+have been partial), replacing those rows in place. A cube is shared by every
+session of its business: a load converts the new rows on its own, then swaps
+the columns in under the cube's lock, which queries also hold, so a query
+never sees columns of different lengths or labels being added.
+"""
+
+import calendar
+import datetime
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DIMENSIONS = ("date", "weekday", "hour", "item", "category", "payment_method")
+MEASURES = ("revenue", "units", "profit", "line_items")
+WEEKDAY_NAMES = list(calendar.day_name)
+UNKNOWN = "Unknown"
+
+_EPOCH = datetime.date(1970, 1, 1)
+
+
+class _Labels:
+    """Grows a label <-> integer code mapping as new values arrive."""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+
+    def encode(self, values: Iterable[Any]) -> np.ndarray:
+        out = []
+        for value in values:
+            value = UNKNOWN if value is None else str(value)
+            code = self.codes.get(value)
+            if code is None:
+                code = self.codes[value] = len(self.values)
+                self.values.append(value)
+            out.append(code)
+        return np.array(out, dtype=np.int32)
+
+    def lookup(self, values: Sequence[str]) -> np.ndarray:
+        """Codes of the given labels (case-insensitive); unknown labels are dropped."""
+        wanted = {str(v).lower() for v in values}
+        return np.array([code for value, code in self.codes.items() if value.lower() in wanted], dtype=np.int32)
+
+
+def _day_number(value: Any) -> int:
+    if isinstance(value, str):
+        value = datetime.date.fromisoformat(value[:10])
+    elif isinstance(value, datetime.datetime):
+        value = value.date()
+    return (value - _EPOCH).days
+
+
+class SalesCube:
+    """Columnar (date, hour, item, payment method) sales for one business."""
+
+    def __init__(self):
+        self.items = _Labels()            # item_id
+        self.item_names: Dict[int, str] = {}
+        self.categories = _Labels()
+        self.item_category = np.zeros(0, dtype=np.int32)   # item code -> category code
+        self.payments = _Labels()
+        self.day = np.zeros(0, dtype=np.int32)             # days since 1970-01-01
+        self.hour = np.zeros(0, dtype=np.int8)
+        self.item = np.zeros(0, dtype=np.int32)
+        self.payment = np.zeros(0, dtype=np.int32)
+        self.measures = {name: np.zeros(0) for name in MEASURES}
+        self.loaded_from: Optional[datetime.date] = None   # first day requested from BigQuery
+        self.last_date: Optional[datetime.date] = None
+        self.loaded_at: Optional[datetime.datetime] = None
+        self.watermark: Optional[Dict[str, Any]] = None     # session data watermark the cube was refreshed at
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.day)
+
+    @property
+    def first_date(self) -> Optional[datetime.date]:
+        return _EPOCH + datetime.timedelta(days=int(self.day.min())) if len(self.day) else None
+
+    def load(self, rows: List[Dict[str, Any]], from_date: Optional[datetime.date] = None) -> "SalesCube":
+        """
+        Appends cube rows (transaction_date, hour, item_id, item_name, category,
+        payment_method and the MEASURES), first dropping any rows on or after
+        `from_date` so a re-read day replaces its earlier partial copy.
+        """
+        day = np.array([_day_number(r["transaction_date"]) for r in rows], dtype=np.int32)
+        hour = np.array([r.get("hour") or 0 for r in rows], dtype=np.int8)
+        measures = {name: np.array([float(r.get(name) or 0) for r in rows]) for name in MEASURES}
+
+        with self._lock:
+            keep = self.day < (from_date - _EPOCH).days if from_date is not None else slice(None)
+            item = self.items.encode(row["item_id"] for row in rows)
+            if len(self.items.values) > len(self.item_category):
+                self.item_category = np.concatenate([
+                    self.item_category,
+                    np.zeros(len(self.items.values) - len(self.item_category), dtype=np.int32)])
+            if rows:
+                category = self.categories.encode(row.get("category") for row in rows)
+                self.item_category[item] = category
+                for code, row in zip(item.tolist(), rows):
+                    self.item_names[code] = row.get("item_name") or row["item_id"]
+            payment = self.payments.encode(r.get("payment_method") for r in rows)
+
+            self.day = np.concatenate([self.day[keep], day])
+            self.hour = np.concatenate([self.hour[keep], hour])
+            self.item = np.concatenate([self.item[keep], item])
+            self.payment = np.concatenate([self.payment[keep], payment])
+            self.measures = {name: np.concatenate([self.measures[name][keep], measures[name]]) for name in MEASURES}
+            if len(self.day):
+                self.last_date = _EPOCH + datetime.timedelta(days=int(self.day.max()))
+            self.loaded_at = datetime.datetime.now()
+        return self
+
+    def _codes(self, dimension: str, rows: np.ndarray) -> Tuple[np.ndarray, int]:
+        """Integer codes of `dimension` for the selected rows, and the number of possible codes."""
+        if dimension == "date":
+            first = int(self.day.min())
+            return self.day[rows] - first, int(self.day.max()) - first + 1
+        if dimension == "weekday":
+            return (self.day[rows] + 3) % 7, 7   # 1970-01-01 was a Thursday
+        if dimension == "hour":
+            return self.hour[rows].astype(np.int32), 24
+        if dimension == "item":
+            return self.item[rows], max(len(self.items.values), 1)
+        if dimension == "category":
+            return self.item_category[self.item[rows]], max(len(self.categories.values), 1)
+        if dimension == "payment_method":
+            return self.payment[rows], max(len(self.payments.values), 1)
+        raise ValueError(f"Unknown dimension '{dimension}'. Use one of: {', '.join(DIMENSIONS)}.")
+
+    def _label(self, dimension: str, code: int) -> Any:
+        if dimension == "date":
+            return (_EPOCH + datetime.timedelta(days=int(self.day.min()) + code)).isoformat()
+        if dimension == "weekday":
+            return WEEKDAY_NAMES[code]
+        if dimension == "hour":
+            return code
+        if dimension == "item":
+            return self.item_names.get(code, self.items.values[code])
+        if dimension == "category":
+            return self.categories.values[code]
+        return self.payments.values[code]
+
+    def query(self, group_by: Sequence[str] = (), measures: Sequence[str] = MEASURES,
+              start_date: Optional[datetime.date] = None, end_date: Optional[datetime.date] = None,
+              items: Optional[Sequence[str]] = None, categories: Optional[Sequence[str]] = None,
+              payment_methods: Optional[Sequence[str]] = None, weekdays: Optional[Sequence[str]] = None,
+              hours: Optional[Sequence[int]] = None, sort_by: Optional[str] = None,
+              limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Sums `measures` by the `group_by` dimensions over the rows matching every filter.
+
+        Filters are inclusive; item, category, payment method and weekday filters match
+        labels case-insensitively (items by name or ID). Each result row also has 'days',
+        the number of distinct dates with sales in the group, and '<measure>_per_day'
+        averages over those days (useful to compare weekdays or hours fairly).
+
+        Returns:
+            List[Dict[str, Any]]: One row per group, at most `limit` rows. Sorted descending by
+                                  `sort_by` (a measure, '<measure>_per_day' or 'days'; default the
+                                  first measure), or ascending when `sort_by` is a group_by dimension.
+        """
+        for name in measures:
+            if name not in MEASURES:
+                raise ValueError(f"Unknown measure '{name}'. Use one of: {', '.join(MEASURES)}.")
+        with self._lock:
+            return self._query(group_by, measures, start_date, end_date, items, categories,
+                               payment_methods, weekdays, hours, sort_by, limit)
+
+    def _query(self, group_by, measures, start_date, end_date, items, categories,
+               payment_methods, weekdays, hours, sort_by, limit) -> List[Dict[str, Any]]:
+        if not len(self.day):
+            return []
+
+        mask = np.ones(len(self.day), dtype=bool)
+        if start_date is not None:
+            mask &= self.day >= (start_date - _EPOCH).days
+        if end_date is not None:
+            mask &= self.day <= (end_date - _EPOCH).days
+        if items:
+            wanted = {str(v).lower() for v in items}
+            codes = [code for code, name in self.item_names.items() if name.lower() in wanted]
+            codes += self.items.lookup(items).tolist()
+            mask &= np.isin(self.item, codes)
+        if categories:
+            mask &= np.isin(self.item_category[self.item], self.categories.lookup(categories))
+        if payment_methods:
+            mask &= np.isin(self.payment, self.payments.lookup(payment_methods))
+        if weekdays:
+            wanted = {str(v).lower() for v in weekdays}
+            mask &= np.isin((self.day + 3) % 7, [i for i, name in enumerate(WEEKDAY_NAMES) if name.lower() in wanted])
+        if hours:
+            mask &= np.isin(self.hour, np.asarray(list(hours), dtype=np.int8))
+        rows = np.flatnonzero(mask)
+        if not rows.size:
+            return []
+
+        if group_by:
+            codes, sizes = zip(*(self._codes(dimension, rows) for dimension in group_by))
+            key = np.ravel_multi_index(codes, sizes)
+        else:
+            sizes, key = (), np.zeros(rows.size, dtype=np.int64)
+        groups, inverse = np.unique(key, return_inverse=True)
+        sums = {name: np.bincount(inverse, weights=self.measures[name][rows], minlength=groups.size)
+                for name in measures}
+        day_pairs = np.unique(inverse.astype(np.int64) * (1 << 32) + self.day[rows])
+        days = np.bincount((day_pairs >> 32).astype(np.int64), minlength=groups.size)
+
+        if sort_by in group_by:
+            order = np.argsort(groups if len(group_by) == 1 else
+                               np.unravel_index(groups, sizes)[list(group_by).index(sort_by)], kind="stable")
+        else:
+            base = sort_by[:-len("_per_day")] if sort_by and sort_by.endswith("_per_day") else sort_by
+            order_by = sums.get(base, sums[measures[0]]) if measures else days
+            if sort_by == "days":
+                order_by = days
+            elif base != sort_by and base in sums:
+                order_by = order_by / days
+            order = np.argsort(-order_by, kind="stable")
+        order = order[:limit]
+        decoded = np.unravel_index(groups[order], sizes) if group_by else ()
+        result = []
+        for position, g in enumerate(order):
+            row = {dimension: self._label(dimension, int(decoded[d][position])) for d, dimension in enumerate(group_by)}
+            for name in measures:
+                row[name] = round(float(sums[name][g]), 2)
+                row[f"{name}_per_day"] = round(float(sums[name][g] / days[g]), 2)
+            row["days"] = int(days[g])
+            result.append(row)
+        return result
+
+
+# --- Cube cache ---
+
+_cache_lock = threading.Lock()
+_cubes: Dict[str, SalesCube] = {}
+
+
+def get_cached_cube(business_id: str) -> Optional[SalesCube]:
+    with _cache_lock:
+        return _cubes.get(business_id)
+
+
+def store_cube(business_id: str, cube: SalesCube) -> None:
+    with _cache_lock:
+        _cubes[business_id] = cube
+
+
+def clear_cache(business_id: Optional[str] = None) -> None:
+    with _cache_lock:
+        if business_id is None:
+            _cubes.clear()
+        else:
+            _cubes.pop(business_id, None)
@@ -0,0 +1,222 @@
+"""
+Per-item price elasticity of demand from daily sales.
+
+For every item, log(daily units) is regressed on log(daily average price)
+(log-log model, so the slope is the elasticity). Estimates are kept as
+per-item sufficient statistics (n, sums of x, y, x^2, x*y, y^2 and units),
+which makes fitting thousands of items a handful of NumPy reductions and lets
+new days be added without revisiting old ones.
+
+Items with little price variation get noisy slopes, so each item's estimate
+is shrunk toward its category's pooled elasticity (empirical Bayes): the
+weight on the item's own slope is tau^2 / (tau^2 + var_i), where var_i is the
+slope's sampling variance and tau^2 the spread of true elasticities within
+the category. Category estimates are in turn shrunk toward the business-wide
+estimate, and that toward DEFAULT_ELASTICITY, so items and categories with
+no price variation fall back to sensible values.
+
+Average daily units are per calendar day since the item's first sale, so
+days without sales count as zero demand. A cached model is never changed:
+updates go to a `copy` that then replaces it in the cache.
+"""
+
+import copy
+import datetime
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+DEFAULT_ELASTICITY = -1.0
+MIN_TAU2 = 0.05            # floor on the between-item variance within a category
+MAX_TAU2 = 1.0
+PRIOR_VARIANCE = 0.25      # how far categories / the business may stray from their prior
+ELASTICITY_BOUNDS = (-6.0, 0.5)
+MIN_LOG_PRICE_SPREAD = 1e-6
+
+_STATS = ("n", "sx", "sy", "sxx", "sxy", "syy", "units")
+_NO_SALE = np.iinfo(np.int64).max
+
+
+def _day_ordinal(value: Any) -> int:
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value[:10]).toordinal()
+    if isinstance(value, datetime.datetime):
+        return value.date().toordinal()
+    return value.toordinal()
+
+
+class ElasticityModel:
+    """Sufficient statistics and shrunk elasticities for the items of one business."""
+
+    def __init__(self, last_date: Optional[datetime.date] = None):
+        self.item_ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.item_names: Dict[str, str] = {}
+        self.categories: Dict[str, str] = {}
+        self.stats = np.zeros((len(_STATS), 0))
+        self.first_sale = np.zeros(0, dtype=np.int64)   # ordinal of each item's first day with sales
+        self.last_date = last_date
+        self.elasticity = np.zeros(0)
+        self.std_error = np.zeros(0)
+        self.shrink_weight = np.zeros(0)
+        self.residual_sigma = np.zeros(0)
+        self.n_days = np.zeros(0)
+        self.avg_daily_units = np.zeros(0)
+
+    def _ensure_items(self, item_ids: Iterable[str]) -> None:
+        new = [item_id for item_id in dict.fromkeys(item_ids) if item_id not in self.index]
+        if not new:
+            return
+        for item_id in new:
+            self.index[item_id] = len(self.item_ids)
+            self.item_ids.append(item_id)
+        self.stats = np.concatenate([self.stats, np.zeros((len(_STATS), len(new)))], axis=1)
+        self.first_sale = np.concatenate([self.first_sale, np.full(len(new), _NO_SALE)])
+
+    def copy(self) -> "ElasticityModel":
+        """Returns an independent copy to update while other callers keep using this one."""
+        other = copy.copy(self)
+        other.item_ids, other.index = list(self.item_ids), dict(self.index)
+        other.item_names, other.categories = dict(self.item_names), dict(self.categories)
+        other.stats, other.first_sale = self.stats.copy(), self.first_sale.copy()
+        return other
+
+    def add_observations(self, rows: Iterable[Dict[str, Any]], last_date: datetime.date) -> "ElasticityModel":
+        """
+        Adds daily rows (item_id, item_name, transaction_date, units, avg_price) to the
+        statistics. Days with no units or no price are skipped (log undefined).
+        """
+        rows = [row for row in rows if (row.get("units") or 0) > 0 and (row.get("avg_price") or 0) > 0]
+        self._ensure_items(row["item_id"] for row in rows)
+        for row in rows:
+            self.item_names.setdefault(row["item_id"], row.get("item_name") or row["item_id"])
+        if rows:
+            idx = np.array([self.index[row["item_id"]] for row in rows])
+            x = np.log(np.array([float(row["avg_price"]) for row in rows]))
+            units = np.array([float(row["units"]) for row in rows])
+            y = np.log(units)
+            for k, values in enumerate((np.ones_like(x), x, y, x * x, x * y, y * y, units)):
+                np.add.at(self.stats[k], idx, values)
+            ordinals: Dict[Any, int] = {}
+            for row in rows:
+                if row["transaction_date"] not in ordinals:
+                    ordinals[row["transaction_date"]] = _day_ordinal(row["transaction_date"])
+            days = np.array([ordinals[row["transaction_date"]] for row in rows], dtype=np.int64)
+            np.minimum.at(self.first_sale, idx, days)
+        self.last_date = last_date
+        return self
+
+    def set_categories(self, categories: Dict[str, Optional[str]]) -> None:
+        for item_id, category in categories.items():
+            if category:
+                self.categories[item_id] = category
+
+    def estimate(self) -> "ElasticityModel":
+        """Recomputes the per-item slopes and their shrinkage toward the category."""
+        n, sx, sy, sxx, sxy, syy, units = self.stats
+        n_safe = np.maximum(n, 1)
+        cxx = np.maximum(sxx - sx * sx / n_safe, 0.0)
+        cxy = sxy - sx * sy / n_safe
+        cyy = np.maximum(syy - sy * sy / n_safe, 0.0)
+        varies = (cxx > MIN_LOG_PRICE_SPREAD) & (n >= 3)
+
+        raw = np.where(varies, cxy / np.where(varies, cxx, 1.0), 0.0)
+        rss = np.maximum(cyy - raw * cxy, 0.0)
+        residual_var = np.where(n > 2, rss / np.maximum(n - 2, 1), cyy / n_safe)
+        slope_var = np.where(varies, residual_var / np.where(varies, cxx, 1.0), np.inf)
+
+        # Each item's slope is evidence about its category's elasticity, weighted by its precision.
+        # Categories are shrunk toward the business-wide value, which is shrunk toward DEFAULT_ELASTICITY.
+        evidence = np.where(varies, 1.0 / (np.where(varies, slope_var, 1.0) + MIN_TAU2), 0.0)
+
+        def pooled(members: np.ndarray, toward: float) -> float:
+            weights = evidence[members]
+            return float((np.sum(weights * raw[members]) + toward / PRIOR_VARIANCE)
+                         / (np.sum(weights) + 1.0 / PRIOR_VARIANCE))
+
+        all_items = np.ones(len(self.item_ids), dtype=bool)
+        overall = pooled(all_items, DEFAULT_ELASTICITY)
+
+        categories = np.array([self.categories.get(item_id, "") for item_id in self.item_ids], dtype=object)
+        prior = np.full(len(self.item_ids), overall)
+        tau2 = np.full(len(self.item_ids), MIN_TAU2)
+        for category in np.unique(categories) if len(categories) else []:
+            members = categories == category
+            prior[members] = pooled(members, overall)
+            pooled_members = members & varies
+            if pooled_members.sum() > 1:
+                spread = np.var(raw[pooled_members]) - np.mean(slope_var[pooled_members])
+                tau2[members] = min(max(spread, MIN_TAU2), MAX_TAU2)
+
+        weight = np.where(varies, tau2 / (tau2 + np.where(varies, slope_var, 1.0)), 0.0)
+        self.elasticity = np.clip(weight * raw + (1 - weight) * prior, *ELASTICITY_BOUNDS)
+        posterior_var = np.where(varies, 1.0 / (1.0 / tau2 + 1.0 / np.where(varies, slope_var, 1.0)), tau2)
+        self.std_error = np.sqrt(posterior_var)
+        self.shrink_weight = weight
+        self.residual_sigma = np.sqrt(residual_var)
+        self.n_days = n
+        last_day = self.last_date.toordinal() if self.last_date else 0
+        calendar_days = np.where(n > 0, last_day - np.minimum(self.first_sale, last_day) + 1, 1)
+        self.avg_daily_units = units / calendar_days
+        return self
+
+    def item_estimate(self, item_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the elasticity estimate for one item (None if it has no sales history)."""
+        i = self.index.get(item_id)
+        if i is None or i >= len(self.elasticity):
+            return None
+        return {
+            "item_id": item_id,
+            "item_name": self.item_names.get(item_id, item_id),
+            "category": self.categories.get(item_id),
+            "elasticity": float(self.elasticity[i]),
+            "std_error": float(self.std_error[i]),
+            "own_data_weight": float(self.shrink_weight[i]),
+            "residual_sigma": float(self.residual_sigma[i]),
+            "days_observed": int(self.n_days[i]),
+            "avg_daily_units": float(self.avg_daily_units[i]),
+        }
+
+
+def price_change_effects(price: np.ndarray, unit_cost: np.ndarray, units: np.ndarray,
+                         elasticity: np.ndarray, change: float) -> Dict[str, np.ndarray]:
+    """
+    Expected effect of changing every price by `change` (e.g. 0.05 = +5%)
+    under a constant-elasticity demand curve.
+
+    Returns:
+        Dict[str, np.ndarray]: 'units', 'revenue_delta' and 'profit_delta' per item
+                               over the same period as `units`.
+    """
+    new_units = units * (1 + change) ** elasticity
+    new_price = price * (1 + change)
+    return {
+        "units": new_units,
+        "revenue_delta": new_price * new_units - price * units,
+        "profit_delta": (new_price - unit_cost) * new_units - (price - unit_cost) * units,
+    }
+
+
+# --- Model cache ---
+
+_cache_lock = threading.Lock()
+_models: Dict[str, ElasticityModel] = {}
+
+
+def get_cached_model(business_id: str) -> Optional[ElasticityModel]:
+    with _cache_lock:
+        return _models.get(business_id)
+
+
+def store_model(business_id: str, model: ElasticityModel) -> None:
+    with _cache_lock:
+        _models[business_id] = model
+
+
+def clear_cache(business_id: Optional[str] = None) -> None:
+    with _cache_lock:
+        if business_id is None:
+            _models.clear()
+        else:
+            _models.pop(business_id, None)
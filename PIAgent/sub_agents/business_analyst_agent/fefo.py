@@ -0,0 +1,269 @@
+"""
+Lot-level perishable inventory with first-expired-first-out (FEFO) depletion.
+
+Each delivery of a perishable item is a lot with a receipt date and an
+expiry date (receipt + shelf life). Lots live in two kinds of binary heaps
+keyed by expiry date:
+- one heap per item, so a sale always draws from that item's earliest
+  expiring lot (O(log n) per lot touched),
+- one heap for the whole business, so the next expiring lots and the lots
+  to write off on a given day come out in expiry order (O(log n) each)
+  without scanning every lot.
+
+Emptied lots stay in the business heap and are skipped when they reach the
+top (lazy deletion), which keeps every update O(log n).
+
+A cached inventory is never changed: new sales and deliveries are applied to
+a `copy` (cloned heaps and lots) that then replaces it in the cache.
+
+Projected waste sweeps the lots expiring within the horizon in expiry order.
+With an item selling d units a day, the demand available to a lot expiring in
+t days is d * t minus what that item's earlier-expiring lots absorb; the rest
+of the lot is expected to be thrown away.
+"""
+
+import copy
+import datetime
+import heapq
+import itertools
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+_lot_ids = itertools.count(1)
+WRITTEN_OFF_RETENTION_DAYS = 90   # written-off lots kept, by expiry date
+
+
+class Lot:
+    """One delivery of an item."""
+
+    __slots__ = ("lot_id", "item_id", "quantity", "received", "expiry", "estimated")
+
+    def __init__(self, lot_id: str, item_id: str, quantity: float, received: datetime.date,
+                 expiry: datetime.date, estimated: bool = False):
+        self.lot_id = lot_id
+        self.item_id = item_id
+        self.quantity = quantity
+        self.received = received
+        self.expiry = expiry
+        self.estimated = estimated   # quantity or dates inferred from the stock level, not a recorded delivery
+
+    def to_dict(self, as_of: datetime.date) -> Dict[str, Any]:
+        return {
+            "lot_id": self.lot_id,
+            "item_id": self.item_id,
+            "quantity": round(self.quantity, 2),
+            "received_date": self.received.isoformat(),
+            "expiry_date": self.expiry.isoformat(),
+            "days_to_expiry": (self.expiry - as_of).days,
+            "estimated": self.estimated,
+        }
+
+
+class LotInventory:
+    """FEFO lots of the perishable items of one business."""
+
+    def __init__(self, last_date: datetime.date):
+        self.last_date = last_date                         # sales applied through this day
+        self.item_names: Dict[str, str] = {}
+        self.unit_cost: Dict[str, float] = {}
+        self.on_hand: Dict[str, float] = {}
+        self._item_heaps: Dict[str, List[tuple]] = {}
+        self._expiry_heap: List[tuple] = []
+        self._seq = itertools.count()
+        self.written_off: List[Dict[str, Any]] = []       # expired lots removed by `expire`, oldest first
+
+    def copy(self) -> "LotInventory":
+        """Returns an independent copy (heaps and lots cloned) to update while other callers keep using this one."""
+        other = copy.copy(self)
+        other.item_names, other.unit_cost, other.on_hand = dict(self.item_names), dict(self.unit_cost), dict(self.on_hand)
+        other.written_off = list(self.written_off)
+        # Both kinds of heap hold the same Lot objects; clone each lot once so they stay shared.
+        clones: Dict[int, Lot] = {}
+
+        def clone(entry: tuple) -> tuple:
+            expiry, seq, lot = entry
+            if id(lot) not in clones:
+                clones[id(lot)] = Lot(lot.lot_id, lot.item_id, lot.quantity, lot.received, lot.expiry, lot.estimated)
+            return expiry, seq, clones[id(lot)]
+
+        other._expiry_heap = [clone(entry) for entry in self._expiry_heap]
+        other._item_heaps = {item_id: [clone(entry) for entry in heap] for item_id, heap in self._item_heaps.items()}
+        other._seq = itertools.count(next(self._seq))
+        return other
+
+    def receive(self, item_id: str, quantity: float, received: datetime.date, shelf_life_days: int,
+                lot_id: Optional[str] = None, estimated: bool = False) -> Lot:
+        """Adds a lot expiring `shelf_life_days` after `received`."""
+        lot = Lot(lot_id or f"lot_{next(_lot_ids)}", item_id, float(quantity), received,
+                  received + datetime.timedelta(days=int(shelf_life_days)), estimated)
+        entry = (lot.expiry, next(self._seq), lot)
+        heapq.heappush(self._item_heaps.setdefault(item_id, []), entry)
+        heapq.heappush(self._expiry_heap, entry)
+        self.on_hand[item_id] = self.on_hand.get(item_id, 0.0) + lot.quantity
+        return lot
+
+    def expire(self, day: datetime.date) -> List[Dict[str, Any]]:
+        """Writes off every lot whose expiry date is before `day` and returns them."""
+        removed = []
+        while self._expiry_heap and self._expiry_heap[0][0] < day:
+            _, _, lot = heapq.heappop(self._expiry_heap)
+            if lot.quantity <= 0:
+                continue
+            record = dict(lot.to_dict(day), item_name=self.item_names.get(lot.item_id, lot.item_id),
+                          cost=round(lot.quantity * self.unit_cost.get(lot.item_id, 0.0), 2))
+            self.on_hand[lot.item_id] -= lot.quantity
+            lot.quantity = 0.0
+            removed.append(record)
+        self.written_off.extend(removed)
+        cutoff = (day - datetime.timedelta(days=WRITTEN_OFF_RETENTION_DAYS)).isoformat()
+        if self.written_off and self.written_off[0]["expiry_date"] < cutoff:
+            self.written_off = [record for record in self.written_off if record["expiry_date"] >= cutoff]
+        return removed
+
+    def consume(self, item_id: str, quantity: float) -> float:
+        """
+        Takes `quantity` units of an item from its earliest-expiring lots.
+
+        Returns:
+            float: Units that could not be covered by tracked lots.
+        """
+        heap = self._item_heaps.get(item_id)
+        remaining = float(quantity)
+        while heap and remaining > 0:
+            lot = heap[0][2]
+            if lot.quantity <= 0:
+                heapq.heappop(heap)
+                continue
+            taken = min(lot.quantity, remaining)
+            lot.quantity -= taken
+            remaining -= taken
+            self.on_hand[item_id] -= taken
+            if lot.quantity <= 0:
+                heapq.heappop(heap)
+        return remaining
+
+    def apply_day(self, day: datetime.date, units_by_item: Dict[str, float]) -> None:
+        """Expires lots before `day`, then removes that day's sales FEFO."""
+        self.expire(day)
+        for item_id, units in units_by_item.items():
+            if units > 0:
+                self.consume(item_id, units)
+        self.last_date = day
+
+    def _in_expiry_order(self) -> Iterator[Lot]:
+        """Yields non-empty lots by expiry date by walking the heap as a tree (O(log n) per lot)."""
+        heap = self._expiry_heap
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier:
+            (_, _, lot), i = heapq.heappop(frontier)
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+            if lot.quantity > 0:
+                yield lot
+
+    def next_expiring(self, limit: int = 10, before: Optional[datetime.date] = None) -> List[Lot]:
+        """The `limit` next lots to expire (optionally only those expiring before `before`)."""
+        lots = []
+        for lot in self._in_expiry_order():
+            if len(lots) >= limit or (before is not None and lot.expiry >= before):
+                break
+            lots.append(lot)
+        return lots
+
+    def projected_waste(self, daily_demand: Dict[str, float], as_of: datetime.date,
+                        horizon_days: int) -> List[Dict[str, Any]]:
+        """
+        Units of each lot expiring within `horizon_days` of `as_of` that are not expected
+        to sell before they expire, at the given average daily demand per item.
+        """
+        horizon = as_of + datetime.timedelta(days=horizon_days)
+        absorbed: Dict[str, float] = {}
+        waste = []
+        for lot in self._in_expiry_order():
+            if lot.expiry >= horizon:
+                break
+            days_left = max((lot.expiry - as_of).days + 1, 0)   # sellable through the expiry date
+            capacity = daily_demand.get(lot.item_id, 0.0) * days_left - absorbed.get(lot.item_id, 0.0)
+            sold = min(lot.quantity, max(capacity, 0.0))
+            absorbed[lot.item_id] = absorbed.get(lot.item_id, 0.0) + sold
+            wasted = lot.quantity - sold
+            if wasted > 0:
+                waste.append(dict(lot.to_dict(as_of), item_name=self.item_names.get(lot.item_id, lot.item_id),
+                                  projected_waste_units=round(wasted, 1),
+                                  projected_waste_cost=round(wasted * self.unit_cost.get(lot.item_id, 0.0), 2)))
+        return waste
+
+
+def build_lot_inventory(inventory: List[Dict[str, Any]], receipts: List[Dict[str, Any]],
+                        as_of: datetime.date) -> LotInventory:
+    """
+    Builds the lots behind the current stock level of every perishable item.
+
+    With FEFO (and one shelf life per item) the stock on hand is made of the most
+    recent deliveries, so receipts are assigned newest first until the stock level
+    is covered. Stock not covered by recorded receipts becomes one estimated lot
+    received `as_of` (its age is unknown).
+
+    Args:
+        inventory (List[Dict[str, Any]]): `inventory_item` rows.
+        receipts (List[Dict[str, Any]]): `inventory_lot` rows (lot_id, item_id, quantity, received_date).
+        as_of (datetime.date): Day the stock levels refer to (end of day).
+    """
+    lots = LotInventory(as_of)
+    by_item: Dict[str, List[Dict[str, Any]]] = {}
+    for receipt in receipts:
+        by_item.setdefault(receipt["item_id"], []).append(receipt)
+
+    for item in inventory:
+        shelf_life = int(item.get("shelf_life_days") or 0)
+        if not item.get("is_perishable") or shelf_life <= 0:
+            continue
+        item_id = item["item_id"]
+        lots.item_names[item_id] = item.get("item_name") or item_id
+        lots.unit_cost[item_id] = float(item.get("unit_cost") or 0.0)
+        lots.on_hand.setdefault(item_id, 0.0)
+        uncovered = float(item.get("current_stock_level") or 0)
+        for receipt in sorted(by_item.get(item_id, []), key=lambda r: _as_date(r["received_date"]), reverse=True):
+            if uncovered <= 0:
+                break
+            quantity = min(float(receipt.get("quantity") or 0), uncovered)
+            if quantity > 0:
+                lots.receive(item_id, quantity, _as_date(receipt["received_date"]), shelf_life, lot_id=receipt.get("lot_id"))
+                uncovered -= quantity
+        if uncovered > 0:
+            lots.receive(item_id, uncovered, as_of, shelf_life, estimated=True)
+    lots.expire(as_of + datetime.timedelta(days=1))   # anything already past its date is waste
+    return lots
+
+
+def _as_date(value: Any) -> datetime.date:
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value[:10])
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    return value
+
+
+# --- Lot inventory cache ---
+
+_cache_lock = threading.Lock()
+_inventories: Dict[str, LotInventory] = {}
+
+
+def get_cached_inventory(business_id: str) -> Optional[LotInventory]:
+    with _cache_lock:
+        return _inventories.get(business_id)
+
+
+def store_inventory(business_id: str, inventory: LotInventory) -> None:
+    with _cache_lock:
+        _inventories[business_id] = inventory
+
+
+def clear_cache(business_id: Optional[str] = None) -> None:
+    with _cache_lock:
+        if business_id is None:
+            _inventories.clear()
+        else:
+            _inventories.pop(business_id, None)
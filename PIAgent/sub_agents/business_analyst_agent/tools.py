@@ -1,27 +1,27 @@
 import uuid
-from google.cloud import bigquery
 import os
-from typing import Optional, List, Dict, Any, Union
+import contextvars
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Union, TYPE_CHECKING
 import json 
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
-# Import the new Places API client library
-import googlemaps
-from google.api_core.exceptions import GoogleAPIError
+import numpy as np
 
-import google.generativeai as genai 
-import dotenv
-dotenv.load_dotenv()
+# SDK modules and clients are created lazily on first use (see utils/api_clients.py)
+from ...utils.api_clients import bigquery, get_bq_client, get_gemini_model
+from ...utils.db_utils import run_query
+from ...utils.llm_utils import generate_content
+from ...utils.tracing import span, traced_tool
+from ...utils import insights, prefetch, session_context
+from ..comparision_agent.tools import db_get_competitors, db_get_processed_reviews
+from . import anomalies, basket, cohorts, cube, elasticity, fefo, forecasting, replenishment, simulation
 
 # from ..comparision_agent.tools import db_get_business_details
 
-# --- Gemini API Configuration ---
-GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GEMINI_API_KEY:
-    print("Warning: GEMINI_API_KEY environment variable not set. Gemini API calls might fail.")
-else:
-    genai.configure(api_key=GEMINI_API_KEY)
-    print("Gemini API configured.")
+if TYPE_CHECKING:
+    from google.adk.tools import ToolContext
 
 # --- BigQuery Configuration ---
 PROJECT_ID = 'profitpilot-2cc51'
@@ -32,33 +32,7 @@ TABLE_COMPETITOR = f"{PROJECT_ID}.{DATASET_ID}.competitor"
 TABLE_BUSINESS_REVIEW = f"{PROJECT_ID}.{DATASET_ID}.business_review" 
 TABLE_INVENTORY_ITEM = f"{PROJECT_ID}.{DATASET_ID}.inventory_item"
 TABLE_SALES_TRANSACTION = f"{PROJECT_ID}.{DATASET_ID}.sales_transaction"
-# --- BigQuery Client Initialization ---
-try:
-    bq_client = bigquery.Client(project=PROJECT_ID, location='US')
-    print(f"BigQuery client initialized for project: {PROJECT_ID}")
-except Exception as e:
-    print(f"Error initializing BigQuery client: {e}")
-    bq_client = None
-
-# --- Google Maps API Configuration ---
-Maps_API_KEY = os.getenv("GOOGLE_MAP_API_KEY")
-try:
-    if Maps_API_KEY:
-        places_client = googlemaps.Client(key=Maps_API_KEY)
-        print("Google Places API (Older) client initialized.")
-    # places_client = places.PlacesClient()
-    # print("New Google Places API client initialized.")
-except Exception as e:
-    print(f"Error initializing New Google Places API client: {e}")
-    places_client = None
-
-# --- Gemini Model Initialization ---
-try:
-    gemini_model = genai.GenerativeModel('gemini-1.5-flash') # Or 'gemini-pro'
-    print("Gemini model initialized for text generation.")
-except Exception as e:
-    print(f"Error initializing Gemini model: {e}")
-    gemini_model = None
+TABLE_INVENTORY_LOT = f"{PROJECT_ID}.{DATASET_ID}.inventory_lot"
 
 # --- New Tools for Comparative Agent ---
 def db_get_item_pricing_data(business_id: str, item_name: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -67,6 +41,7 @@ def db_get_item_pricing_data(business_id: str, item_name: Optional[str] = None)
     Combines inventory costs with sales prices and profits.
     """
     print(f"\n--- Tool Call: db_get_item_pricing_data ---")
+    bq_client = get_bq_client(PROJECT_ID)
     if not bq_client:
         print("BigQuery client not initialized.")
         return []
@@ -76,6 +51,7 @@ def db_get_item_pricing_data(business_id: str, item_name: Optional[str] = None)
     SELECT
         item_id,
         item_name,
+        category,
         unit_cost,
         unit_price AS current_unit_price,
         reorder_threshold,
@@ -121,13 +97,13 @@ def db_get_item_pricing_data(business_id: str, item_name: Optional[str] = None)
     all_item_data = {}
 
     try:
-        inventory_results = bq_client.query(inventory_query, job_config=inventory_job_config).result()
+        inventory_results = run_query(bq_client, inventory_query, job_config=inventory_job_config, tool_name="db_get_item_pricing_data", business_id=business_id).result()
         for row in inventory_results:
             item_id = row.item_id
             all_item_data[item_id] = dict(row)
             all_item_data[item_id]['sales_data_available'] = False # Flag
 
-        sales_results = bq_client.query(sales_query, job_config=sales_job_config).result()
+        sales_results = run_query(bq_client, sales_query, job_config=sales_job_config, tool_name="db_get_item_pricing_data", business_id=business_id).result()
         for row in sales_results:
             item_id = row.item_id
             if item_id in all_item_data:
@@ -149,12 +125,15 @@ def db_get_item_pricing_data(business_id: str, item_name: Optional[str] = None)
         print(f"Error fetching pricing data from BigQuery: {e}")
         return []
 
-def db_get_sales_trends_data(business_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict[str, Any]]:
+def db_get_sales_trends_data(business_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                             after_timestamp: Optional[str] = None) -> List[Dict[str, Any]]:
     """
     Fetches sales transaction data for trend analysis within a given date range.
-    Dates should be in 'YYYY-MM-DD' format.
+    Dates should be in 'YYYY-MM-DD' format. With `after_timestamp` (ISO timestamp)
+    only lines recorded after it are returned.
     """
     print(f"\n--- Tool Call: db_get_sales_trends_data ---")
+    bq_client = get_bq_client(PROJECT_ID)
     if not bq_client:
         print("BigQuery client not initialized.")
         return []
@@ -185,16 +164,18 @@ def db_get_sales_trends_data(business_id: str, start_date: Optional[str] = None,
         parameters.append(
             bigquery.ScalarQueryParameter("end_date", "DATE", datetime.strptime(end_date, '%Y-%m-%d').date())
         )
+    if after_timestamp:
+        query += " AND timestamp > @after_timestamp"
+        parameters.append(
+            bigquery.ScalarQueryParameter("after_timestamp", "TIMESTAMP", datetime.fromisoformat(after_timestamp))
+        )
 
     job_config = bigquery.QueryJobConfig(query_parameters=parameters)
 
     query += " ORDER BY timestamp ASC"
-    print("Executing Query:\n", query)
-    # Corrected print statement: removed .field_type
-    print("With Parameters:\n", [f"{p.name}={p.value}" for p in parameters])
 
     try:
-        query_job = bq_client.query(query, job_config=job_config)
+        query_job = run_query(bq_client, query, job_config=job_config, tool_name="db_get_sales_trends_data", business_id=business_id)
         results = query_job.result()
         return [dict(row) for row in results]
     except Exception as e:
@@ -205,19 +186,27 @@ def db_get_inventory_status(business_id: str, low_stock_only: bool = False) -> L
     """
     Fetches current inventory levels, optionally filtered for low stock items.
     """
+    prefetched = prefetch.cached("inventory_status", business_id)
+    if prefetched is not None:
+        if low_stock_only:
+            return [row for row in prefetched if (row.get("current_stock_level") or 0) <= (row.get("reorder_threshold") or 0)]
+        return prefetched
     print(f"\n--- Tool Call: db_get_inventory_status ---")
+    bq_client = get_bq_client(PROJECT_ID)
     if not bq_client:
         print("BigQuery client not initialized.")
         return []
 
     query = f"""
     SELECT
+        item_id,
         item_name,
         category,
         current_stock_level,
         reorder_threshold,
         is_perishable,
-        shelf_life_days
+        shelf_life_days,
+        unit_cost
     FROM `{TABLE_INVENTORY_ITEM}`
     WHERE business_id = @business_id
     """
@@ -233,25 +222,498 @@ def db_get_inventory_status(business_id: str, low_stock_only: bool = False) -> L
     query += " ORDER BY item_name ASC"
 
     try:
-        query_job = bq_client.query(query, job_config=job_config)
+        query_job = run_query(bq_client, query, job_config=job_config, tool_name="db_get_inventory_status", business_id=business_id)
         results = query_job.result()
         return [dict(row) for row in results]
     except Exception as e:
         print(f"Error fetching inventory status from BigQuery: {e}")
         return []
 
+def db_get_daily_item_sales(business_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Fetches daily per-item sales totals (units, revenue, profit, average price).
+    Dates should be in 'YYYY-MM-DD' format. Ranges inside the prefetched recent
+    rollup are served from it.
+    """
+    prefetched = prefetch.cached("daily_item_sales", business_id) if start_date and end_date else None
+    if prefetched is not None and prefetched["start_date"] <= start_date and end_date <= prefetched["end_date"]:
+        return [row for row in prefetched["rows"] if start_date <= str(row["transaction_date"])[:10] <= end_date]
+    print(f"\n--- Tool Call: db_get_daily_item_sales ---")
+    bq_client = get_bq_client(PROJECT_ID)
+    if not bq_client:
+        print("BigQuery client not initialized.")
+        return []
+
+    query = f"""
+    SELECT
+        item_id,
+        item_name,
+        transaction_date,
+        SUM(quantity) AS units,
+        SUM(total_line_revenue) AS revenue,
+        SUM(total_line_profit) AS profit,
+        AVG(price_per_unit) AS avg_price
+    FROM `{TABLE_SALES_TRANSACTION}`
+    WHERE business_id = @business_id
+    """
+    parameters = [
+        bigquery.ScalarQueryParameter("business_id", "STRING", business_id),
+    ]
+    if start_date:
+        query += " AND transaction_date >= @start_date"
+        parameters.append(
+            bigquery.ScalarQueryParameter("start_date", "DATE", datetime.strptime(start_date, '%Y-%m-%d').date())
+        )
+    if end_date:
+        query += " AND transaction_date <= @end_date"
+        parameters.append(
+            bigquery.ScalarQueryParameter("end_date", "DATE", datetime.strptime(end_date, '%Y-%m-%d').date())
+        )
+    query += " GROUP BY item_id, item_name, transaction_date ORDER BY transaction_date ASC"
+
+    try:
+        query_job = run_query(bq_client, query, query_parameters=parameters, tool_name="db_get_daily_item_sales", business_id=business_id)
+        return [dict(row) for row in query_job.result()]
+    except Exception as e:
+        print(f"Error fetching daily item sales from BigQuery: {e}")
+        return []
+
+def db_get_transaction_items(business_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Fetches, per item, the transactions it was bought in over the date range, for
+    basket (bought-together) analysis. Dates should be in 'YYYY-MM-DD' format.
+
+    BigQuery groups the line items by item and returns each item's transactions as
+    an array of distinct integer keys (FARM_FINGERPRINT of the transaction ID), so
+    the result is one row per item rather than one per line item, and the keys
+    arrive as arrays ready for the basket matrix.
+
+    Returns:
+        List[Dict[str, Any]]: 'item_id', 'item_name' and 'transactions' (an int64 array)
+                              for each item sold in the range.
+    """
+    print(f"\n--- Tool Call: db_get_transaction_items ---")
+    bq_client = get_bq_client(PROJECT_ID)
+    if not bq_client:
+        print("BigQuery client not initialized.")
+        return []
+
+    query = f"""
+    SELECT
+        item_id,
+        ANY_VALUE(item_name) AS item_name,
+        ARRAY_AGG(DISTINCT FARM_FINGERPRINT(transaction_id)) AS transactions
+    FROM `{TABLE_SALES_TRANSACTION}`
+    WHERE business_id = @business_id
+    """
+    parameters = [
+        bigquery.ScalarQueryParameter("business_id", "STRING", business_id),
+    ]
+    if start_date:
+        query += " AND transaction_date >= @start_date"
+        parameters.append(
+            bigquery.ScalarQueryParameter("start_date", "DATE", datetime.strptime(start_date, '%Y-%m-%d').date())
+        )
+    if end_date:
+        query += " AND transaction_date <= @end_date"
+        parameters.append(
+            bigquery.ScalarQueryParameter("end_date", "DATE", datetime.strptime(end_date, '%Y-%m-%d').date())
+        )
+    query += " GROUP BY item_id ORDER BY item_id"
+
+    try:
+        query_job = run_query(bq_client, query, query_parameters=parameters, tool_name="db_get_transaction_items", business_id=business_id)
+        return [{"item_id": row["item_id"], "item_name": row["item_name"],
+                 "transactions": np.asarray(row["transactions"], dtype=np.int64)}
+                for row in query_job.result()]
+    except Exception as e:
+        print(f"Error fetching transaction items from BigQuery: {e}")
+        return []
+
+def db_get_sales_cube_rows(business_id: str, start_date: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Fetches sales summed by day, hour, item and payment method (with the item's
+    category) from `start_date` ('YYYY-MM-DD') on, for the in-memory sales cube.
+    """
+    print(f"\n--- Tool Call: db_get_sales_cube_rows ---")
+    bq_client = get_bq_client(PROJECT_ID)
+    if not bq_client:
+        print("BigQuery client not initialized.")
+        return []
+
+    query = f"""
+    SELECT
+        s.transaction_date,
+        EXTRACT(HOUR FROM s.timestamp) AS hour,
+        s.item_id,
+        s.item_name,
+        i.category,
+        s.payment_method,
+        SUM(s.total_line_revenue) AS revenue,
+        SUM(s.quantity) AS units,
+        SUM(s.total_line_profit) AS profit,
+        COUNT(*) AS line_items
+    FROM `{TABLE_SALES_TRANSACTION}` s
+    LEFT JOIN `{TABLE_INVENTORY_ITEM}` i
+        ON i.item_id = s.item_id AND i.business_id = s.business_id
+    WHERE s.business_id = @business_id
+    """
+    parameters = [
+        bigquery.ScalarQueryParameter("business_id", "STRING", business_id),
+    ]
+    if start_date:
+        query += " AND s.transaction_date >= @start_date"
+        parameters.append(
+            bigquery.ScalarQueryParameter("start_date", "DATE", datetime.strptime(start_date, '%Y-%m-%d').date())
+        )
+    query += " GROUP BY s.transaction_date, hour, s.item_id, s.item_name, i.category, s.payment_method"
+
+    try:
+        query_job = run_query(bq_client, query, query_parameters=parameters, tool_name="db_get_sales_cube_rows", business_id=business_id)
+        return [dict(row) for row in query_job.result()]
+    except Exception as e:
+        print(f"Error fetching sales cube rows from BigQuery: {e}")
+        return []
+
+def db_get_customer_purchases(business_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Fetches one row per customer and purchase day (orders, revenue, profit) for
+    transactions with a customer_id, with the customer's first purchase date over
+    the whole history (`first_purchase_date`, not limited to the dates asked for).
+    Dates should be in 'YYYY-MM-DD' format.
+    """
+    print(f"\n--- Tool Call: db_get_customer_purchases ---")
+    bq_client = get_bq_client(PROJECT_ID)
+    if not bq_client:
+        print("BigQuery client not initialized.")
+        return []
+
+    query = f"""
+    WITH first_purchases AS (
+        SELECT customer_id, MIN(transaction_date) AS first_purchase_date
+        FROM `{TABLE_SALES_TRANSACTION}`
+        WHERE business_id = @business_id AND customer_id IS NOT NULL
+        GROUP BY customer_id
+    )
+    SELECT
+        customer_id,
+        transaction_date,
+        COUNT(DISTINCT transaction_id) AS orders,
+        SUM(total_line_revenue) AS revenue,
+        SUM(total_line_profit) AS profit,
+        ANY_VALUE(first_purchase_date) AS first_purchase_date
+    FROM `{TABLE_SALES_TRANSACTION}` JOIN first_purchases USING (customer_id)
+    WHERE business_id = @business_id AND customer_id IS NOT NULL
+    """
+    parameters = [
+        bigquery.ScalarQueryParameter("business_id", "STRING", business_id),
+    ]
+    if start_date:
+        query += " AND transaction_date >= @start_date"
+        parameters.append(
+            bigquery.ScalarQueryParameter("start_date", "DATE", datetime.strptime(start_date, '%Y-%m-%d').date())
+        )
+    if end_date:
+        query += " AND transaction_date <= @end_date"
+        parameters.append(
+            bigquery.ScalarQueryParameter("end_date", "DATE", datetime.strptime(end_date, '%Y-%m-%d').date())
+        )
+    query += " GROUP BY customer_id, transaction_date"
+
+    try:
+        query_job = run_query(bq_client, query, query_parameters=parameters, tool_name="db_get_customer_purchases", business_id=business_id)
+        return [dict(row) for row in query_job.result()]
+    except Exception as e:
+        print(f"Error fetching customer purchases from BigQuery: {e}")
+        return []
+
+def db_get_inventory_lots(business_id: str, since_date: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Fetches recorded deliveries (lots) of inventory items received on or after
+    `since_date` ('YYYY-MM-DD').
+    """
+    print(f"\n--- Tool Call: db_get_inventory_lots ---")
+    bq_client = get_bq_client(PROJECT_ID)
+    if not bq_client:
+        print("BigQuery client not initialized.")
+        return []
+
+    query = f"""
+    SELECT
+        lot_id,
+        item_id,
+        quantity,
+        received_date
+    FROM `{TABLE_INVENTORY_LOT}`
+    WHERE business_id = @business_id
+    """
+    parameters = [
+        bigquery.ScalarQueryParameter("business_id", "STRING", business_id),
+    ]
+    if since_date:
+        query += " AND received_date >= @since_date"
+        parameters.append(
+            bigquery.ScalarQueryParameter("since_date", "DATE", datetime.strptime(since_date, '%Y-%m-%d').date())
+        )
+
+    try:
+        query_job = run_query(bq_client, query, query_parameters=parameters, tool_name="db_get_inventory_lots", business_id=business_id)
+        return [dict(row) for row in query_job.result()]
+    except Exception as e:
+        print(f"Error fetching inventory lots from BigQuery: {e}")
+        return []
+
+def db_insert_inventory_lot(business_id: str, item_id: str, quantity: int, received_date: date) -> Optional[str]:
+    """
+    Records a delivery in the `inventory_lot` table and adds it to the item's
+    `current_stock_level`. Returns the new lot_id, or None on failure.
+    """
+    print(f"\n--- Tool Call: db_insert_inventory_lot ---")
+    bq_client = get_bq_client(PROJECT_ID)
+    if not bq_client:
+        print("BigQuery client not initialized. Cannot record delivery.")
+        return None
+
+    lot_id = str(uuid.uuid4())
+    insert_query = f"""
+    INSERT INTO `{TABLE_INVENTORY_LOT}` (lot_id, business_id, item_id, quantity, received_date)
+    VALUES (@lot_id, @business_id, @item_id, @quantity, @received_date)
+    """
+    update_query = f"""
+    UPDATE `{TABLE_INVENTORY_ITEM}`
+    SET current_stock_level = current_stock_level + @quantity, last_updated = CURRENT_TIMESTAMP()
+    WHERE business_id = @business_id AND item_id = @item_id
+    """
+    parameters = [
+        bigquery.ScalarQueryParameter("lot_id", "STRING", lot_id),
+        bigquery.ScalarQueryParameter("business_id", "STRING", business_id),
+        bigquery.ScalarQueryParameter("item_id", "STRING", item_id),
+        bigquery.ScalarQueryParameter("quantity", "INT64", int(quantity)),
+        bigquery.ScalarQueryParameter("received_date", "DATE", received_date),
+    ]
+
+    try:
+        run_query(bq_client, insert_query, query_parameters=parameters, tool_name="db_insert_inventory_lot", business_id=business_id)
+        run_query(bq_client, update_query, query_parameters=parameters[1:4], tool_name="db_insert_inventory_lot", business_id=business_id)
+        prefetch.invalidate(business_id, "inventory_status")
+        insights.invalidate(business_id, "health_report", "inventory_report", "pricing_advice")
+        return lot_id
+    except Exception as e:
+        print(f"Error recording delivery in BigQuery: {e}")
+        return None
+
+def db_get_data_watermark(business_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns how far the business's sales data goes: the latest transaction
+    timestamp (ISO string) and the number of sales lines. Two equal watermarks
+    mean no sales were loaded in between.
+    """
+    print(f"\n--- Tool Call: db_get_data_watermark ---")
+    bq_client = get_bq_client(PROJECT_ID)
+    if not bq_client:
+        print("BigQuery client not initialized.")
+        return None
+
+    query = f"""
+    SELECT MAX(timestamp) AS last_transaction, COUNT(*) AS line_items
+    FROM `{TABLE_SALES_TRANSACTION}`
+    WHERE business_id = @business_id
+    """
+    parameters = [
+        bigquery.ScalarQueryParameter("business_id", "STRING", business_id),
+    ]
+
+    try:
+        query_job = run_query(bq_client, query, query_parameters=parameters, tool_name="db_get_data_watermark", business_id=business_id)
+        row = next(iter(query_job.result()), None)
+        if row is None or row.last_transaction is None:
+            return None
+        last = row.last_transaction
+        return {
+            "last_transaction": last.isoformat() if isinstance(last, (date, datetime)) else str(last),
+            "line_items": int(row.line_items),
+        }
+    except Exception as e:
+        print(f"Error fetching the data watermark from BigQuery: {e}")
+        return None
+
+def db_get_inventory_version(business_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns the latest `inventory_item` change (ISO string) and the number of
+    items. Stock deliveries and POS stock updates move it; sales alone may not.
+    """
+    print(f"\n--- Tool Call: db_get_inventory_version ---")
+    bq_client = get_bq_client(PROJECT_ID)
+    if not bq_client:
+        print("BigQuery client not initialized.")
+        return None
+
+    query = f"""
+    SELECT MAX(last_updated) AS last_updated, COUNT(*) AS item_count
+    FROM `{TABLE_INVENTORY_ITEM}`
+    WHERE business_id = @business_id
+    """
+    parameters = [
+        bigquery.ScalarQueryParameter("business_id", "STRING", business_id),
+    ]
+
+    try:
+        query_job = run_query(bq_client, query, query_parameters=parameters, tool_name="db_get_inventory_version", business_id=business_id)
+        row = next(iter(query_job.result()), None)
+        if row is None or not row.item_count:
+            return None
+        last = row.last_updated
+        return {
+            "last_updated": last.isoformat() if isinstance(last, (date, datetime)) else str(last),
+            "item_count": int(row.item_count),
+        }
+    except Exception as e:
+        print(f"Error fetching the inventory version from BigQuery: {e}")
+        return None
+
+def db_count_sales_lines(business_id: str, start_date: str, after_timestamp: str) -> Optional[int]:
+    """
+    Counts the sales lines dated from `start_date` ('YYYY-MM-DD') on and recorded after
+    `after_timestamp` (ISO timestamp), without reading them.
+    """
+    print(f"\n--- Tool Call: db_count_sales_lines ---")
+    bq_client = get_bq_client(PROJECT_ID)
+    if not bq_client:
+        print("BigQuery client not initialized.")
+        return None
+
+    query = f"""
+    SELECT COUNT(*) AS line_items
+    FROM `{TABLE_SALES_TRANSACTION}`
+    WHERE business_id = @business_id
+      AND transaction_date >= @start_date
+      AND timestamp > @after_timestamp
+    """
+    parameters = [
+        bigquery.ScalarQueryParameter("business_id", "STRING", business_id),
+        bigquery.ScalarQueryParameter("start_date", "DATE", datetime.strptime(start_date, '%Y-%m-%d').date()),
+        bigquery.ScalarQueryParameter("after_timestamp", "TIMESTAMP", datetime.fromisoformat(after_timestamp)),
+    ]
+
+    try:
+        query_job = run_query(bq_client, query, query_parameters=parameters, tool_name="db_count_sales_lines", business_id=business_id)
+        row = next(iter(query_job.result()), None)
+        return int(row.line_items) if row is not None else 0
+    except Exception as e:
+        print(f"Error counting sales lines in BigQuery: {e}")
+        return None
+
+def _data_watermark(business_id: str, tool_context: Optional["ToolContext"] = None) -> Optional[Dict[str, Any]]:
+    """The session's data watermark, or a fresh one outside an agent run; keys the insight store."""
+    return session_context.get_data_watermark(tool_context, business_id, db_get_data_watermark)
+
+def _stock_watermark(business_id: str, tool_context: Optional["ToolContext"] = None) -> Optional[Dict[str, Any]]:
+    """The data watermark plus the inventory version, for insights that also read `inventory_item`."""
+    watermark = _data_watermark(business_id, tool_context)
+    if watermark is None:
+        return None
+    return dict(watermark, inventory_version=session_context.get_inventory_version(
+        tool_context, business_id, db_get_inventory_version))
+
+PREFETCH_SALES_DAYS = 90
+
+def _prefetch_daily_item_sales(business_id: str) -> Dict[str, Any]:
+    """The daily per-item rollup of the last PREFETCH_SALES_DAYS full days, for `prefetch`."""
+    end_date = datetime.now().date() - timedelta(days=1)
+    start_date = end_date - timedelta(days=PREFETCH_SALES_DAYS - 1)
+    return {
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "rows": db_get_daily_item_sales(business_id, start_date.isoformat(), end_date.isoformat()),
+    }
+
+# Loaded in the background as soon as a conversation names a business (see utils/prefetch.py).
+prefetch.register("inventory_status", db_get_inventory_status)
+prefetch.register("daily_item_sales", _prefetch_daily_item_sales)
+
 # --- NEW AGENT HELPER FUNCTIONS FOR BUSINESS ANALYST ---
 
-def agent_provide_pricing_advice(business_id: str, item_name: Optional[str] = None) -> str:
+ELASTICITY_HISTORY_DAYS = 180
+PRICE_TEST_CHANGE = 0.05   # effects of +/-5% price changes are reported per item
+
+def _load_elasticity_model(business_id: str, end_date: date, categories: Dict[str, Optional[str]]) -> Any:
+    """
+    Returns the elasticity model for a business as of `end_date`, adding only
+    the days since the cached model's last date (or fitting the last
+    ELASTICITY_HISTORY_DAYS days when nothing usable is cached).
+    """
+    model = elasticity.get_cached_model(business_id)
+    if model is None or model.last_date is None or model.last_date > end_date:
+        model = elasticity.ElasticityModel()
+        first_new = end_date - timedelta(days=ELASTICITY_HISTORY_DAYS - 1)
+    else:
+        # The cached model may be in use by another call; update a copy and swap it in.
+        model = model.copy()
+        first_new = model.last_date + timedelta(days=1)
+    if first_new <= end_date:
+        rows = db_get_daily_item_sales(business_id, first_new.isoformat(), end_date.isoformat())
+        model.add_observations(rows, end_date)
+    model.set_categories(categories)
+    with span("elasticity.estimate", **{"profitpilot.items": len(model.item_ids)}):
+        model.estimate()
+    elasticity.store_model(business_id, model)
+    return model
+
+def _add_elasticity_estimates(pricing_data: List[Dict[str, Any]], model: Any) -> None:
+    """Adds elasticity and the expected monthly effect of +/-5% price changes to each pricing row."""
+    rows = [row for row in pricing_data if row.get('item_id') in model.index]
+    if not rows:
+        return
+    idx = np.array([model.index[row['item_id']] for row in rows])
+    price = np.array([float(row.get('current_unit_price') or row.get('avg_sales_price') or 0.0) for row in rows])
+    unit_cost = np.array([float(row.get('unit_cost') or 0.0) for row in rows])
+    monthly_units = model.avg_daily_units[idx] * 30
+    up = elasticity.price_change_effects(price, unit_cost, monthly_units, model.elasticity[idx], PRICE_TEST_CHANGE)
+    down = elasticity.price_change_effects(price, unit_cost, monthly_units, model.elasticity[idx], -PRICE_TEST_CHANGE)
+    for k, row in enumerate(rows):
+        i = idx[k]
+        row['price_elasticity'] = round(float(model.elasticity[i]), 2)
+        row['elasticity_std_error'] = round(float(model.std_error[i]), 2)
+        row['elasticity_own_data_weight'] = round(float(model.shrink_weight[i]), 2)
+        row['monthly_profit_delta_if_price_up_5pct'] = round(float(up['profit_delta'][k]), 2)
+        row['monthly_profit_delta_if_price_down_5pct'] = round(float(down['profit_delta'][k]), 2)
+
+def _pricing_with_elasticity(business_id: str, item_name: Optional[str], as_of: date) -> List[Dict[str, Any]]:
+    """Pricing rows (see `db_get_item_pricing_data`) with elasticity estimates added where available."""
+    pricing_data = db_get_item_pricing_data(business_id, item_name)
+    if not pricing_data:
+        return []
+    categories = {row.get('item_id'): row.get('category') for row in pricing_data}
+    try:
+        model = _load_elasticity_model(business_id, as_of - timedelta(days=1), categories)
+        _add_elasticity_estimates(pricing_data, model)
+    except Exception as e:
+        print(f"Warning: could not estimate price elasticities: {e}")
+    return pricing_data
+
+@traced_tool
+def agent_provide_pricing_advice(business_id: str, item_name: Optional[str] = None, as_of_date: Optional[str] = None,
+                                 tool_context: Optional["ToolContext"] = None) -> str:
     """
-    Provides pricing advice based on inventory costs and sales data.
+    Provides pricing advice based on inventory costs, sales data and each item's
+    measured price elasticity (from the last 6 months of daily prices and units).
     Can be called for a specific item or for all items.
+    `as_of_date` ('YYYY-MM-DD') defaults to today. `tool_context` is injected by the ADK
+    (session business context).
     """
     print(f"\n--- Tool Call: agent_provide_pricing_advice ---")
+    as_of = datetime.strptime(as_of_date, '%Y-%m-%d').date() if as_of_date else datetime.now().date()
+    watermark = _stock_watermark(business_id, tool_context)
+    variant = {"item_name": (item_name or "").lower(), "as_of": as_of.isoformat()}
+    stored = insights.get_insight(business_id, "pricing_advice", watermark, variant)
+    if stored:
+        return stored["payload"]
+
+    gemini_model = get_gemini_model()
     if not gemini_model:
         return "Error: Gemini model not initialized for pricing advice."
 
-    pricing_data = db_get_item_pricing_data(business_id, item_name)
+    pricing_data = _pricing_with_elasticity(business_id, item_name, as_of)
 
     if not pricing_data:
         return "No pricing data found for your business." + (f" for item '{item_name}'." if item_name else ".")
@@ -277,26 +739,252 @@ def agent_provide_pricing_advice(business_id: str, item_name: Optional[str] = No
     - `total_quantity_sold`: Total units sold.
     - `reorder_threshold`: Stock level to reorder.
     - `current_stock_level`: Current stock.
+    - `price_elasticity`: Measured % change in units sold per 1% price change (e.g. -0.5 = a 10% price rise loses about 5% of units).
+      Between -1 and 0 demand is inelastic (raising price raises revenue); below -1 it is elastic.
+    - `elasticity_std_error`, `elasticity_own_data_weight`: Uncertainty, and how much the estimate relies on the item's own
+      price history versus its category (low weight = little price variation observed, treat as indicative).
+    - `monthly_profit_delta_if_price_up_5pct` / `monthly_profit_delta_if_price_down_5pct`: Expected change in monthly profit.
+
+    Base any recommended price change on the elasticity and the profit deltas above rather than on intuition,
+    and mention when an estimate is uncertain.
 
     Present your advice in a clear, concise, and structured markdown format, with headings and bullet points.
     """
 
     try:
-        response = gemini_model.generate_content(prompt)
-        return response.text
+        response = generate_content(gemini_model, prompt)
     except Exception as e:
         return f"Error generating pricing advice with Gemini: {e}"
+    insights.store_insight(business_id, "pricing_advice", response.text, watermark, variant, metrics=pricing_data)
+    return response.text
+
+WHAT_IF_SIMULATIONS = 5000
+WHAT_IF_MAX_CELLS = 5_000_000   # simulations x changed items per call
+WHAT_IF_MAX_ITEMS = 20
+
+@traced_tool
+def agent_simulate_price_changes(business_id: str, item_names: List[str], price_change_pcts: List[float],
+                                 days: int = 30, as_of_date: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Simulates the effect of price changes or promotions on revenue and profit
+    ("what happens if I raise X by 10%?"). Runs thousands of demand scenarios
+    per item using each item's measured price elasticity and sales variability.
+
+    Args:
+        business_id (str): The business to simulate.
+        item_names (List[str]): Items to change, matched case-insensitively. Use ["all"] for the whole catalog.
+        price_change_pcts (List[float]): Price change in percent for each entry of `item_names`
+            (10 = raise by 10%, -20 = a 20% discount/promotion). A single value applies to every item listed.
+        days (int): Length of the period to simulate (e.g. the promotion length). Defaults to 30.
+        as_of_date (Optional[str]): 'YYYY-MM-DD' date the simulation starts from. Defaults to today.
+
+    Returns:
+        Dict[str, Any]: Baseline revenue/profit for the period, expected revenue/profit/unit
+                        changes with 90% intervals, the probability that profit rises,
+                        and per-item results; or 'error'.
+    """
+    print(f"\n--- Tool Call: agent_simulate_price_changes ---")
+    if not item_names or not price_change_pcts:
+        return {"error": "Provide at least one item name and price change."}
+    if len(price_change_pcts) == 1:
+        price_change_pcts = list(price_change_pcts) * len(item_names)
+    if len(price_change_pcts) != len(item_names):
+        return {"error": "Provide one price change per item name (or a single change for all)."}
+
+    pricing_data = [row for row in db_get_item_pricing_data(business_id) if row.get('item_id')]
+    if not pricing_data:
+        return {"error": "No pricing data found for your business."}
+
+    as_of = datetime.strptime(as_of_date, '%Y-%m-%d').date() if as_of_date else datetime.now().date()
+    categories = {row['item_id']: row.get('category') for row in pricing_data}
+    model = _load_elasticity_model(business_id, as_of - timedelta(days=1), categories)
+
+    by_name = {str(row.get('item_name', '')).lower(): k for k, row in enumerate(pricing_data)}
+    change = np.zeros(len(pricing_data))
+    unknown = []
+    for name, pct in zip(item_names, price_change_pcts):
+        if str(name).lower() == "all":
+            change[:] = float(pct) / 100
+        elif str(name).lower() in by_name:
+            change[by_name[str(name).lower()]] = float(pct) / 100
+        else:
+            unknown.append(name)
+    if unknown:
+        return {"error": f"Unknown item(s): {', '.join(unknown)}.",
+                "known_items": sorted(row.get('item_name') for row in pricing_data)[:50]}
+    if np.any(change <= -1):
+        return {"error": "Price changes must be greater than -100%."}
+    if not np.any(change):
+        return {"error": "All price changes are zero; nothing to simulate."}
+
+    idx = np.array([model.index.get(row['item_id'], -1) for row in pricing_data])
+    modelled = idx >= 0
+    safe_idx = np.where(modelled, idx, 0)
+    price = np.array([float(row.get('current_unit_price') or row.get('avg_sales_price') or 0.0) for row in pricing_data])
+    unit_cost = np.array([float(row.get('unit_cost') or 0.0) for row in pricing_data])
+    daily_units = np.where(modelled, model.avg_daily_units[safe_idx], 0.0)
+    days = max(1, min(int(days), 365))
+
+    # Unchanged items contribute exactly zero change, so only the changed ones are simulated.
+    changed = np.flatnonzero(change)
+    n_simulations = max(1000, min(WHAT_IF_SIMULATIONS, WHAT_IF_MAX_CELLS // max(changed.size, 1)))
+    with span("simulation.price_changes", **{"profitpilot.items": int(changed.size), "profitpilot.simulations": n_simulations}):
+        result = simulation.simulate_price_changes(
+            price[changed], unit_cost[changed], daily_units[changed],
+            elasticity=np.where(modelled, model.elasticity[safe_idx], elasticity.DEFAULT_ELASTICITY)[changed],
+            elasticity_se=np.where(modelled, model.std_error[safe_idx], np.sqrt(elasticity.PRIOR_VARIANCE))[changed],
+            residual_sigma=np.where(modelled, model.residual_sigma[safe_idx], 0.0)[changed],
+            change=change[changed], days=days, n_simulations=n_simulations,
+        )
+
+    def interval(values: np.ndarray) -> Dict[str, float]:
+        return {"expected": round(float(values[0]), 2), "low": round(float(values[1]), 2), "high": round(float(values[2]), 2)}
+
+    top = np.argsort(-np.abs(result["item_profit_delta"][0]))[:WHAT_IF_MAX_ITEMS]
+    return {
+        "period_days": days,
+        "simulations": n_simulations,
+        "items_changed": int(changed.size),
+        "baseline_revenue": round(float((price * daily_units).sum() * days), 2),
+        "baseline_profit": round(float(((price - unit_cost) * daily_units).sum() * days), 2),
+        "revenue_change": interval(result["revenue_delta"]),
+        "profit_change": interval(result["profit_delta"]),
+        "units_change": interval(result["units_delta"]),
+        "probability_profit_increases": round(float(result["probability_profit_up"][0]), 3),
+        "items": [
+            {
+                "item_name": pricing_data[k].get('item_name'),
+                "price_change_pct": round(float(change[k]) * 100, 1),
+                "current_price": round(float(price[k]), 2),
+                "new_price": round(float(price[k] * (1 + change[k])), 2),
+                "price_elasticity": round(float(model.elasticity[idx[k]]), 2) if modelled[k] else None,
+                "revenue_change": interval(result["item_revenue_delta"][:, j]),
+                "profit_change": interval(result["item_profit_delta"][:, j]),
+            }
+            for j, k in ((j, changed[j]) for j in top)
+        ],
+        "note": "Intervals are 90%. Effects on other items (customers switching) are not modelled.",
+    }
 
-def agent_analyze_sales_trends(business_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None, time_period: str = "last 30 days") -> str:
+@traced_tool
+def agent_find_product_bundles(business_id: str, item_name: Optional[str] = None, days: int = 90,
+                               as_of_date: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Finds items that are frequently bought together (market basket analysis),
+    to suggest bundles, combo deals and cross-selling.
+
+    Args:
+        business_id (str): The business to analyze.
+        item_name (Optional[str]): Only return combinations involving this item.
+        days (int): Number of days of transactions to analyze. Defaults to 90.
+        as_of_date (Optional[str]): 'YYYY-MM-DD' end of the analysis window (exclusive). Defaults to today.
+
+    Returns:
+        Dict[str, Any]: Number of transactions, share of multi-item baskets and the top
+                        item pairs and triples with support, confidence and lift; or 'error'.
+    """
+    print(f"\n--- Tool Call: agent_find_product_bundles ---")
+    as_of = datetime.strptime(as_of_date, '%Y-%m-%d').date() if as_of_date else datetime.now().date()
+    start = as_of - timedelta(days=max(1, int(days)))
+    rows = db_get_transaction_items(business_id, start.isoformat(), (as_of - timedelta(days=1)).isoformat())
+    if not rows:
+        return {"error": "No transactions found for this period."}
+
+    with span("basket.find_associations", **{"profitpilot.line_items": sum(len(row['transactions']) for row in rows)}):
+        matrix = basket.build_basket_matrix([row['transactions'] for row in rows])
+        labels = np.array([row.get('item_name') or row['item_id'] for row in rows])
+        result = basket.find_associations(matrix, labels, min_support=0.01, min_confidence=0.1,
+                                          min_lift=1.1, max_rules=10, focus_item=item_name)
+    result["period"] = [start.isoformat(), (as_of - timedelta(days=1)).isoformat()]
+    if not result["pair_rules"] and not result["triple_rules"]:
+        result["note"] = "No item combinations are bought together noticeably more often than by chance."
+    return result
+
+TRENDS_TOP_ITEMS = 10
+TRENDS_MAX_UPDATES = 6   # incremental updates of a report before it is rewritten from the full window
+
+def _timestamp(value: Any) -> datetime:
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+def _add_sales_rows(daily_items: Dict[str, Dict[str, List[float]]], sales_data: List[Dict[str, Any]]) -> None:
+    """Adds transaction rows to a {date: {item_name: [line_items, units, revenue, profit]}} snapshot."""
+    for row in sales_data:
+        day = _timestamp(row['timestamp']).date().isoformat()
+        totals = daily_items.setdefault(day, {}).setdefault(row.get('item_name') or 'Unknown', [0, 0.0, 0.0, 0.0])
+        totals[0] += 1
+        totals[1] += float(row.get('quantity') or 0)
+        totals[2] += float(row.get('total_line_revenue') or 0)
+        totals[3] += float(row.get('total_line_profit') or 0)
+
+def _rounded_totals(values: List[float]) -> Dict[str, Any]:
+    return {"line_items": int(values[0]), "units": round(values[1], 1),
+            "revenue": round(values[2], 2), "profit": round(values[3], 2)}
+
+def _sales_summary(daily_items: Dict[str, Dict[str, List[float]]]) -> Dict[str, Any]:
+    """Totals and top items by revenue of a daily snapshot."""
+    by_item: Dict[str, List[float]] = {}
+    for items in daily_items.values():
+        for name, values in items.items():
+            totals = by_item.setdefault(name, [0, 0.0, 0.0, 0.0])
+            for k, value in enumerate(values):
+                totals[k] += value
+    top = sorted(by_item.items(), key=lambda entry: -entry[1][2])[:TRENDS_TOP_ITEMS]
+    return dict(_rounded_totals([sum(values[k] for values in by_item.values()) for k in range(4)]),
+                top_items=[dict(item_name=name, **_rounded_totals(values)) for name, values in top])
+
+def _daily_totals(daily_items: Dict[str, Dict[str, List[float]]], since: str) -> List[Dict[str, Any]]:
+    """Per-day totals of the snapshot days from `since` ('YYYY-MM-DD') on."""
+    return [dict(date=day, **_rounded_totals([sum(values[k] for values in daily_items[day].values()) for k in range(4)]))
+            for day in sorted(daily_items) if day >= since]
+
+def _trends_metrics(daily_items: Dict[str, Dict[str, List[float]]], window: List[str], complete_through: str,
+                    updates: int, detected: List[Dict[str, Any]], watermark: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    The metric snapshot stored with a trends report: the per-day, per-item totals it was
+    written from, the newest transaction they include, the business's line count at the
+    time and how often it has been updated.
+    """
+    return {
+        "window": window,
+        "complete_through": complete_through,
+        "line_items": (watermark or {}).get("line_items"),
+        "updates": updates,
+        "summary": _sales_summary(daily_items),
+        "daily_items": {day: {name: [int(v[0]), round(v[1], 2), round(v[2], 2), round(v[3], 2)] for name, v in items.items()}
+                        for day, items in daily_items.items()},
+        "anomalies": _serializable_anomalies(detected),
+    }
+
+def _updatable_trends_report(business_id: str, start_date: Optional[str], end_date: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    The most recent stored trends report of the business, if it can be brought up to date for
+    [start_date, end_date] from the sales recorded since: its snapshot holds every day of the
+    new window up to the newest transaction it saw, and it has been updated fewer than
+    TRENDS_MAX_UPDATES times.
+    """
+    if not start_date or not end_date:
+        return None
+    previous = insights.get_latest_insight(business_id, "sales_trends_report", variant=None)
+    metrics = (previous or {}).get("metrics") or {}
+    if "daily_items" not in metrics or metrics.get("updates", 0) >= TRENDS_MAX_UPDATES:
+        return None
+    seen_through = _timestamp(metrics["complete_through"]).date().isoformat()
+    if start_date < metrics["window"][0] or seen_through < start_date:
+        return None
+    return previous
+
+@traced_tool
+def agent_analyze_sales_trends(business_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None, time_period: str = "last 30 days",
+                               tool_context: Optional["ToolContext"] = None) -> str:
     """
     Analyzes sales trends for a business over a specified period.
     The time_period parameter is for user understanding, actual date filtering uses start_date and end_date.
     If no dates are provided, defaults to the last 30 days.
+    When an earlier report covers the start of the period, only the sales recorded since are
+    read and Gemini updates that report, so repeated questions cost in proportion to new data.
+    `tool_context` is injected by the ADK (session business context).
     """
     print(f"\n--- Tool Call: agent_analyze_sales_trends ---")
-    if not gemini_model:
-        return "Error: Gemini model not initialized for sales trend analysis."
-
     # Default to last 30 days if no dates are provided
     if not start_date and not end_date:
         end_dt = datetime.now()
@@ -305,6 +993,23 @@ def agent_analyze_sales_trends(business_id: str, start_date: Optional[str] = Non
         end_date = end_dt.strftime('%Y-%m-%d')
         time_period = "the last 30 days" # Update period description
 
+    watermark = _data_watermark(business_id, tool_context)
+    variant = {"start_date": start_date, "end_date": end_date}
+    stored = insights.get_insight(business_id, "sales_trends_report", watermark, variant, include_metrics=False)
+    if stored:
+        return stored["payload"]
+
+    gemini_model = get_gemini_model()
+    if not gemini_model:
+        return "Error: Gemini model not initialized for sales trend analysis."
+
+    previous = _updatable_trends_report(business_id, start_date, end_date)
+    if previous:
+        updated = _update_sales_trends_report(business_id, previous, start_date, end_date, time_period,
+                                              watermark, variant, gemini_model, tool_context)
+        if updated is not None:
+            return updated
+
     sales_data = db_get_sales_trends_data(business_id, start_date, end_date)
 
     if not sales_data:
@@ -318,13 +1023,20 @@ def agent_analyze_sales_trends(business_id: str, start_date: Optional[str] = Non
         if 'timestamp' in serializable_record and isinstance(serializable_record['timestamp'], datetime):
             serializable_record['timestamp'] = serializable_record['timestamp'].isoformat()
         # Also handle 'transaction_date' if it's explicitly returned and is a date object
-        if 'transaction_date' in serializable_record and isinstance(serializable_record['transaction_date'], datetime.date):
+        if 'transaction_date' in serializable_record and isinstance(serializable_record['transaction_date'], date):
              serializable_record['transaction_date'] = serializable_record['transaction_date'].isoformat()
         serializable_sales_data.append(serializable_record)
     # --- END OF FIX ---
 
     data_summary = json.dumps(serializable_sales_data, indent=2) # Use the serializable data
-    business_details = db_get_business_details(business_id) # Call the mock or actual db_get_business_details
+
+    # Spikes and drops come from the streaming detector, not from the model reading raw rows.
+    anomaly_end = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else datetime.now().date()
+    anomaly_start = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else anomaly_end - timedelta(days=29)
+    detector = _load_anomaly_detector(business_id, anomaly_end, anomaly_start)
+    detected = detector.anomalies(anomaly_start, anomaly_end) if detector else []
+    anomaly_summary = json.dumps(_serializable_anomalies(detected), indent=2) if detected else "None detected."
+    business_details = session_context.get_business_details(tool_context, business_id, db_get_business_details)
     business_name = business_details.get('name', 'your business') if business_details else 'your business'
 
 
@@ -334,62 +1046,941 @@ def agent_analyze_sales_trends(business_id: str, start_date: Optional[str] = Non
     - Overall sales performance (growth, decline, stability).
     - Peak sales periods (e.g., specific days of the week, times of day, months).
     - Most popular items by quantity sold and revenue.
-    - Any notable fluctuations or anomalies.
+    - The detected anomalies listed below: explain what they mean for the business. Only report
+      anomalies from this list (score = deviation from the usual units for that item and weekday,
+      in robust standard deviations).
 
     Data:
     ```json
     {data_summary}
     ```
 
+    Detected anomalies:
+    {anomaly_summary}
+
     Provide a concise summary of your findings in markdown format, with clear headings and bullet points.
     """
     # print(prompt)
     try:
-        response = gemini_model.generate_content(prompt)
-        return response.text
+        response = generate_content(gemini_model, prompt)
     except Exception as e:
         return f"Error generating sales trend analysis with Gemini: {e}"
+    daily_items: Dict[str, Dict[str, List[float]]] = {}
+    _add_sales_rows(daily_items, sales_data)
+    complete_through = max(_timestamp(row['timestamp']) for row in sales_data).isoformat()
+    insights.store_insight(business_id, "sales_trends_report", response.text, watermark, variant,
+                           metrics=_trends_metrics(daily_items, [start_date, end_date], complete_through, 0, detected, watermark))
+    return response.text
 
-def agent_check_inventory_levels(business_id: str, low_stock_only: bool = False) -> str:
+def _update_sales_trends_report(business_id: str, previous: Dict[str, Any], start_date: str, end_date: str,
+                                time_period: str, watermark: Optional[Dict[str, Any]], variant: Dict[str, Any],
+                                gemini_model: Any, tool_context: Optional["ToolContext"]) -> Optional[str]:
     """
-    Checks and reports current inventory levels, highlighting items below reorder threshold.
+    Brings a stored trends report up to date for [start_date, end_date]: only the lines recorded
+    after its snapshot are read, and Gemini gets the previous report, the totals then and now
+    and the new days instead of every transaction of the period.
+    Returns None when lines older than the snapshot were loaded since (a backfill or a late
+    import, which the timestamp filter cannot see); the report must then be regenerated in full.
+    """
+    snapshot = previous["metrics"]
+    seen_through = _timestamp(snapshot["complete_through"]).date().isoformat()
+    new_rows = db_get_sales_trends_data(business_id, seen_through, end_date, after_timestamp=snapshot["complete_through"])
+    if snapshot.get("line_items") is None or not watermark:
+        return None
+    loaded = watermark["line_items"] - snapshot["line_items"]
+    if loaded > len(new_rows):
+        # The rest may be sales after the period; anything else was recorded out of order.
+        day_after = (datetime.strptime(end_date, '%Y-%m-%d').date() + timedelta(days=1)).isoformat()
+        if _timestamp(watermark["last_transaction"]).date().isoformat() < day_after:
+            return None
+        later_lines = db_count_sales_lines(business_id, day_after, snapshot["complete_through"])
+        if later_lines is None or loaded > len(new_rows) + later_lines:
+            return None
+
+    daily_items = {day: {name: list(values) for name, values in items.items()}
+                   for day, items in snapshot["daily_items"].items() if start_date <= day <= end_date}
+    _add_sales_rows(daily_items, new_rows)
+    if not daily_items:
+        return f"No sales data found for your business {time_period}."
+    complete_through = max([_timestamp(snapshot["complete_through"])] + [_timestamp(row['timestamp']) for row in new_rows]).isoformat()
+    if not new_rows and snapshot["window"] == [start_date, end_date]:
+        # Only sales outside the period were recorded: the previous report still holds.
+        insights.store_insight(business_id, "sales_trends_report", previous["payload"], watermark, variant,
+                               metrics=dict(snapshot, line_items=watermark["line_items"]))
+        return previous["payload"]
+
+    anomaly_start = datetime.strptime(start_date, '%Y-%m-%d').date()
+    anomaly_end = datetime.strptime(end_date, '%Y-%m-%d').date()
+    detector = _load_anomaly_detector(business_id, anomaly_end, anomaly_start)
+    detected = detector.anomalies(anomaly_start, anomaly_end) if detector else []
+    new_anomalies = [event for event in _serializable_anomalies(detected) if event["date"] >= seen_through]
+    business_details = session_context.get_business_details(tool_context, business_id, db_get_business_details)
+    business_name = business_details.get('name', 'your business') if business_details else 'your business'
+
+    before, now = snapshot["summary"], _sales_summary(daily_items)
+    change = {measure: round(now[measure] - before[measure], 2) for measure in ("line_items", "units", "revenue", "profit")}
+    prompt = f"""
+    Below is the sales trends report you wrote for {business_name} covering {snapshot["window"][0]} to {snapshot["window"][1]},
+    followed by what has changed since. Update it to cover {time_period} ({start_date} to {end_date}):
+    keep what still holds, correct the figures and conclusions the new data changes, and add new developments.
+    Only report anomalies from the list below (score = deviation from the usual units for that item and
+    weekday, in robust standard deviations).
+
+    Previous report:
+    {previous["payload"]}
+
+    Totals in the previous report:
+    ```json
+    {json.dumps(before)}
+    ```
+
+    Totals for {start_date} to {end_date} now:
+    ```json
+    {json.dumps(now)}
+    ```
+
+    Change in totals: {json.dumps(change)}
+
+    Sales per day from {seen_through} on ({len(new_rows)} new transaction lines since the previous report):
+    ```json
+    {json.dumps(_daily_totals(daily_items, seen_through))}
+    ```
+
+    Newly detected anomalies:
+    {json.dumps(new_anomalies, indent=2) if new_anomalies else "None detected."}
+
+    Provide the updated report in the same markdown format, with clear headings and bullet points.
+    """
+    with span("sales_trends.update", **{"profitpilot.new_lines": len(new_rows), "profitpilot.update": snapshot.get("updates", 0) + 1}):
+        try:
+            response = generate_content(gemini_model, prompt)
+        except Exception as e:
+            return f"Error generating sales trend analysis with Gemini: {e}"
+    insights.store_insight(business_id, "sales_trends_report", response.text, watermark, variant,
+                           metrics=_trends_metrics(daily_items, [start_date, end_date], complete_through,
+                                                   snapshot.get("updates", 0) + 1, detected, watermark))
+    return response.text
+
+REPLENISHMENT_DEMAND_DAYS = 28
+
+def _replenishment_and_waste(business_id: str, inventory_data: List[Dict[str, Any]], as_of: date):
+    """
+    Replenishment rows for every inventory item and the projected waste of the perishable
+    lots expiring within EXPIRY_ALERT_DAYS, both from the last REPLENISHMENT_DEMAND_DAYS of sales.
+    """
+    demand_end = as_of - timedelta(days=1)
+    demand_start = as_of - timedelta(days=REPLENISHMENT_DEMAND_DAYS)
+    sales_rows = db_get_daily_item_sales(business_id, demand_start.isoformat(), demand_end.isoformat())
+    item_ids, _, units = forecasting.build_daily_matrix(sales_rows, demand_start, demand_end)
+    sales_index = {item_id: i for i, item_id in enumerate(item_ids)}
+    daily_units = np.zeros((len(inventory_data), REPLENISHMENT_DEMAND_DAYS))
+    for i, item in enumerate(inventory_data):
+        row = sales_index.get(item.get('item_id'))
+        if row is not None:
+            daily_units[i] = units[row]
+
+    with span("replenishment.compute", **{"profitpilot.items": len(inventory_data)}):
+        table = replenishment.compute_replenishment(inventory_data, daily_units, as_of)
+
+    lots = _load_lot_inventory(business_id, demand_end, inventory_data)
+    demand = {item.get('item_id'): float(daily_units[i].mean()) for i, item in enumerate(inventory_data)}
+    expiring = lots.projected_waste(demand, as_of, EXPIRY_ALERT_DAYS)
+    return table, expiring
+
+@traced_tool
+def agent_check_inventory_levels(business_id: str, low_stock_only: bool = False, as_of_date: Optional[str] = None,
+                                 tool_context: Optional["ToolContext"] = None) -> str:
+    """
+    Checks and reports current inventory levels, highlighting items that need reordering.
+    Days of cover, projected stock-out dates, reorder points with safety stock and
+    order quantities are computed from the last 4 weeks of sales; Gemini only explains them.
+    `as_of_date` ('YYYY-MM-DD') defaults to today. `tool_context` is injected by the ADK
+    (session business context).
     """
     print(f"\n--- Tool Call: agent_check_inventory_levels ---")
+    as_of = datetime.strptime(as_of_date, '%Y-%m-%d').date() if as_of_date else datetime.now().date()
+    watermark = _stock_watermark(business_id, tool_context)
+    variant = {"low_stock_only": bool(low_stock_only), "as_of": as_of.isoformat()}
+    stored = insights.get_insight(business_id, "inventory_report", watermark, variant)
+    if stored:
+        return stored["payload"]
+
+    gemini_model = get_gemini_model()
     if not gemini_model:
         return "Error: Gemini model not initialized for inventory check."
 
-    inventory_data = db_get_inventory_status(business_id, low_stock_only)
+    inventory_data = db_get_inventory_status(business_id)
 
     if not inventory_data:
-        return "No inventory data found for your business." + (" Or no items are currently low in stock." if low_stock_only else "")
+        return "No inventory data found for your business."
 
-    data_summary = json.dumps(inventory_data, indent=2)
-    business_details = db_get_business_details(business_id)
+    table, expiring = _replenishment_and_waste(business_id, inventory_data, as_of)
+    expiry_text = (replenishment.to_markdown_table(
+        [dict(row, quantity=int(row['quantity'])) for row in expiring], columns=EXPIRY_TABLE_COLUMNS)
+        if expiring else "No perishable lots are expected to go to waste.")
+    if low_stock_only:
+        table = [row for row in table if row['status'] in ("out_of_stock", "reorder_now", "watch")]
+        if not table:
+            return "No items are currently low in stock or at risk of running out."
+
+    table_text = replenishment.to_markdown_table(table)
+    business_details = session_context.get_business_details(tool_context, business_id, db_get_business_details)
     business_name = business_details.get('name', 'your business') if business_details else 'your business'
 
 
     prompt = f"""
-    Analyze the following inventory data for {business_name}.
-    Provide a clear report on the current stock levels.
-    
-    Specifically, identify and list:
-    - All items that are currently below their reorder threshold.
-    - For perishable items, highlight any that are low in stock or nearing their shelf life limit (if shelf_life_days is provided).
-    - General overview of healthy stock levels.
+    Explain the following inventory replenishment table for {business_name} to the owner.
+    The numbers are already calculated from the last {REPLENISHMENT_DEMAND_DAYS} days of sales;
+    do not recompute or change them.
 
-    Data:
+    Columns: status (out_of_stock, reorder_now, watch = runs out within about 10 days,
+    waste_risk = perishable stock lasting longer than its shelf life, ok, no_sales),
+    avg_daily_units, days_of_cover, stockout_date (projected), reorder_point (lead-time demand
+    plus safety stock), eoq (economic order quantity), suggested_order_qty.
+
+    {table_text}
+
+    Perishable lots (first-expired-first-out) expiring in the next {EXPIRY_ALERT_DAYS} days that
+    are not expected to sell before their expiry date at the current sales rate:
+
+    {expiry_text}
+
+    Summarize what to order now and how much, what to watch, and any perishable waste risks
+    (name the lots above and suggest markdowns or bundles to sell them), in a short markdown
+    report with headings and bullet points.
+    """
+
+    try:
+        response = generate_content(gemini_model, prompt)
+        report = f"{response.text}\n\n{table_text}"
+        insights.store_insight(business_id, "inventory_report", report, watermark, variant,
+                               metrics={"replenishment": table, "expiring": expiring})
+        return report
+    except Exception as e:
+        return f"Error generating inventory report with Gemini: {e}\n\n{table_text}"
+
+# --- Perishable lots (FEFO) ---
+
+LOT_MAX_GAP_DAYS = 28   # rebuild instead of applying sales when the cached lots are older than this
+EXPIRY_ALERT_DAYS = 7
+EXPIRY_MAX_LOTS = 20
+EXPIRY_TABLE_COLUMNS = ["item_name", "quantity", "received_date", "expiry_date", "days_to_expiry",
+                        "projected_waste_units", "projected_waste_cost", "estimated"]
+
+def _load_lot_inventory(business_id: str, end_date: date,
+                        inventory_data: Optional[List[Dict[str, Any]]] = None) -> Any:
+    """
+    Returns the FEFO lots of the business after the sales of `end_date`. The cached
+    lots are advanced by the new days' sales; otherwise they are rebuilt from the
+    stock levels and the recorded deliveries.
+    """
+    lots = fefo.get_cached_inventory(business_id)
+    if lots is not None:
+        gap_days = (end_date - lots.last_date).days
+        if gap_days == 0:
+            return lots
+        if 0 < gap_days <= LOT_MAX_GAP_DAYS:
+            first_new = lots.last_date + timedelta(days=1)
+            rows = db_get_daily_item_sales(business_id, first_new.isoformat(), end_date.isoformat())
+            item_ids, _, y = forecasting.build_daily_matrix(rows, first_new, end_date)
+            # The cached lots may be in use by another call; advance a copy and swap it in.
+            lots = lots.copy()
+            with span("fefo.apply_sales", **{"profitpilot.new_days": gap_days}):
+                for t in range(gap_days):
+                    lots.apply_day(first_new + timedelta(days=t),
+                                   {item_id: y[i, t] for i, item_id in enumerate(item_ids) if item_id in lots.on_hand})
+            fefo.store_inventory(business_id, lots)
+            return lots
+
+    inventory_data = inventory_data if inventory_data is not None else db_get_inventory_status(business_id)
+    max_shelf_life = max([int(item.get('shelf_life_days') or 0) for item in inventory_data if item.get('is_perishable')] or [0])
+    receipts = db_get_inventory_lots(business_id, (end_date - timedelta(days=max_shelf_life)).isoformat()) if max_shelf_life else []
+    with span("fefo.build", **{"profitpilot.items": len(inventory_data), "profitpilot.receipts": len(receipts)}):
+        fresh = fefo.build_lot_inventory(inventory_data, receipts, end_date)
+    if lots is None or fresh.last_date >= lots.last_date:
+        fefo.store_inventory(business_id, fresh)
+    return fresh
+
+@traced_tool
+def agent_check_expiring_stock(business_id: str, days: int = EXPIRY_ALERT_DAYS,
+                               as_of_date: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Lists perishable stock lots that expire soonest (first-expired-first-out) and
+    the units and cost expected to go to waste at the current sales rate.
+
+    Args:
+        business_id (str): The business to check.
+        days (int): Look-ahead window in days. Defaults to 7.
+        as_of_date (Optional[str]): 'YYYY-MM-DD' day to check from. Defaults to today.
+
+    Returns:
+        Dict[str, Any]: 'expiring_lots' (lots expiring within `days`), 'projected_waste'
+                        (lots not expected to sell in time, with units and cost), totals,
+                        and lots written off since the last check; or 'error'.
+    """
+    print(f"\n--- Tool Call: agent_check_expiring_stock ---")
+    as_of = datetime.strptime(as_of_date, '%Y-%m-%d').date() if as_of_date else datetime.now().date()
+    end_date = as_of - timedelta(days=1)
+    days = max(1, min(int(days), 90))
+
+    lots = _load_lot_inventory(business_id, end_date)
+    if not lots.on_hand:
+        return {"error": "No perishable items found in the inventory."}
+    written_off = [row for row in lots.written_off if row["expiry_date"] >= (as_of - timedelta(days=days)).isoformat()]
+
+    demand_start = as_of - timedelta(days=REPLENISHMENT_DEMAND_DAYS)
+    rows = db_get_daily_item_sales(business_id, demand_start.isoformat(), end_date.isoformat())
+    item_ids, _, units = forecasting.build_daily_matrix(rows, demand_start, end_date)
+    demand = {item_id: float(units[i].mean()) for i, item_id in enumerate(item_ids)}
+
+    horizon = as_of + timedelta(days=days)
+    expiring = [dict(lot.to_dict(as_of), item_name=lots.item_names.get(lot.item_id, lot.item_id))
+                for lot in lots.next_expiring(EXPIRY_MAX_LOTS, before=horizon)]
+    waste = lots.projected_waste(demand, as_of, days)
+    waste.sort(key=lambda row: -row["projected_waste_cost"])
+    return {
+        "as_of_date": as_of.isoformat(),
+        "window_days": days,
+        "expiring_lots": expiring,
+        "projected_waste": waste[:EXPIRY_MAX_LOTS],
+        "projected_waste_units": round(sum(row["projected_waste_units"] for row in waste), 1),
+        "projected_waste_cost": round(sum(row["projected_waste_cost"] for row in waste), 2),
+        "recently_written_off": written_off[-EXPIRY_MAX_LOTS:],
+        "note": "Lots marked estimated were inferred from the stock level because no matching delivery was recorded.",
+    }
+
+@traced_tool
+def agent_record_stock_delivery(business_id: str, item_name: str, quantity: int,
+                                received_date: Optional[str] = None,
+                                tool_context: Optional["ToolContext"] = None) -> Dict[str, Any]:
+    """
+    Records a delivery of an inventory item as a new lot and adds it to the stock level,
+    so perishable stock can be tracked by expiry date.
+
+    Args:
+        business_id (str): The business receiving the stock.
+        item_name (str): The delivered item.
+        quantity (int): Units delivered.
+        received_date (Optional[str]): 'YYYY-MM-DD' delivery date. Defaults to today.
+        tool_context (Optional[ToolContext]): Injected by the ADK (session inventory version).
+
+    Returns:
+        Dict[str, Any]: The recorded lot (with its expiry date for perishables), or 'error'.
+    """
+    print(f"\n--- Tool Call: agent_record_stock_delivery ---")
+    if int(quantity) <= 0:
+        return {"error": "Quantity must be a positive number of units."}
+    received = datetime.strptime(received_date, '%Y-%m-%d').date() if received_date else datetime.now().date()
+    inventory_data = db_get_inventory_status(business_id)
+    item = next((row for row in inventory_data if (row.get('item_name') or '').lower() == item_name.lower()), None)
+    if item is None:
+        return {"error": f"Item '{item_name}' not found in the inventory."}
+
+    lot_id = db_insert_inventory_lot(business_id, item['item_id'], int(quantity), received)
+    if lot_id is None:
+        return {"error": "Failed to record the delivery."}
+    # The stock level changed; the inventory version is reloaded on the next read.
+    session_context.invalidate(tool_context, business_id, "inventory_version")
+    result = {"lot_id": lot_id, "item_name": item['item_name'], "quantity": int(quantity),
+              "received_date": received.isoformat()}
+    shelf_life = int(item.get('shelf_life_days') or 0)
+    if item.get('is_perishable') and shelf_life > 0:
+        result["expiry_date"] = (received + timedelta(days=shelf_life)).isoformat()
+        lots = fefo.get_cached_inventory(business_id)
+        if lots is not None:
+            lots = lots.copy()
+            lots.receive(item['item_id'], int(quantity), received, shelf_life, lot_id=lot_id)
+            fefo.store_inventory(business_id, lots)
+    return result
+
+# --- Forecasting ---
+
+FORECAST_HISTORY_DAYS = 365
+FORECAST_MAX_GAP_DAYS = 28   # refit instead of updating when the cached model is older than this
+FORECAST_MAX_ITEMS = 20
+FORECAST_DEFAULT_HORIZON = 14
+
+def _load_forecast_model(business_id: str, end_date: date) -> Optional[Any]:
+    """
+    Returns the forecast model for a business as of `end_date`, advancing the
+    cached model over the missing days when possible and refitting otherwise.
+    """
+    model = forecasting.get_cached_model(business_id)
+    if model is not None:
+        gap_days = (end_date - model.last_date).days
+        if gap_days == 0:
+            return model
+        if 0 < gap_days <= FORECAST_MAX_GAP_DAYS:
+            first_new = model.last_date + timedelta(days=1)
+            rows = db_get_daily_item_sales(business_id, first_new.isoformat(), end_date.isoformat())
+            item_ids, _, y_new = forecasting.build_daily_matrix(rows, first_new, end_date)
+            if all(item_id in model.index for item_id in item_ids):
+                y = np.zeros((len(model.item_ids), gap_days))
+                if item_ids:
+                    y[[model.index[item_id] for item_id in item_ids]] = y_new
+                with span("forecast.update", **{"profitpilot.items": len(model.item_ids), "profitpilot.new_days": gap_days}):
+                    model = forecasting.update(model, y)
+                forecasting.store_model(business_id, model)
+                return model
+            # New items appeared; fall through to a full refit.
+
+    history_start = end_date - timedelta(days=FORECAST_HISTORY_DAYS - 1)
+    rows = db_get_daily_item_sales(business_id, history_start.isoformat(), end_date.isoformat())
+    item_ids, item_names, y = forecasting.build_daily_matrix(rows, history_start, end_date)
+    if not item_ids:
+        return None
+    # Start each series at its first sale so items launched recently are not fitted on leading zeros.
+    first_sale = int(np.argmax(y.any(axis=0)))
+    with span("forecast.fit", **{"profitpilot.items": len(item_ids), "profitpilot.days": y.shape[1] - first_sale}):
+        model = forecasting.fit(y[:, first_sale:], item_ids, item_names, history_start + timedelta(days=first_sale))
+    forecasting.store_model(business_id, model)
+    return model
+
+@traced_tool
+def agent_forecast_sales(business_id: str, horizon_days: int = FORECAST_DEFAULT_HORIZON, item_name: Optional[str] = None,
+                         as_of_date: Optional[str] = None, tool_context: Optional["ToolContext"] = None) -> Dict[str, Any]:
+    """
+    Forecasts daily unit sales per item for the next `horizon_days` days, with
+    90% prediction intervals, using seasonal exponential smoothing fitted to
+    the last year of daily sales.
+
+    Args:
+        business_id (str): The business to forecast.
+        horizon_days (int): Number of days ahead to forecast. Defaults to 14.
+        item_name (Optional[str]): Forecast only this item (daily detail included).
+        as_of_date (Optional[str]): 'YYYY-MM-DD' date the forecast starts from. Defaults to today.
+        tool_context (Optional[ToolContext]): Injected by the ADK (session data watermark).
+
+    Returns:
+        Dict[str, Any]: 'horizon' (dates), 'business_daily_units' (point forecasts summed
+                        over items) and 'items' (per-item totals, intervals and, for a
+                        single item or a few items, daily forecasts), or 'error'.
+    """
+    print(f"\n--- Tool Call: agent_forecast_sales ---")
+    as_of = datetime.strptime(as_of_date, '%Y-%m-%d').date() if as_of_date else datetime.now().date()
+    horizon_days = max(1, min(int(horizon_days), 90))
+    watermark = _data_watermark(business_id, tool_context)
+    variant = {"horizon_days": horizon_days, "item_name": (item_name or "").lower(), "as_of": as_of.isoformat()}
+    stored = insights.get_insight(business_id, "sales_forecast", watermark, variant)
+    if stored:
+        return dict(stored["payload"], precomputed_at=stored["computed_at"])
+    end_date = as_of - timedelta(days=1)  # last complete day
+
+    model = _load_forecast_model(business_id, end_date)
+    if model is None:
+        return {"error": "No sales history found to forecast from."}
+
+    dates, point, lower, upper = forecasting.forecast(model, horizon_days)
+    total_lower, total_upper = forecasting.total_interval(model, point)
+
+    rows = np.arange(len(model.item_ids))
+    if item_name:
+        rows = np.array([i for i, item_id in enumerate(model.item_ids)
+                         if model.item_names.get(item_id, "").lower() == item_name.lower()], dtype=int)
+        if rows.size == 0:
+            return {"error": f"No sales history found for item '{item_name}'."}
+    totals = point[rows].sum(axis=1)
+    rows = rows[np.argsort(-totals)][:FORECAST_MAX_ITEMS]
+    include_daily = rows.size <= 5
+
+    items = []
+    for i in rows:
+        item = {
+            "item_id": model.item_ids[i],
+            "item_name": model.item_names.get(model.item_ids[i]),
+            "forecast_units": round(float(point[i].sum()), 1),
+            "forecast_units_lower": round(float(total_lower[i]), 1),
+            "forecast_units_upper": round(float(total_upper[i]), 1),
+            "peak_day": dates[int(point[i].argmax())].strftime('%A'),
+        }
+        if include_daily:
+            item["daily"] = [
+                {"date": d.isoformat(), "units": round(float(p), 1), "lower": round(float(lo), 1), "upper": round(float(hi), 1)}
+                for d, p, lo, hi in zip(dates, point[i], lower[i], upper[i])
+            ]
+        items.append(item)
+
+    result = {
+        "as_of_date": as_of.isoformat(),
+        "horizon": [dates[0].isoformat(), dates[-1].isoformat()],
+        "items_modelled": len(model.item_ids),
+        "business_daily_units": [round(float(v), 1) for v in point.sum(axis=0)],
+        "items": items,
+    }
+    insights.store_insight(business_id, "sales_forecast", result, watermark, variant)
+    return result
+
+
+ANOMALY_HISTORY_DAYS = 180
+ANOMALY_MAX_GAP_DAYS = 28   # rebuild instead of streaming when the cached detector is older than this
+ANOMALY_MAX_RESULTS = 25
+
+def _load_anomaly_detector(business_id: str, end_date: date, start_date: Optional[date] = None) -> Optional[Any]:
+    """
+    Returns an anomaly detector that has seen sales through at least `end_date`
+    and still holds the anomalies from `start_date` on. The cached detector is
+    streamed forward over new days; it is rebuilt from history otherwise.
+
+    `end_date` is capped at yesterday, the last complete day: today's partial
+    sales would read as drops and stay in the same-weekday baseline.
+    """
+    end_date = min(end_date, datetime.now().date() - timedelta(days=1))
+    detector = anomalies.get_cached_detector(business_id)
+    if detector is not None:
+        gap_days = (end_date - detector.last_date).days
+        covers_start = start_date is None or start_date >= detector.first_date
+        if gap_days <= 0 and covers_start:
+            return detector
+        if 0 < gap_days <= ANOMALY_MAX_GAP_DAYS and covers_start:
+            first_new = detector.last_date + timedelta(days=1)
+            rows = db_get_daily_item_sales(business_id, first_new.isoformat(), end_date.isoformat())
+            item_ids, item_names, y_new = forecasting.build_daily_matrix(rows, first_new, end_date)
+            # The cached detector may be in use by another call; update a copy and swap it in.
+            detector = detector.copy()
+            with span("anomalies.update", **{"profitpilot.items": len(detector.item_ids), "profitpilot.new_days": gap_days}):
+                detector.update(item_ids, item_names, y_new)
+            anomalies.store_detector(business_id, detector)
+            return detector
+
+    history_start = end_date - timedelta(days=ANOMALY_HISTORY_DAYS - 1)
+    if start_date is not None:
+        history_start = min(history_start, start_date - timedelta(days=7 * anomalies.WINDOW_WEEKS))
+    rows = db_get_daily_item_sales(business_id, history_start.isoformat(), end_date.isoformat())
+    item_ids, item_names, y = forecasting.build_daily_matrix(rows, history_start, end_date)
+    if not item_ids:
+        return None
+    with span("anomalies.build", **{"profitpilot.items": len(item_ids), "profitpilot.days": y.shape[1]}):
+        fresh = anomalies.build_detector(item_ids, item_names, y, history_start)
+    if detector is None or fresh.last_date >= detector.last_date:
+        anomalies.store_detector(business_id, fresh)
+    return fresh
+
+def _serializable_anomalies(events: List[Dict[str, Any]], limit: int = ANOMALY_MAX_RESULTS) -> List[Dict[str, Any]]:
+    return [dict(event, date=event["date"].isoformat(), weekday=event["date"].strftime('%A')) for event in events[:limit]]
+
+@traced_tool
+def agent_detect_sales_anomalies(business_id: str, days: int = 30, item_name: Optional[str] = None,
+                                 as_of_date: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Finds days on which an item sold unusually much (spike) or little (drop)
+    compared with the same weekday over the previous weeks.
+
+    Args:
+        business_id (str): The business to check.
+        days (int): Number of recent days to report anomalies for. Defaults to 30.
+        item_name (Optional[str]): Only report anomalies for this item.
+        as_of_date (Optional[str]): 'YYYY-MM-DD' end of the period (exclusive). Defaults to today.
+
+    Returns:
+        Dict[str, Any]: Counts of spikes and drops and the strongest anomalies with the
+                        units sold, the expected units and a robust z-score; or 'error'.
+    """
+    print(f"\n--- Tool Call: agent_detect_sales_anomalies ---")
+    as_of = datetime.strptime(as_of_date, '%Y-%m-%d').date() if as_of_date else datetime.now().date()
+    end_date = as_of - timedelta(days=1)
+    start_date = end_date - timedelta(days=max(1, int(days)) - 1)
+
+    detector = _load_anomaly_detector(business_id, end_date, start_date)
+    if detector is None:
+        return {"error": "No sales history found to check for anomalies."}
+
+    item_id = None
+    if item_name:
+        item_id = next((i for i in detector.item_ids if detector.item_names.get(i, "").lower() == item_name.lower()), None)
+        if item_id is None:
+            return {"error": f"No sales history found for item '{item_name}'."}
+    events = detector.anomalies(start_date, end_date, item_id)
+    return {
+        "period": [start_date.isoformat(), end_date.isoformat()],
+        "items_monitored": len(detector.item_ids),
+        "spikes": sum(1 for event in events if event["direction"] == "spike"),
+        "drops": sum(1 for event in events if event["direction"] == "drop"),
+        "anomalies": _serializable_anomalies(events),
+    }
+
+
+CUBE_HISTORY_DAYS = 365
+CUBE_REFRESH_SECONDS = 300   # re-read the latest days at most this often
+CUBE_MAX_ROWS = 50
+# Unfiltered single-dimension totals are kept in the insight store (the nightly batch precomputes them).
+ROLLUP_GROUP_BY = ("weekday", "hour", "item", "category")
+ROLLUP_MEASURES = ("revenue", "units")
+
+def _load_sales_cube(business_id: str, start_date: Optional[date] = None,
+                     watermark: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    Returns the business's sales cube, loading it on first use (or when an
+    earlier `start_date` is asked for) and otherwise re-reading only the days
+    from its last loaded day on. With a data `watermark` the cube is refreshed
+    only when the watermark moved; without one, at most every CUBE_REFRESH_SECONDS.
+    """
+    sales_cube = cube.get_cached_cube(business_id)
+    if sales_cube is not None and (start_date is None or start_date >= sales_cube.loaded_from):
+        if watermark is not None and watermark == sales_cube.watermark:
+            return sales_cube
+        if watermark is None and (datetime.now() - sales_cube.loaded_at).total_seconds() < CUBE_REFRESH_SECONDS:
+            return sales_cube
+        refresh_from = sales_cube.last_date or sales_cube.loaded_from
+        rows = db_get_sales_cube_rows(business_id, refresh_from.isoformat())
+        with span("cube.refresh", **{"profitpilot.rows": len(rows)}):
+            sales_cube.load(rows, from_date=refresh_from)
+        sales_cube.watermark = watermark
+        return sales_cube
+
+    loaded_from = datetime.now().date() - timedelta(days=CUBE_HISTORY_DAYS - 1)
+    if start_date is not None:
+        loaded_from = min(loaded_from, start_date)
+    rows = db_get_sales_cube_rows(business_id, loaded_from.isoformat())
+    with span("cube.load", **{"profitpilot.rows": len(rows)}):
+        sales_cube = cube.SalesCube().load(rows)
+    sales_cube.loaded_from = loaded_from
+    sales_cube.watermark = watermark
+    cube.store_cube(business_id, sales_cube)
+    return sales_cube
+
+@traced_tool
+def agent_query_sales(business_id: str, group_by: str = "weekday", measure: str = "revenue",
+                      start_date: Optional[str] = None, end_date: Optional[str] = None,
+                      item_name: Optional[str] = None, category: Optional[str] = None,
+                      payment_method: Optional[str] = None, weekday: Optional[str] = None,
+                      hour: Optional[int] = None, sort_by: Optional[str] = None, limit: int = 20,
+                      tool_context: Optional["ToolContext"] = None) -> Dict[str, Any]:
+    """
+    Answers slice-and-dice sales questions ("revenue by hour last month", "best weekday
+    for glazed donuts", "units by category paid in cash") from an in-memory sales cube.
+
+    Args:
+        business_id (str): The business to query.
+        group_by (str): Comma-separated dimensions: date, weekday, hour, item, category,
+                        payment_method. Empty for overall totals. Defaults to "weekday".
+        measure (str): revenue, units, profit or line_items. Defaults to "revenue".
+        start_date (Optional[str]): 'YYYY-MM-DD' first day (inclusive).
+        end_date (Optional[str]): 'YYYY-MM-DD' last day (inclusive).
+        item_name (Optional[str]): Only this item.
+        category (Optional[str]): Only this category.
+        payment_method (Optional[str]): Only this payment method.
+        weekday (Optional[str]): Only this weekday (e.g. "Saturday").
+        hour (Optional[int]): Only this hour of the day (0-23).
+        sort_by (Optional[str]): A measure, '<measure>_per_day', 'days' or a group_by dimension
+                                 (chronological order). Defaults to `measure`, highest first.
+        limit (int): Maximum number of rows returned. Defaults to 20.
+        tool_context (Optional[ToolContext]): Injected by the ADK; the session's data watermark
+                                              decides whether the cube needs a refresh.
+
+    Returns:
+        Dict[str, Any]: 'rows' with the group_by values, the measure total, its average per
+                        day with sales and the number of such days; or 'error'.
+    """
+    print(f"\n--- Tool Call: agent_query_sales ---")
+    try:
+        start = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+        end = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+    except ValueError:
+        return {"error": "Dates must be in 'YYYY-MM-DD' format."}
+    dimensions = [d.strip().lower() for d in (group_by or "").split(",") if d.strip() and d.strip().lower() != "none"]
+
+    rollup = (len(dimensions) == 1 and dimensions[0] in ROLLUP_GROUP_BY and measure in ROLLUP_MEASURES
+              and not sort_by and not any((start, end, item_name, category, payment_method, weekday, hour is not None)))
+    watermark = _data_watermark(business_id, tool_context) if tool_context is not None or rollup else None
+    if rollup:
+        # The cube covers the last CUBE_HISTORY_DAYS, so its totals also depend on the day.
+        variant = {"group_by": dimensions[0], "measure": measure, "as_of": datetime.now().date().isoformat()}
+        stored = insights.get_insight(business_id, "sales_rollup", watermark, variant)
+        if stored:
+            return dict(stored["payload"], rows=stored["payload"]["rows"][:max(1, int(limit))],
+                        precomputed_at=stored["computed_at"])
+
+    sales_cube = _load_sales_cube(business_id, start, watermark)
+    if not len(sales_cube):
+        return {"error": "No sales data found for this business."}
+    try:
+        with span("cube.query", **{"profitpilot.rows": len(sales_cube)}):
+            rows = sales_cube.query(
+                group_by=dimensions, measures=[measure.strip().lower()], start_date=start, end_date=end,
+                items=[item_name] if item_name else None,
+                categories=[category] if category else None,
+                payment_methods=[payment_method] if payment_method else None,
+                weekdays=[weekday] if weekday else None,
+                hours=[int(hour)] if hour is not None else None,
+                sort_by=sort_by, limit=CUBE_MAX_ROWS if rollup else max(1, min(int(limit), CUBE_MAX_ROWS)),
+            )
+    except ValueError as e:
+        return {"error": str(e)}
+    if not rows:
+        return {"error": "No sales match these filters."}
+    result = {
+        "group_by": dimensions,
+        "measure": measure,
+        "data_from": max(start, sales_cube.first_date).isoformat() if start else sales_cube.first_date.isoformat(),
+        "data_through": min(end, sales_cube.last_date).isoformat() if end else sales_cube.last_date.isoformat(),
+        "rows": rows,
+    }
+    if rollup:
+        # Stored with every row, so a later question with a larger limit is served too.
+        insights.store_insight(business_id, "sales_rollup", result, watermark, variant)
+        result = dict(result, rows=rows[:max(1, int(limit))])
+    return result
+
+
+COHORT_MAX_ROWS = 12   # most recent cohorts returned
+
+@traced_tool
+def agent_analyze_customer_cohorts(business_id: str, period: str = "month", days: int = 365,
+                                   as_of_date: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Groups customers by when they first bought (cohorts) and reports retention,
+    repeat purchase rate, purchase frequency and estimated customer lifetime value.
+
+    Args:
+        business_id (str): The business to analyze.
+        period (str): Cohort period, 'month' or 'week'. Defaults to 'month'.
+        days (int): Days of purchase history to use. Defaults to 365.
+        as_of_date (Optional[str]): 'YYYY-MM-DD' end of the history (exclusive). Defaults to today.
+
+    Returns:
+        Dict[str, Any]: 'summary' (customers, repeat rate, orders and revenue per customer,
+                        average order value, days between purchases, retention curve) and
+                        'cohorts' (the most recent cohorts with their retention by period
+                        since first purchase and estimated LTV); or 'error'.
+    """
+    print(f"\n--- Tool Call: agent_analyze_customer_cohorts ---")
+    period = (period or "month").strip().lower()
+    if period not in ("month", "week"):
+        return {"error": "period must be 'month' or 'week'."}
+    as_of = datetime.strptime(as_of_date, '%Y-%m-%d').date() if as_of_date else datetime.now().date()
+    end_date = as_of - timedelta(days=1)
+    start_date = as_of - timedelta(days=max(1, int(days)))
+
+    rows = db_get_customer_purchases(business_id, start_date.isoformat(), end_date.isoformat())
+    if not rows:
+        return {"error": "No purchases with a customer ID found for this period."}
+
+    with span("cohorts.analyze", **{"profitpilot.rows": len(rows)}):
+        result = cohorts.analyze_cohorts(
+            [row['customer_id'] for row in rows],
+            [row['transaction_date'] for row in rows],
+            np.array([float(row.get('orders') or 1) for row in rows]),
+            np.array([float(row.get('revenue') or 0.0) for row in rows]),
+            np.array([float(row.get('profit') or 0.0) for row in rows]),
+            period=period,
+            first_purchase_dates=[row.get('first_purchase_date') or row['transaction_date'] for row in rows],
+            history_start=start_date,
+        )
+    result["cohorts"] = result["cohorts"][-COHORT_MAX_ROWS:]
+    result["summary"]["history"] = [start_date.isoformat(), end_date.isoformat()]
+    if not result["cohorts"]:
+        result["note"] = "No customer made their first purchase in this period; use a longer history (days)."
+    elif result["summary"]["repeat_rate"] < 0.01:
+        result["note"] = "Almost no customer bought on more than one day; customer IDs may not be recorded consistently."
+    return result
+
+# --- Business health report ---
+
+HEALTH_TREND_DAYS = 30        # the last 30 days are compared with the 30 before
+HEALTH_MAX_ITEMS = 10         # rows per list in the synthesis prompt
+HEALTH_REVIEW_WORKERS = 8
+HEALTH_ATTENTION_STATUSES = ("out_of_stock", "reorder_now", "watch", "waste_risk")
+
+def _health_pricing(business_id: str, as_of: date) -> Dict[str, Any]:
+    rows = _pricing_with_elasticity(business_id, None, as_of)
+    if not rows:
+        return {"error": "No pricing data found."}
+    keep = ("item_name", "unit_cost", "current_unit_price", "avg_sales_price", "total_profit", "total_quantity_sold",
+            "price_elasticity", "monthly_profit_delta_if_price_up_5pct", "monthly_profit_delta_if_price_down_5pct")
+    slim = [{key: (round(row[key], 2) if isinstance(row.get(key), float) else row.get(key)) for key in keep if key in row}
+            for row in rows]
+    for row in slim:
+        price = float(row.get("avg_sales_price") or row.get("current_unit_price") or 0.0)
+        row["margin_pct"] = round(100 * (price - float(row.get("unit_cost") or 0.0)) / price, 1) if price else None
+    top = sorted(slim, key=lambda row: -(row.get("total_profit") or 0.0))[:HEALTH_MAX_ITEMS]
+    listed = {row["item_name"] for row in top}
+    by_margin = sorted((row for row in slim if row["margin_pct"] is not None and row["item_name"] not in listed),
+                       key=lambda row: row["margin_pct"])
+    return {
+        "items": len(slim),
+        "top_profit_items": top,
+        "lowest_margin_items": by_margin[:HEALTH_MAX_ITEMS // 2],
+    }
+
+def _health_sales(business_id: str, as_of: date) -> Dict[str, Any]:
+    end_date = as_of - timedelta(days=1)
+    split = as_of - timedelta(days=HEALTH_TREND_DAYS)
+    start_date = split - timedelta(days=HEALTH_TREND_DAYS)
+    rows = db_get_daily_item_sales(business_id, start_date.isoformat(), end_date.isoformat())
+    if not rows:
+        return {"error": "No sales data found."}
+
+    totals = {period: {"revenue": 0.0, "profit": 0.0, "units": 0.0} for period in ("current", "previous")}
+    by_item: Dict[str, Dict[str, float]] = {}
+    weekday_revenue = [0.0] * 7
+    for row in rows:
+        day = str(row["transaction_date"])[:10]
+        period = "current" if day >= split.isoformat() else "previous"
+        revenue = float(row.get("revenue") or 0.0)
+        totals[period]["revenue"] += revenue
+        totals[period]["profit"] += float(row.get("profit") or 0.0)
+        totals[period]["units"] += float(row.get("units") or 0.0)
+        item = by_item.setdefault(row.get("item_name") or row["item_id"], {"current": 0.0, "previous": 0.0})
+        item[period] += revenue
+        if period == "current":
+            weekday_revenue[date.fromisoformat(day).weekday()] += revenue
+
+    def change(current: float, previous: float) -> Optional[float]:
+        return round(100 * (current - previous) / previous, 1) if previous else None
+
+    top_items = sorted(by_item.items(), key=lambda kv: -kv[1]["current"])[:HEALTH_MAX_ITEMS]
+    weekdays = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+    detector = _load_anomaly_detector(business_id, end_date, split)
+    return {
+        "period": [split.isoformat(), end_date.isoformat()],
+        "previous_period": [start_date.isoformat(), (split - timedelta(days=1)).isoformat()],
+        "totals": {period: {k: round(v, 2) for k, v in values.items()} for period, values in totals.items()},
+        "revenue_change_pct": change(totals["current"]["revenue"], totals["previous"]["revenue"]),
+        "profit_change_pct": change(totals["current"]["profit"], totals["previous"]["profit"]),
+        "top_items_by_revenue": [
+            {"item_name": name, "revenue": round(values["current"], 2),
+             "change_pct": change(values["current"], values["previous"])}
+            for name, values in top_items
+        ],
+        "revenue_by_weekday": {weekdays[i]: round(value, 2) for i, value in enumerate(weekday_revenue)},
+        "anomalies": _serializable_anomalies(detector.anomalies(split, end_date), HEALTH_MAX_ITEMS) if detector else [],
+    }
+
+def _health_inventory(business_id: str, as_of: date) -> Dict[str, Any]:
+    inventory_data = db_get_inventory_status(business_id)
+    if not inventory_data:
+        return {"error": "No inventory data found."}
+    table, expiring = _replenishment_and_waste(business_id, inventory_data, as_of)
+    attention = [row for row in table if row["status"] in HEALTH_ATTENTION_STATUSES][:HEALTH_MAX_ITEMS]
+    return {
+        "items": len(table),
+        "status_counts": dict(Counter(row["status"] for row in table)),
+        "needs_attention": replenishment.to_markdown_table(attention) if attention else "None.",
+        "projected_waste": replenishment.to_markdown_table(
+            [dict(row, quantity=int(row["quantity"])) for row in expiring[:HEALTH_MAX_ITEMS]],
+            columns=EXPIRY_TABLE_COLUMNS) if expiring else "None.",
+    }
+
+def _review_summary(reviews: List[Dict[str, Any]]) -> Dict[str, Any]:
+    ratings = [float(r["rating"]) for r in reviews if r.get("rating") is not None]
+    sentiments = [float(r["sentiment_score"]) for r in reviews if r.get("sentiment_score") is not None]
+    themes = Counter(theme for r in reviews for theme in (r.get("themes") or []))
+    return {
+        "reviews": len(reviews),
+        "avg_rating": round(sum(ratings) / len(ratings), 2) if ratings else None,
+        "avg_sentiment": round(sum(sentiments) / len(sentiments), 2) if sentiments else None,
+        "top_themes": [theme for theme, _ in themes.most_common(3)],
+    }
+
+def _health_reviews(business_id: str, competitors: List[Dict[str, Any]]) -> Dict[str, Any]:
+    entities = [("Your business", business_id, "business")] + [
+        (comp.get("name") or comp["competitor_id"], comp["competitor_id"], "competitor")
+        for comp in competitors if comp.get("competitor_id")
+    ]
+    with ThreadPoolExecutor(max_workers=min(HEALTH_REVIEW_WORKERS, len(entities))) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, db_get_processed_reviews, entity_id, entity_type)
+                   for _, entity_id, entity_type in entities]
+        summaries = [dict(_review_summary(future.result()), name=name)
+                     for (name, _, _), future in zip(entities, futures)]
+    if not any(summary["reviews"] for summary in summaries):
+        return {"error": "No processed reviews found; collect reviews with the comparison agent first."}
+    return {"business": summaries[0], "competitors": summaries[1:]}
+
+def _health_branch(name: str, func, *args) -> Dict[str, Any]:
+    with span(f"health_report.{name}"):
+        try:
+            return func(*args)
+        except Exception as e:
+            print(f"Health report: the {name} section failed: {e}")
+            return {"error": f"Could not compute the {name} section."}
+
+@traced_tool
+def agent_business_health_report(business_id: str, as_of_date: Optional[str] = None,
+                                 tool_context: Optional["ToolContext"] = None) -> str:
+    """
+    Writes a full business health report covering pricing, sales trends, inventory and
+    customer reviews against competitors. Use it when the owner asks how the business is
+    doing overall, instead of calling the pricing, trends and inventory tools one by one.
+
+    The four sections are fetched and computed concurrently, and Gemini writes the report
+    from their combined results in a single call.
+
+    Args:
+        business_id (str): The business to report on.
+        as_of_date (Optional[str]): 'YYYY-MM-DD' end of the data (exclusive). Defaults to today.
+        tool_context (Optional[ToolContext]): Injected by the ADK (session business context).
+
+    Returns:
+        str: The report in markdown.
+    """
+    print(f"\n--- Tool Call: agent_business_health_report ---")
+    try:
+        as_of = datetime.strptime(as_of_date, '%Y-%m-%d').date() if as_of_date else datetime.now().date()
+    except ValueError:
+        return "Error: as_of_date must be in 'YYYY-MM-DD' format."
+    watermark = _stock_watermark(business_id, tool_context)
+    stored = insights.get_insight(business_id, "health_report", watermark, as_of.isoformat())
+    if stored:
+        return stored["payload"]
+    gemini_model = get_gemini_model()
+    if not gemini_model:
+        return "Error: Gemini model not initialized for the business health report."
+
+    # The session context is read and filled here, on the calling thread only; the branches
+    # get plain values so they never touch tool_context.state concurrently.
+    business_details = session_context.get_business_details(tool_context, business_id, db_get_business_details)
+    competitors = db_get_competitors(business_id, tool_context)
+    branches = {
+        "pricing": (_health_pricing, business_id, as_of),
+        "sales_trends": (_health_sales, business_id, as_of),
+        "inventory": (_health_inventory, business_id, as_of),
+        "reviews": (_health_reviews, business_id, competitors),
+    }
+    with ThreadPoolExecutor(max_workers=len(branches)) as pool:
+        # Each branch runs in its own copy of the context so its spans nest under this tool call.
+        futures = {name: pool.submit(contextvars.copy_context().run, _health_branch, name, *branch)
+                   for name, branch in branches.items()}
+        sections = {name: future.result() for name, future in futures.items()}
+
+    if all("error" in section for section in sections.values()):
+        return "No sales, pricing, inventory or review data found for your business."
+    business_name = business_details.get('name', 'your business') if business_details else 'your business'
+
+    prompt = f"""
+    Write a business health report for {business_name} from the figures below. They are already
+    computed; do not recompute or invent numbers. A section with an 'error' has no data: say so briefly.
+
+    Pricing (profit, margin and measured price elasticity per item; profit deltas are per month):
     ```json
-    {data_summary}
+    {json.dumps(sections["pricing"], indent=2, default=str)}
+    ```
+
+    Sales trends (last {HEALTH_TREND_DAYS} days against the {HEALTH_TREND_DAYS} before; anomalies are scored
+    against the usual units for that item and weekday):
+    ```json
+    {json.dumps(sections["sales_trends"], indent=2, default=str)}
+    ```
+
+    Inventory (items needing attention and perishable lots expected to go to waste):
+    ```json
+    {json.dumps(sections["inventory"], indent=2, default=str)}
+    ```
+
+    Customer reviews, the business against its competitors:
+    ```json
+    {json.dumps(sections["reviews"], indent=2, default=str)}
     ```
 
-    Present your report in a clear, concise, and structured markdown format, with headings and bullet points.
+    Structure the report in markdown with these headings: Overall Health (2-3 sentences), Sales,
+    Pricing, Inventory, Customers & Competitors, and Top 3 Actions for this week.
     """
 
     try:
-        response = gemini_model.generate_content(prompt)
-        return response.text
+        response = generate_content(gemini_model, prompt)
     except Exception as e:
-        return f"Error generating inventory report with Gemini: {e}"
+        return f"Error generating the business health report with Gemini: {e}"
+    insights.store_insight(business_id, "health_report", response.text, watermark, as_of.isoformat(), metrics=sections)
+    return response.text
     
 def db_get_business_details(business_id: str) -> Optional[Dict[str, Any]]:
     """
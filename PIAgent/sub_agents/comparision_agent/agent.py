@@ -2,8 +2,9 @@
 from google.adk.agents.llm_agent import Agent
 
 from ...shared_libraries import constants
+from ...utils import compaction, context_cache, prefetch, tool_output
 # Import the tools specific to the comparison agent
-from .tools import db_get_business_details, db_get_competitors, db_get_processed_reviews, agent_call_customer_sentiment_analyst_for_reviews
+from .tools import db_get_business_details, db_get_competitors, db_get_processed_reviews, agent_call_customer_sentiment_analyst_for_reviews, agent_get_job_status, agent_list_jobs
 from ...prompts import comparision_prompt_text # Import the new prompt
 
 
@@ -17,5 +18,16 @@ comparision_agent = Agent(
         db_get_competitors,
         db_get_processed_reviews,
         agent_call_customer_sentiment_analyst_for_reviews, # This tool initiates data collection if needed
+        agent_get_job_status, # Progress of a started collection
+        agent_list_jobs,
+        tool_output.get_tool_output_page, # More of a result that was shortened
     ],
+    # Start loading the business's data in the background once a tool call names it.
+    before_tool_callback=prefetch.before_tool_callback,
+    # Results over their token budget reach the conversation shortened, with a handle for paging.
+    after_tool_callback=[prefetch.after_tool_callback, tool_output.after_tool_callback],
+    # Long conversations reach the model as a rolling summary plus the latest turns; the instruction,
+    # tools and finished turns are then sent as Gemini cached content.
+    before_model_callback=[compaction.before_model_callback, context_cache.before_model_callback],
+    after_model_callback=context_cache.after_model_callback,
 )
\ No newline at end of file
@@ -1,24 +1,19 @@
 import uuid
-from google.cloud import bigquery
 import os
-from typing import Optional, List, Dict, Any, Union
+import hashlib
+from typing import Optional, List, Dict, Any, Union, TYPE_CHECKING
 import json 
 import datetime
 
-# Import the new Places API client library
-import googlemaps
-from google.api_core.exceptions import GoogleAPIError
-
-import google.generativeai as genai 
-import dotenv
-dotenv.load_dotenv()
-# --- Gemini API Configuration ---
-GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GEMINI_API_KEY:
-    print("Warning: GEMINI_API_KEY environment variable not set. Gemini API calls might fail.")
-else:
-    genai.configure(api_key=GEMINI_API_KEY)
-    print("Gemini API configured.")
+# SDK modules and clients are created lazily on first use (see utils/api_clients.py)
+from ...utils.api_clients import bigquery, googlemaps, get_bq_client, get_places_client, get_gemini_model
+from ...utils.db_utils import run_query
+from ...utils.llm_utils import generate_content
+from ...utils.tracing import span, traced_tool
+from ...utils import insights, jobs, prefetch, session_context, tool_output
+
+if TYPE_CHECKING:
+    from google.adk.tools import ToolContext
 
 # --- BigQuery Configuration ---
 PROJECT_ID = 'profitpilot-2cc51'
@@ -28,50 +23,31 @@ TABLE_COMPETITOR = f"{PROJECT_ID}.{DATASET_ID}.competitor"
 # Use the new business_review table
 TABLE_BUSINESS_REVIEW = f"{PROJECT_ID}.{DATASET_ID}.business_review" 
 
-# --- BigQuery Client Initialization ---
-try:
-    bq_client = bigquery.Client(project=PROJECT_ID, location='US')
-    print(f"BigQuery client initialized for project: {PROJECT_ID}")
-except Exception as e:
-    print(f"Error initializing BigQuery client: {e}")
-    bq_client = None
-
-# --- Google Maps API Configuration ---
-Maps_API_KEY = os.getenv("GOOGLE_MAP_API_KEY")
-try:
-    if Maps_API_KEY:
-        places_client = googlemaps.Client(key=Maps_API_KEY)
-        print("Google Places API (Older) client initialized.")
-    # places_client = places.PlacesClient()
-    # print("New Google Places API client initialized.")
-except Exception as e:
-    print(f"Error initializing New Google Places API client: {e}")
-    places_client = None
-
-# --- Gemini Model Initialization ---
-try:
-    gemini_model = genai.GenerativeModel('gemini-1.5-flash') # Or 'gemini-pro'
-    print("Gemini model initialized for text generation.")
-except Exception as e:
-    print(f"Error initializing Gemini model: {e}")
-    gemini_model = None
-
 # --- New Tools for Comparative Agent ---
 
-def db_get_competitors(business_id: str) -> List[Dict[str, Any]]:
+@traced_tool
+def db_get_competitors(business_id: str, tool_context: Optional["ToolContext"] = None) -> List[Dict[str, Any]]:
     """
     Retrieves a list of competitors for a given business ID from the database.
     This function specifically queries the 'competitor' table.
 
     Args:
         business_id (str): The ID of the primary business.
+        tool_context (Optional[ToolContext]): Injected by the ADK; the list is read from the
+                                              session's business context when it is there.
 
     Returns:
         List[Dict[str, Any]]: A list of dictionaries, where each dictionary contains
                               competitor details (e.g., 'name', 'website_url', 'google_place_id', 'competitor_id').
                               Returns an empty list if no competitors are found.
     """
+    if tool_context is not None:
+        return session_context.get_competitors(tool_context, business_id, db_get_competitors)
+    prefetched = prefetch.cached("competitors", business_id)
+    if prefetched is not None:
+        return prefetched
     print(f"\n--- Comparative Agent Tool Call: db_get_competitors(business_id='{business_id}') ---")
+    bq_client = get_bq_client(PROJECT_ID)
     if not bq_client:
         print("BigQuery client not initialized. Cannot retrieve competitors.")
         return []
@@ -89,7 +65,7 @@ def db_get_competitors(business_id: str) -> List[Dict[str, Any]]:
     ]
 
     try:
-        query_job = bq_client.query(query, job_config=bigquery.QueryJobConfig(query_parameters=query_params))
+        query_job = run_query(bq_client, query, job_config=bigquery.QueryJobConfig(query_parameters=query_params), tool_name="db_get_competitors", business_id=business_id)
         rows = query_job.result()
 
         competitors = []
@@ -112,19 +88,28 @@ def db_get_competitors(business_id: str) -> List[Dict[str, Any]]:
         return []
 
 
-def db_get_business_details(business_id: str) -> Optional[Dict[str, Any]]:
+@traced_tool
+def db_get_business_details(business_id: str, tool_context: Optional["ToolContext"] = None) -> Optional[Dict[str, Any]]:
     """
     Retrieves the full details of a business from the database using its internal business_id.
 
     Args:
         business_id (str): The internal ID of the business.
+        tool_context (Optional[ToolContext]): Injected by the ADK; the details are read from the
+                                              session's business context when they are there.
 
     Returns:
         Optional[Dict[str, Any]]: A dictionary containing the business's details
                                   (e.g., 'id', 'gmb_id', 'name', 'address', 'business_id'),
                                   or None if not found.
     """
+    if tool_context is not None:
+        return session_context.get_business_details(tool_context, business_id, db_get_business_details)
+    prefetched = prefetch.cached("business_details", business_id)
+    if prefetched is not None:
+        return prefetched
     print(f"\n--- Comparative Agent Tool Call: db_get_business_details(business_id='{business_id}') ---")
+    bq_client = get_bq_client(PROJECT_ID)
     if not bq_client:
         print("BigQuery client not initialized. Cannot retrieve business details.")
         return None
@@ -143,7 +128,7 @@ def db_get_business_details(business_id: str) -> Optional[Dict[str, Any]]:
     ]
 
     try:
-        query_job = bq_client.query(query, job_config=bigquery.QueryJobConfig(query_parameters=query_params))
+        query_job = run_query(bq_client, query, job_config=bigquery.QueryJobConfig(query_parameters=query_params), tool_name="db_get_business_details", business_id=business_id)
         row = next(iter(query_job.result()), None)
 
         if row:
@@ -177,7 +162,11 @@ def db_get_business_details(business_id: str) -> Optional[Dict[str, Any]]:
     except Exception as e:
         print(f"Error getting business details from BigQuery: {e}")
         return None
-    
+
+# Loaded in the background as soon as a conversation names a business (see utils/prefetch.py).
+prefetch.register("business_details", db_get_business_details)
+prefetch.register("competitors", db_get_competitors)
+
 def maps_get_place_reviews(place_id: str) -> List[Dict[str, Any]]:
     """
     Retrieves reviews for a given Google Place ID using the OLDER Google Places API (Place Details).
@@ -191,15 +180,17 @@ def maps_get_place_reviews(place_id: str) -> List[Dict[str, Any]]:
                               Returns an empty list if no reviews or an error occurs.
     """
     print(f"\n--- Comparative Agent Tool Call: maps_get_place_reviews(place_id='{place_id}') ---")
+    places_client = get_places_client()
     if not places_client:
         print("Older Google Places API client not initialized. Cannot get place reviews.")
         return []
 
     try:
-        place_details = places_client.place(
-            place_id=place_id,
-            fields=['reviews']
-        )
+        with span("places.place_details", **{"places.place_id": place_id, "places.fields": "reviews"}):
+            place_details = places_client.place(
+                place_id=place_id,
+                fields=['reviews']
+            )
 
         reviews = []
         if 'result' in place_details and 'reviews' in place_details['result']:
@@ -239,6 +230,17 @@ def maps_get_place_reviews(place_id: str) -> List[Dict[str, Any]]:
         return []
 
 
+def _text_hash(text: Optional[str]) -> str:
+    # hashlib rather than hash(): str hashes are salted per process, so they would differ on every run.
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def _review_id(place_id: str, review: Dict[str, Any]) -> str:
+    """A stable ID for a Google Maps review: the same review gets the same ID on every collection."""
+    key = "|".join(str(review.get(field) or "") for field in ("author_name", "publish_time", "text"))
+    return f"gmb_{place_id}_{_text_hash(key)[:24]}"
+
+
 def db_store_processed_review(
     review_data: Dict[str, Any],
     business_id: str,
@@ -247,7 +249,9 @@ def db_store_processed_review(
     review_id: str # The external review ID (e.g., from Google Places)
 ) -> bool:
     """
-    Stores a *single processed review* into the `business_review` BigQuery table.
+    Stores a *single processed review* into the `business_review` BigQuery table,
+    unless a review with the same `review_id` is already stored for `business_id`
+    (collections are repeated, e.g. by the nightly batch).
 
     Args:
         review_data (Dict[str, Any]): A dictionary containing the processed review data
@@ -263,18 +267,22 @@ def db_store_processed_review(
         bool: True if storage was successful, False otherwise.
     """
     print(f"\n--- Comparative Agent Tool Call: db_store_processed_review ---")
+    bq_client = get_bq_client(PROJECT_ID)
     if not bq_client:
         print("BigQuery client not initialized. Cannot store processed review.")
         return False
 
     id_uuid = str(uuid.uuid4())
-    raw_text_hash_val = str(hash(review_data.get('text', ''))) # Simple hash for raw text uniqueness
+    raw_text_hash_val = _text_hash(review_data.get('text'))
 
     # Ensure JSON fields are properly serialized
     entity_sentiment_json = json.dumps(review_data.get('entity_sentiment', {}))
 
     query = f"""
-    INSERT INTO `{TABLE_BUSINESS_REVIEW}` (
+    MERGE `{TABLE_BUSINESS_REVIEW}` AS target
+    USING (SELECT @business_id AS business_id, @review_id AS review_id) AS source
+    ON target.business_id = source.business_id AND target.review_id = source.review_id
+    WHEN NOT MATCHED THEN INSERT (
         id, business_id, entities, entity_sentiment, processed_timestamp,
         rating, raw_text_hash, review_id, sentiment_magnitude, sentiment_score,
         source, text, themes, timestamp_posted, entity_type
@@ -306,7 +314,7 @@ def db_store_processed_review(
     )
 
     try:
-        query_job = bq_client.query(query, job_config=job_config)
+        query_job = run_query(bq_client, query, job_config=job_config, tool_name="db_store_processed_review", business_id=business_id)
         query_job.result()
         print(f"BigQuery: Successfully stored processed review for business ID '{business_id}'.")
         return True
@@ -315,6 +323,7 @@ def db_store_processed_review(
         return False
 
 
+@traced_tool
 def db_get_processed_reviews(business_id: str, entity_type: Optional[str] = None) -> List[Dict[str, Any]]:
     """
     Retrieves processed review data for a business or its competitors from the `business_review` table.
@@ -327,6 +336,7 @@ def db_get_processed_reviews(business_id: str, entity_type: Optional[str] = None
         List[Dict[str, Any]]: A list of dictionaries, each representing a processed review.
     """
     print(f"\n--- Comparative Agent Tool Call: db_get_processed_reviews(business_id='{business_id}', entity_type='{entity_type}') ---")
+    bq_client = get_bq_client(PROJECT_ID)
     if not bq_client:
         print("BigQuery client not initialized. Cannot retrieve processed reviews.")
         return []
@@ -353,7 +363,7 @@ def db_get_processed_reviews(business_id: str, entity_type: Optional[str] = None
 
     processed_reviews = []
     try:
-        query_job = bq_client.query(query, job_config=bigquery.QueryJobConfig(query_parameters=query_params))
+        query_job = run_query(bq_client, query, job_config=bigquery.QueryJobConfig(query_parameters=query_params), tool_name="db_get_processed_reviews", business_id=business_id)
         rows = query_job.result()
 
         for row in rows:
@@ -391,22 +401,50 @@ def db_get_processed_reviews(business_id: str, entity_type: Optional[str] = None
         print(f"Error retrieving processed reviews from BigQuery: {e}")
         return []
 
+REVIEW_SUMMARY_TOP_THEMES = 5
 
-def agent_call_customer_sentiment_analyst_for_reviews(business_id: str, competitor_ids: List[str]) -> bool:
+def _summarize_reviews(reviews: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Per reviewed business: review count, average and distribution of ratings, average
+    sentiment and most frequent themes. Stands in for the full list when
+    `db_get_processed_reviews` is over its output budget (see utils/tool_output.py).
     """
-    Calls Google Maps Places API to get raw reviews for the main business and its competitors.
-    It then stores these raw reviews directly into the `business_review` BigQuery table.
+    by_entity: Dict[str, List[Dict[str, Any]]] = {}
+    for review in reviews:
+        by_entity.setdefault(review.get("business_id") or "unknown", []).append(review)
+    summary = {}
+    for entity_id, entity_reviews in by_entity.items():
+        ratings = [float(r["rating"]) for r in entity_reviews if r.get("rating") is not None]
+        scores = [float(r["sentiment_score"]) for r in entity_reviews if r.get("sentiment_score") is not None]
+        themes: Dict[str, int] = {}
+        for review in entity_reviews:
+            for theme in review.get("themes") or []:
+                themes[theme] = themes.get(theme, 0) + 1
+        posted = [r["timestamp_posted"] for r in entity_reviews if r.get("timestamp_posted")]
+        summary[entity_id] = {
+            "entity_type": entity_reviews[0].get("entity_type"),
+            "reviews": len(entity_reviews),
+            "average_rating": round(sum(ratings) / len(ratings), 2) if ratings else None,
+            "rating_counts": {str(int(rating)): ratings.count(rating) for rating in sorted(set(ratings), reverse=True)},
+            "average_sentiment": round(sum(scores) / len(scores), 3) if scores else None,
+            "top_themes": sorted(themes, key=lambda theme: -themes[theme])[:REVIEW_SUMMARY_TOP_THEMES],
+            "posted_between": [min(posted), max(posted)] if posted else None,
+        }
+    return summary
 
-    Args:
-        business_id (str): The ID of the primary business that *owns* this review collection task.
-                           (Used to fetch business details and competitor details).
-        competitor_ids (List[str]): A list of internal competitor IDs whose reviews need to be collected.
+tool_output.register_summarizer("db_get_processed_reviews", _summarize_reviews)
+
+
+def _collect_and_store_reviews(business_id: str, competitor_ids: List[str]) -> bool:
+    """
+    Fetches the Google Maps reviews of the main business and the given competitors
+    and stores them in the `business_review` table. Runs as a "collect_reviews" job
+    (see `agent_call_customer_sentiment_analyst_for_reviews`) and reports progress
+    after each entity.
 
     Returns:
-        bool: True if raw review collection and storage was successfully initiated, False otherwise.
+        bool: True if the reviews were collected and stored, False otherwise.
     """
-    print(f"\n--- Comparative Agent Tool Call: agent_call_customer_sentiment_analyst_for_reviews ---")
-    
     business_details = db_get_business_details(business_id) # This business_id refers to your main business
     if not business_details or not business_details.get('gmb_id'):
         print(f"Error: Could not retrieve main business details or Google Place ID for business_id '{business_id}'.")
@@ -420,7 +458,7 @@ def agent_call_customer_sentiment_analyst_for_reviews(business_id: str, competit
     print(f"Retrieving and storing raw reviews for main business '{main_business_name}' (Place ID: {main_business_place_id})...")
     raw_business_reviews = maps_get_place_reviews(main_business_place_id)
     
-    for i, review in enumerate(raw_business_reviews):
+    for review in raw_business_reviews:
         full_review_data = {
             "rating": review.get('rating'),
             "text": review.get('text'),
@@ -432,7 +470,7 @@ def agent_call_customer_sentiment_analyst_for_reviews(business_id: str, competit
             "entity_sentiment": {},
             "processed_timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat()
         }
-        review_id_from_source = f"gmb_{main_business_place_id}_{i}_{str(hash(review.get('text', '')))}"
+        review_id_from_source = _review_id(main_business_place_id, review)
 
         db_store_processed_review(
             review_data=full_review_data,
@@ -448,16 +486,20 @@ def agent_call_customer_sentiment_analyst_for_reviews(business_id: str, competit
         comp for comp in competitors_db if comp.get('competitor_id') in competitor_ids
     ]
 
+    total = len(filtered_competitors) + 1   # progress steps: the main business, then each competitor
+    done = 1
     for comp in filtered_competitors:
         comp_name = comp.get('name', 'Unknown Competitor')
         comp_place_id = comp.get('google_place_id')
         comp_internal_id = comp.get('competitor_id') # This is the ID of the competitor to store
 
+        jobs.report_progress(done / total, f"Collecting reviews for competitor '{comp_name}'.")
+        done += 1
         if comp_place_id and comp_internal_id:
             print(f"Retrieving and storing raw reviews for competitor '{comp_name}' (Place ID: {comp_place_id})...")
             raw_comp_reviews = maps_get_place_reviews(comp_place_id)
             
-            for i, review in enumerate(raw_comp_reviews):
+            for review in raw_comp_reviews:
                 full_review_data = {
                     "rating": review.get('rating'),
                     "text": review.get('text'),
@@ -469,7 +511,7 @@ def agent_call_customer_sentiment_analyst_for_reviews(business_id: str, competit
                     "entity_sentiment": {},
                     "processed_timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat()
                 }
-                review_id_from_source = f"gmb_{comp_place_id}_{i}_{str(hash(review.get('text', '')))}"
+                review_id_from_source = _review_id(comp_place_id, review)
 
                 db_store_processed_review(
                     review_data=full_review_data,
@@ -481,10 +523,91 @@ def agent_call_customer_sentiment_analyst_for_reviews(business_id: str, competit
         else:
             print(f"Warning: Competitor '{comp_name}' has no Google Place ID or internal ID. Skipping raw review collection.")
 
+    jobs.report_progress(1.0, "Raw review collection and storage complete.")
+    insights.invalidate(business_id, "health_report")
     print(f"Customer Sentiment Analyst: Raw review collection and storage complete.")
     return True
 
 
+jobs.register("collect_reviews", _collect_and_store_reviews)
+
+
+@traced_tool
+def agent_call_customer_sentiment_analyst_for_reviews(business_id: str, competitor_ids: List[str],
+                                                      tool_context: Optional["ToolContext"] = None) -> Dict[str, Any]:
+    """
+    Starts collecting the raw Google Maps reviews of the main business and its competitors
+    into the `business_review` BigQuery table. The collection runs as a background job;
+    this returns its job ID straight away. Use `agent_get_job_status` to follow it.
+
+    Args:
+        business_id (str): The ID of the primary business that *owns* this review collection task.
+                           (Used to fetch business details and competitor details).
+        competitor_ids (List[str]): A list of internal competitor IDs whose reviews need to be collected.
+        tool_context (Optional[ToolContext]): Injected by the ADK (session business context).
+
+    Returns:
+        Dict[str, Any]: 'status' ('queued' or 'error'), 'job_id' and a 'message' for the user.
+    """
+    print(f"\n--- Comparative Agent Tool Call: agent_call_customer_sentiment_analyst_for_reviews ---")
+
+    # Checked up front so a business without a Place ID is reported now rather than as a failed job.
+    business_details = db_get_business_details(business_id, tool_context)
+    if not business_details or not business_details.get('gmb_id'):
+        print(f"Error: Could not retrieve main business details or Google Place ID for business_id '{business_id}'.")
+        return {"status": "error", "message": f"Business '{business_id}' has no Google Place ID to collect reviews for."}
+
+    job_id = jobs.enqueue("collect_reviews", {"business_id": business_id, "competitor_ids": sorted(competitor_ids or [])},
+                          business_id=business_id)
+    print(f"Review collection for business '{business_id}' queued as job '{job_id}'.")
+    return {
+        "status": "queued",
+        "job_id": job_id,
+        "message": f"Review collection for {business_details.get('name', business_id)} and "
+                   f"{len(competitor_ids or [])} competitor(s) has started in the background.",
+    }
+
+
+@traced_tool
+def agent_get_job_status(job_id: str, tool_context: Optional["ToolContext"] = None) -> Dict[str, Any]:
+    """
+    Returns the status of a background job started by a tool (review collection,
+    simulated data generation).
+
+    Args:
+        job_id (str): The job ID returned when the work was started.
+        tool_context (Optional[ToolContext]): Injected by the ADK (session business context).
+
+    Returns:
+        Dict[str, Any]: 'job_id', 'kind', 'business_id', 'status' ('queued', 'running',
+                        'succeeded' or 'failed'), 'progress' (0-1), 'message', and the
+                        'result' or 'error' once it has finished.
+    """
+    job = jobs.get_job(job_id)
+    if job is None:
+        return {"job_id": job_id, "status": "unknown", "message": f"No job with ID '{job_id}'."}
+    if job["status"] == "succeeded" and job["kind"] == "simulated_data":
+        # New sales data: the session's watermark is stale from here on.
+        session_context.invalidate(tool_context, job["business_id"], "watermark")
+    return {key: job[key] for key in ("job_id", "kind", "business_id", "status", "progress", "message",
+                                      "result", "error", "created_at", "finished_at")}
+
+
+@traced_tool
+def agent_list_jobs(business_id: str) -> List[Dict[str, Any]]:
+    """
+    Lists the most recent background jobs of a business, newest first.
+
+    Args:
+        business_id (str): The business whose jobs to list.
+
+    Returns:
+        List[Dict[str, Any]]: 'job_id', 'kind', 'status', 'progress', 'message' and 'created_at' of each job.
+    """
+    return [{key: job[key] for key in ("job_id", "kind", "status", "progress", "message", "created_at")}
+            for job in jobs.list_jobs(business_id=business_id, limit=10)]
+
+
 def generate_review_comparison_prompt(
     business_name: str,
     business_processed_reviews: List[Dict[str, Any]],
@@ -567,6 +690,7 @@ def call_gemini_api(prompt: str) -> Optional[str]:
         Optional[str]: The generated text from the Gemini model, or None if an error occurs.
     """
     print(f"\n--- Comparative Agent Tool Call: call_gemini_api ---")
+    gemini_model = get_gemini_model()
     if not gemini_model:
         print("Gemini model not initialized. Cannot call API.")
         return None
@@ -575,7 +699,7 @@ def call_gemini_api(prompt: str) -> Optional[str]:
         return None
 
     try:
-        response = gemini_model.generate_content(prompt)
+        response = generate_content(gemini_model, prompt)
         if response.text:
             print("Gemini API call successful.")
             return response.text
@@ -587,13 +711,15 @@ def call_gemini_api(prompt: str) -> Optional[str]:
         return None
 
 
-def agent_call_competitive_edge_analyst(main_business_id: str) -> Optional[str]:
+@traced_tool
+def agent_call_competitive_edge_analyst(main_business_id: str, tool_context: Optional["ToolContext"] = None) -> Optional[str]:
     """
     Calls the Competitive Edge Analyst to perform a comparison on *processed reviews*
     using the Gemini API.
 
     Args:
         main_business_id (str): The ID of the primary business for which to perform the comparison.
+        tool_context (Optional[ToolContext]): Injected by the ADK (session business context).
 
     Returns:
         Optional[str]: The comparative analysis results from the Gemini API, or None if analysis fails.
@@ -602,7 +728,7 @@ def agent_call_competitive_edge_analyst(main_business_id: str) -> Optional[str]:
     print(f"  Performing competitive review analysis for business: '{main_business_id}' using Gemini API.")
 
     # Get main business details to retrieve its internal ID and name
-    business_details = db_get_business_details(main_business_id)
+    business_details = db_get_business_details(main_business_id, tool_context)
     if not business_details or not business_details.get('business_id'):
         print(f"Competitive Edge Analyst: Could not retrieve main business details for ID '{main_business_id}'.")
         return None
@@ -615,7 +741,7 @@ def agent_call_competitive_edge_analyst(main_business_id: str) -> Optional[str]:
     business_processed_reviews = db_get_processed_reviews(main_business_internal_id, entity_type="business")
     
     # Get all competitors linked to this main business from the `competitor` table
-    competitors_db = db_get_competitors(main_business_id)
+    competitors_db = db_get_competitors(main_business_id, tool_context)
     
     competitor_processed_reviews_map_for_prompt = {}
     
@@ -689,12 +815,15 @@ def test_agent_call_competitive_edge_analyst_live(business_id: str):
     """
     print(f"\n--- Running LIVE Test: test_agent_call_competitive_edge_analyst_live for business_id: '{business_id}' ---")
 
+    bq_client = get_bq_client(PROJECT_ID)
     if not bq_client:
         print("BigQuery client not initialized. Cannot run live test.")
         return
+    places_client = get_places_client()
     if not places_client:
         print("Google Places API client not initialized. Cannot run live test.")
         return
+    gemini_model = get_gemini_model()
     if not gemini_model:
         print("Gemini model not initialized. Cannot run live test.")
         return
@@ -708,7 +837,7 @@ def test_agent_call_competitive_edge_analyst_live(business_id: str):
     competitor_ids = [c['competitor_id'] for c in competitors]
 
     print(f"Attempting to collect and store raw reviews for business '{business_id}' and its {len(competitor_ids)} competitors...")
-    collection_success = agent_call_customer_sentiment_analyst_for_reviews(business_id, competitor_ids)
+    collection_success = _collect_and_store_reviews(business_id, competitor_ids)   # inline, so the reviews exist before the analysis
     if not collection_success:
         print("WARNING: Failed to collect and store raw reviews. The competitive analysis might be empty.")
     else:
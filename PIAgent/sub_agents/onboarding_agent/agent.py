@@ -4,7 +4,8 @@
 from google.adk.agents.llm_agent import Agent
 
 from ...shared_libraries import constants
-from .tools import db_check_business_exists, db_create_business, db_check_competitors_exist, db_add_competitor, Maps_search_business, agent_generate_simulated_data
+from ...utils import compaction, context_cache, prefetch, tool_output
+from .tools import db_check_business_exists, db_create_business, db_check_competitors_exist, db_add_competitor, Maps_search_business, agent_generate_simulated_data, agent_generate_bulk_simulated_data, agent_get_job_status, agent_list_jobs
 from ...prompts import onboarding_prompt_text
 
 
@@ -14,6 +15,15 @@ onboarding_agent = Agent(
     description="A helpful agent to onboard new businesses and their competitors into ProfitPilot AI.",
     instruction=onboarding_prompt_text.ONBOARDING_PROMPT,
     tools=[
-        db_check_business_exists, db_create_business, db_check_competitors_exist, db_add_competitor, Maps_search_business, agent_generate_simulated_data
+        db_check_business_exists, db_create_business, db_check_competitors_exist, db_add_competitor, Maps_search_business, agent_generate_simulated_data,
+        agent_generate_bulk_simulated_data, agent_get_job_status, agent_list_jobs, tool_output.get_tool_output_page
     ],
+    # Start loading the business's data in the background once a tool call names it.
+    before_tool_callback=prefetch.before_tool_callback,
+    # Results over their token budget reach the conversation shortened, with a handle for paging.
+    after_tool_callback=[prefetch.after_tool_callback, tool_output.after_tool_callback],
+    # Long conversations reach the model as a rolling summary plus the latest turns; the instruction,
+    # tools and finished turns are then sent as Gemini cached content.
+    before_model_callback=[compaction.before_model_callback, context_cache.before_model_callback],
+    after_model_callback=context_cache.after_model_callback,
 )
@@ -1,20 +1,23 @@
 import uuid
-from google.cloud import bigquery
-import googlemaps
 import os
-from typing import Optional, List, Dict, Any, Union
+from typing import Optional, List, Dict, Any, Union, TYPE_CHECKING
 import json
 import datetime
 import random 
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from ...shared_libraries import constants
-# Import the OLDER Google Maps client library
-import googlemaps
-from google.api_core.exceptions import GoogleAPIError
-from ..comparision_agent.tools import db_get_business_details
+# SDK modules and clients are created lazily on first use (see utils/api_clients.py)
+from ...utils.api_clients import bigquery, get_bq_client, get_places_client, get_gemini_model
+from ...utils.db_utils import run_query
+from ...utils.llm_utils import generate_content
+from ...utils.tracing import span, traced_tool
+from ...utils import insights, jobs, prefetch, session_context
+from ..comparision_agent.tools import db_get_business_details, agent_get_job_status, agent_list_jobs
 
-import google.generativeai as genai
-import dotenv
-dotenv.load_dotenv()
+if TYPE_CHECKING:
+    from google.adk.tools import ToolContext
 
 # --- BigQuery Configuration ---
 PROJECT_ID = constants.PROJECT_ID
@@ -24,43 +27,9 @@ TABLE_COMPETITOR = f"{PROJECT_ID}.{DATASET_ID}.competitor"
 TABLE_INVENTORY_ITEM = f"{PROJECT_ID}.{DATASET_ID}.inventory_item" # New table constant
 TABLE_SALES_TRANSACTION = f"{PROJECT_ID}.{DATASET_ID}.sales_transaction" # New table constant
 
-# --- BigQuery Client Initialization ---
-try:
-    bq_client = bigquery.Client(project=PROJECT_ID, location='US')
-    print(f"BigQuery client initialized for project: {PROJECT_ID}")
-except Exception as e:
-    print(f"Error initializing BigQuery client: {e}")
-    bq_client = None
-
-# --- Google Maps API Configuration ---
-GMAPS_API_KEY = constants.GOOGLE_MAP_API_KEY
-
-if not GMAPS_API_KEY:
-    print("WARNING: Maps_API_KEY environment variable not set. Maps_search_business will not function.")
-    gmaps_client = None
-else:
-    gmaps_client = googlemaps.Client(key=GMAPS_API_KEY)
-
-# --- Gemini API Configuration ---
-GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY") # Using GOOGLE_API_KEY as per your setup
-if not GEMINI_API_KEY:
-    print("Warning: GOOGLE_API_KEY environment variable not set. Gemini API calls might fail.")
-else:
-    genai.configure(api_key=GEMINI_API_KEY)
-    print("Gemini API configured.")
-
-
-
-
-# --- Gemini Model Initialization ---
-try:
-    gemini_model = genai.GenerativeModel('gemini-1.5-flash')
-    print("Gemini model initialized for text generation.")
-except Exception as e:
-    print(f"Error initializing Gemini model: {e}")
-    gemini_model = None
 # --- Tool Functions for Onboarding Agent ---
 
+@traced_tool
 def db_check_business_exists(business_name: str) -> List[Dict[str, Any]]:
     """
     Checks if a business with the given name already exists in the system (BigQuery).
@@ -75,6 +44,7 @@ def db_check_business_exists(business_name: str) -> List[Dict[str, Any]]:
                               Returns an empty list if no matches are found.
     """
     print(f"ADK Tool Call: db_check_business_exists(business_name='{business_name}')")
+    bq_client = get_bq_client(PROJECT_ID)
     if not bq_client:
         print("BigQuery client not initialized. Cannot check business existence.")
         return []
@@ -93,7 +63,7 @@ def db_check_business_exists(business_name: str) -> List[Dict[str, Any]]:
     ]
 
     try:
-        query_job = bq_client.query(query, job_config=bigquery.QueryJobConfig(query_parameters=query_params))
+        query_job = run_query(bq_client, query, job_config=bigquery.QueryJobConfig(query_parameters=query_params), tool_name="db_check_business_exists")
         rows = query_job.result()
 
         matches = []
@@ -120,6 +90,33 @@ def db_check_business_exists(business_name: str) -> List[Dict[str, Any]]:
         return []
 
 
+def db_list_business_ids() -> List[str]:
+    """
+    Lists the IDs of all businesses in the system, e.g. for the nightly batch.
+
+    Returns:
+        List[str]: Business IDs in ascending order. Empty on error.
+    """
+    bq_client = get_bq_client(PROJECT_ID)
+    if not bq_client:
+        print("BigQuery client not initialized. Cannot list businesses.")
+        return []
+
+    query = f"""
+    SELECT DISTINCT business_id
+    FROM `{TABLE_BUSINESS}`
+    WHERE business_id IS NOT NULL
+    ORDER BY business_id
+    """
+    try:
+        rows = run_query(bq_client, query, tool_name="db_list_business_ids").result()
+        return [row.business_id for row in rows]
+    except Exception as e:
+        print(f"Error listing businesses from BigQuery: {e}")
+        return []
+
+
+@traced_tool
 def db_create_business(name: str, address: str, business_type: str, description: str,
                        gmb_id: Optional[str] = None, owner_contact: Optional[str] = None) -> Optional[Dict[str, Any]]:
     """
@@ -139,6 +136,7 @@ def db_create_business(name: str, address: str, business_type: str, description:
                                   including its 'business_id', otherwise None if creation fails.
     """
     print(f"ADK Tool Call: db_create_business(name='{name}', address='{address}', business_type='{business_type}', description='{description}', gmb_id='{gmb_id}', owner_contact='{owner_contact}')")
+    bq_client = get_bq_client(PROJECT_ID)
     if not bq_client:
         print("BigQuery client not initialized. Cannot create business.")
         return None
@@ -173,7 +171,7 @@ def db_create_business(name: str, address: str, business_type: str, description:
     )
 
     try:
-        query_job = bq_client.query(query, job_config=job_config)
+        query_job = run_query(bq_client, query, job_config=job_config, tool_name="db_create_business", business_id=business_id_val)
         query_job.result()
 
         created_business_details = {
@@ -194,6 +192,7 @@ def db_create_business(name: str, address: str, business_type: str, description:
         return None
 
 
+@traced_tool
 def db_check_competitors_exist(business_id: str) -> List[Dict[str, Any]]:
     """
     Checks if any competitors are already set up for a given business ID (BigQuery).
@@ -208,6 +207,7 @@ def db_check_competitors_exist(business_id: str) -> List[Dict[str, Any]]:
                               Returns an empty list if no competitors are found.
     """
     print(f"ADK Tool Call: db_check_competitors_exist(business_id='{business_id}')")
+    bq_client = get_bq_client(PROJECT_ID)
     if not bq_client:
         print("BigQuery client not initialized. Cannot check competitors.")
         return []
@@ -225,7 +225,7 @@ def db_check_competitors_exist(business_id: str) -> List[Dict[str, Any]]:
     ]
 
     try:
-        query_job = bq_client.query(query, job_config=bigquery.QueryJobConfig(query_parameters=query_params))
+        query_job = run_query(bq_client, query, job_config=bigquery.QueryJobConfig(query_parameters=query_params), tool_name="db_check_competitors_exist", business_id=business_id)
         rows = query_job.result()
 
         competitors = []
@@ -246,8 +246,9 @@ def db_check_competitors_exist(business_id: str) -> List[Dict[str, Any]]:
         print(f"Error checking competitors existence in BigQuery: {e}")
         return []
 
+@traced_tool
 def db_add_competitor(business_id: str, competitor_name: str, website_url: str,
-                      google_place_id: Optional[str] = None) -> bool:
+                      google_place_id: Optional[str] = None, tool_context: Optional["ToolContext"] = None) -> bool:
     """
     Adds a competitor to an existing business in the system (BigQuery).
 
@@ -256,11 +257,14 @@ def db_add_competitor(business_id: str, competitor_name: str, website_url: str,
         competitor_name (str): The name of the competitor.
         website_url (str): The website URL of the competitor.
         google_place_id (Optional[str]): Google Place ID for the competitor.
+        tool_context (Optional[ToolContext]): Injected by the ADK; the session's cached
+                                              competitor list is invalidated.
 
     Returns:
         bool: True if the competitor was successfully added, False otherwise.
     """
     print(f"ADK Tool Call: db_add_competitor(business_id='{business_id}', competitor_name='{competitor_name}', website_url='{website_url}', google_place_id='{google_place_id}')")
+    bq_client = get_bq_client(PROJECT_ID)
     if not bq_client:
         print("BigQuery client not initialized. Cannot add competitor.")
         return False
@@ -288,9 +292,11 @@ def db_add_competitor(business_id: str, competitor_name: str, website_url: str,
     )
 
     try:
-        query_job = bq_client.query(query, job_config=job_config)
+        query_job = run_query(bq_client, query, job_config=job_config, tool_name="db_add_competitor", business_id=business_id)
         query_job.result()
         print(f"BigQuery: Competitor '{competitor_name}' added for business ID '{business_id}'.")
+        session_context.invalidate(tool_context, business_id, "competitors")
+        prefetch.invalidate(business_id, "competitors")
         return True
 
     except Exception as e:
@@ -298,6 +304,7 @@ def db_add_competitor(business_id: str, competitor_name: str, website_url: str,
         return False
 
 
+@traced_tool
 def Maps_search_business(query: str, location_bias: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
     """
     Searches Google Maps for business information using the actual Google Maps Places API.
@@ -312,6 +319,7 @@ def Maps_search_business(query: str, location_bias: Optional[Dict[str, float]] =
                               with keys like 'name', 'address', 'place_id', 'website', 'phone_number'.
     """
     print(f"ADK Tool Call: Maps_search_business(query='{query}', location_bias={location_bias})")
+    gmaps_client = get_places_client()
     if not gmaps_client:
         print("Google Maps client not initialized. Cannot search businesses.")
         return []
@@ -326,11 +334,13 @@ def Maps_search_business(query: str, location_bias: Optional[Dict[str, float]] =
             # If the user provides a "location_bias" but no explicit radius, pick a reasonable default
             gmaps_radius = 5000 # Example: 5km radius for biasing
 
-        response = gmaps_client.places(
-            query=query,
-            location=gmaps_location, # Pass if available, else None
-            radius=gmaps_radius # Pass if available, else None
-        )
+        with span("places.text_search", **{"places.query": query}) as places_span:
+            response = gmaps_client.places(
+                query=query,
+                location=gmaps_location, # Pass if available, else None
+                radius=gmaps_radius # Pass if available, else None
+            )
+            places_span.set_attribute("places.result_count", len(response.get('results', [])))
         # print(f"Google Maps API Response: {response}")
         results = []
         if 'results' in response:
@@ -358,6 +368,7 @@ def db_insert_inventory_item(item_data: Dict[str, Any]) -> bool:
     Inserts a single inventory item into the `inventory_item` BigQuery table.
     """
     print(f"\n--- Tool Call: db_insert_inventory_item ---")
+    bq_client = get_bq_client(PROJECT_ID)
     if not bq_client:
         print("BigQuery client not initialized. Cannot insert inventory item.")
         return False
@@ -393,7 +404,7 @@ def db_insert_inventory_item(item_data: Dict[str, Any]) -> bool:
     )
 
     try:
-        query_job = bq_client.query(query, job_config=job_config)
+        query_job = run_query(bq_client, query, job_config=job_config, tool_name="db_insert_inventory_item", business_id=item_data.get('business_id'))
         query_job.result()
         print(f"BigQuery: Successfully inserted inventory item '{item_data.get('item_name')}' for business '{item_data.get('business_id')}'.")
         return True
@@ -406,6 +417,7 @@ def db_insert_sales_transaction(transaction_data: Dict[str, Any]) -> bool:
     Inserts a single sales transaction into the `sales_transaction` BigQuery table.
     """
     print(f"\n--- Tool Call: db_insert_sales_transaction ---")
+    bq_client = get_bq_client(PROJECT_ID)
     if not bq_client:
         print("BigQuery client not initialized. Cannot insert sales transaction.")
         return False
@@ -444,7 +456,7 @@ def db_insert_sales_transaction(transaction_data: Dict[str, Any]) -> bool:
     )
 
     try:
-        query_job = bq_client.query(query, job_config=job_config)
+        query_job = run_query(bq_client, query, job_config=job_config, tool_name="db_insert_sales_transaction", business_id=transaction_data.get('business_id'))
         query_job.result()
         print(f"BigQuery: Successfully inserted sales transaction for item '{transaction_data.get('item_name')}' for business '{transaction_data.get('business_id')}'.")
         return True
@@ -454,21 +466,202 @@ def db_insert_sales_transaction(transaction_data: Dict[str, Any]) -> bool:
 
 # --- NEW TOOL FOR GENERATING SIMULATED DATA ---
 
-def agent_generate_simulated_data(business_id: str) -> bool:
+# LLM-authored history: one inventory call, then one call per chunk of days.
+SIMULATED_DATA_DAYS = 60
+SIMULATED_DATA_CHUNK_DAYS = 7
+SIMULATED_DATA_TRANSACTIONS_PER_CHUNK = (4, 6)
+SIMULATED_DATA_CHUNK_ATTEMPTS = 3
+
+_INVENTORY_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "inferred_business_type": {
+            "type": "STRING",
+            "description": "The business type inferred by Gemini from the provided details (e.g., 'Coffee Shop', 'Shoe Store', 'Grocery Store')."
+        },
+        "inventory_items": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "item_name": {"type": "STRING", "description": "Name of the inventory item"},
+                    "category": {"type": "STRING", "description": "Category of the item (e.g., 'Beverage', 'Pastry', 'Footwear')"},
+                    "current_stock_level": {"type": "INTEGER", "description": "Current number of units in stock"},
+                    "reorder_threshold": {"type": "INTEGER", "description": "Stock level at which to reorder"},
+                    "unit_cost": {"type": "NUMBER", "format": "float", "description": "Cost to the business per unit"},
+                    "unit_price": {"type": "NUMBER", "format": "float", "description": "Selling price per unit"},
+                    "is_perishable": {"type": "BOOLEAN", "description": "True if the item has a limited shelf life"},
+                    "shelf_life_days": {"type": "INTEGER", "description": "Number of days item remains fresh, if perishable"}
+                },
+                "required": ["item_name", "category", "current_stock_level", "reorder_threshold", "unit_cost", "unit_price"]
+            }
+        }
+    },
+    "required": ["inferred_business_type", "inventory_items"]
+}
+
+_TRANSACTIONS_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "sales_transactions": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "item_name": {"type": "STRING", "description": "Name of the item sold (must match an inventory item name)"},
+                    "quantity": {"type": "INTEGER", "description": "Number of units sold in this transaction line item"},
+                    "price_per_unit": {"type": "NUMBER", "format": "float", "description": "Actual price per unit at sale time"},
+                    "timestamp": {"type": "STRING", "format": "date-time", "description": "ISO 8601 timestamp of the transaction"},
+                    "payment_method": {"type": "STRING", "description": "Payment method (e.g., 'Credit Card', 'Cash', 'Mobile Pay')"},
+                    "customer_id": {"type": "STRING", "description": "Optional customer identifier"}
+                },
+                "required": ["item_name", "quantity", "price_per_unit", "timestamp"]
+            }
+        }
+    },
+    "required": ["sales_transactions"]
+}
+
+
+def _parse_timestamp(timestamp_str: Optional[str]) -> Optional[datetime.datetime]:
+    """Parses an ISO 8601 timestamp from Gemini into an aware UTC datetime (None if invalid)."""
+    if not timestamp_str:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(str(timestamp_str).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.astimezone(datetime.timezone.utc)
+
+
+def _store_simulated_inventory(business_id: str, inventory_items: List[Dict[str, Any]],
+                               item_ids: Dict[str, str]) -> int:
+    """Inserts the Gemini-generated inventory items; returns how many were stored."""
+    stored = 0
+    now_iso = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    for item in inventory_items:
+        insert_data = {
+            "id": str(uuid.uuid4()),
+            "business_id": business_id,
+            "category": item.get('category'),
+            "current_stock_level": item.get('current_stock_level'),
+            "is_perishable": item.get('is_perishable', False),
+            "item_id": item_ids[item['item_name']],
+            "item_name": item.get('item_name'),
+            "last_updated": now_iso,
+            "reorder_threshold": item.get('reorder_threshold'),
+            "shelf_life_days": item.get('shelf_life_days'),
+            "supplier_id": str(uuid.uuid4())[:8], # Mock supplier ID
+            "unit_cost": item.get('unit_cost'),
+            "unit_price": item.get('unit_price'),
+        }
+        stored += bool(db_insert_inventory_item(insert_data))
+    return stored
+
+
+def _generate_transaction_chunk(gemini_model: Any, business_id: str, business_type: str,
+                                inventory_items: List[Dict[str, Any]], item_ids: Dict[str, str],
+                                chunk_start: datetime.date, chunk_end: datetime.date) -> List[Dict[str, Any]]:
+    """
+    Asks Gemini for the transactions of one chunk of days and turns them into
+    `sales_transaction` rows. Transactions dated outside [chunk_start, chunk_end]
+    are dropped, so a chunk never lands on another week's days. Retries the chunk
+    on its own when the response is empty, not valid JSON, or has no usable
+    transactions.
+
+    Returns:
+        List[Dict[str, Any]]: The chunk's rows (empty if every attempt failed).
+    """
+    costs = {item['item_name']: item.get('unit_cost', 0.0) for item in inventory_items}
+    menu = "\n".join(f"    - {item['item_name']} (${item.get('unit_price')})" for item in inventory_items)
+    n_min, n_max = SIMULATED_DATA_TRANSACTIONS_PER_CHUNK
+    prompt = f"""
+    You are simulating sales for a {business_type}. Its inventory items and list prices are:
+{menu}
+
+    Generate {n_min}-{n_max} realistic sales transactions between {chunk_start.isoformat()} and {chunk_end.isoformat()} (inclusive).
+    The 'item_name' must exactly match one of the inventory items above. Vary quantities, prices (slightly, if realistic),
+    and timestamps (ISO 8601, within business hours) to simulate trends. Include payment methods and optional customer IDs.
+
+    Provide the output as a JSON object strictly conforming to the response schema.
+    """
+
+    for attempt in range(1, SIMULATED_DATA_CHUNK_ATTEMPTS + 1):
+        with span("simulated_data.chunk", **{"profitpilot.chunk_start": chunk_start.isoformat(),
+                                             "profitpilot.attempt": attempt}) as s:
+            try:
+                response = generate_content(
+                    gemini_model,
+                    prompt,
+                    generation_config={"response_mime_type": "application/json",
+                                       "response_schema": _TRANSACTIONS_RESPONSE_SCHEMA}
+                )
+                transactions = json.loads(response.text).get("sales_transactions", []) if response.text else []
+            except Exception as e:
+                print(f"Warning: chunk starting {chunk_start} attempt {attempt} failed: {e}")
+                transactions = []
+
+            rows = []
+            for transaction in transactions:
+                item_name = transaction.get('item_name')
+                transaction_dt = _parse_timestamp(transaction.get('timestamp'))
+                if item_name not in item_ids or transaction_dt is None:
+                    continue
+                if not chunk_start <= transaction_dt.date() <= chunk_end:
+                    continue
+                quantity = transaction.get('quantity', 0)
+                price_per_unit = transaction.get('price_per_unit', 0.0)
+                cost_per_unit = costs.get(item_name) or 0.0
+                total_line_revenue = quantity * price_per_unit
+                total_line_cost = quantity * cost_per_unit
+                rows.append({
+                    "id": str(uuid.uuid4()),
+                    "business_id": business_id,
+                    "cost_per_unit": cost_per_unit,
+                    "customer_id": transaction.get('customer_id', str(uuid.uuid4())[:8]), # Mock customer ID
+                    "item_id": item_ids[item_name],
+                    "item_name": item_name,
+                    "line_item_id": str(uuid.uuid4()),
+                    "payment_method": transaction.get('payment_method', 'Unknown'),
+                    "price_per_unit": price_per_unit,
+                    "quantity": quantity,
+                    "timestamp": transaction_dt.isoformat(),
+                    "total_line_cost": total_line_cost,
+                    "total_line_profit": total_line_revenue - total_line_cost,
+                    "total_line_revenue": total_line_revenue,
+                    "transaction_date": transaction_dt.date().isoformat(),
+                    "transaction_id": str(uuid.uuid4()),
+                })
+            s.set_attribute("profitpilot.rows", len(rows))
+            if rows:
+                return rows
+        if attempt < SIMULATED_DATA_CHUNK_ATTEMPTS:
+            time.sleep(0.5 * 2 ** (attempt - 1))
+
+    print(f"Warning: giving up on simulated transactions for {chunk_start} - {chunk_end}.")
+    return []
+
+
+def _generate_simulated_data(business_id: str) -> bool:
     """
     Generates simulated inventory and sales data for a given business ID using Gemini.
     It fetches all business details and lets Gemini infer the business_type
-    to generate relevant data.
+    to generate relevant data. Runs as a "simulated_data" job (see
+    `agent_generate_simulated_data`) and reports progress after each stored week.
+
+    Generation is split into one inventory call followed by parallel calls for
+    each week of transactions. Each week is retried on its own, and finished
+    weeks are stored while the others are still generating.
 
     Args:
         business_id (str): The ID of the business for which to generate data.
 
     Returns:
-        bool: True if data generation and storage was successful, False otherwise.
+        bool: True if the inventory and at least one week of sales were stored, False otherwise.
     """
-    print(f"\n--- Tool Call: agent_generate_simulated_data ---")
-
-    # Step 1: Get ALL business details from the database
+    # Step 1: Get ALL business details
     business_details = db_get_business_details(business_id)
     if not business_details:
         print(f"Error: Could not retrieve business details for business_id '{business_id}'. Cannot generate simulated data.")
@@ -488,59 +681,15 @@ def agent_generate_simulated_data(business_id: str) -> bool:
     print(f"  Business Name: {business_name}, Description: {business_description}, Stored Type: {stored_business_type}")
 
 
+    gemini_model = get_gemini_model()
     if not gemini_model:
         print("Gemini model not initialized. Cannot generate simulated data.")
         return False
 
-    # Define the JSON schema for Gemini's response
-    # Added 'inferred_business_type' to the schema
-    response_schema = {
-        "type": "OBJECT",
-        "properties": {
-            "inferred_business_type": {
-                "type": "STRING",
-                "description": "The business type inferred by Gemini from the provided details (e.g., 'Coffee Shop', 'Shoe Store', 'Grocery Store')."
-            },
-            "inventory_items": {
-                "type": "ARRAY",
-                "items": {
-                    "type": "OBJECT",
-                    "properties": {
-                        "item_name": {"type": "STRING", "description": "Name of the inventory item"},
-                        "category": {"type": "STRING", "description": "Category of the item (e.g., 'Beverage', 'Pastry', 'Footwear')"},
-                        "current_stock_level": {"type": "INTEGER", "description": "Current number of units in stock"},
-                        "reorder_threshold": {"type": "INTEGER", "description": "Stock level at which to reorder"},
-                        "unit_cost": {"type": "NUMBER", "format": "float", "description": "Cost to the business per unit"},
-                        "unit_price": {"type": "NUMBER", "format": "float", "description": "Selling price per unit"},
-                        "is_perishable": {"type": "BOOLEAN", "description": "True if the item has a limited shelf life"},
-                        "shelf_life_days": {"type": "INTEGER", "description": "Number of days item remains fresh, if perishable"}
-                    },
-                    "required": ["item_name", "category", "current_stock_level", "reorder_threshold", "unit_cost", "unit_price"]
-                }
-            },
-            "sales_transactions": {
-                "type": "ARRAY",
-                "items": {
-                    "type": "OBJECT",
-                    "properties": {
-                        "item_name": {"type": "STRING", "description": "Name of the item sold (must match an inventory item name)"},
-                        "quantity": {"type": "INTEGER", "description": "Number of units sold in this transaction line item"},
-                        "price_per_unit": {"type": "NUMBER", "format": "float", "description": "Actual price per unit at sale time"},
-                        "timestamp": {"type": "STRING", "format": "date-time", "description": "ISO 8601 timestamp of the transaction"},
-                        "payment_method": {"type": "STRING", "description": "Payment method (e.g., 'Credit Card', 'Cash', 'Mobile Pay')"},
-                        "customer_id": {"type": "STRING", "description": "Optional customer identifier"}
-                    },
-                    "required": ["item_name", "quantity", "price_per_unit", "timestamp"]
-                }
-            }
-        },
-        "required": ["inferred_business_type", "inventory_items", "sales_transactions"]
-    }
-
-    # Construct the prompt for Gemini, including all details for inference
+    # Step 2: Inventory (and the inferred business type) in one small call
     prompt = f"""
     Based on the following business details, first **infer the most appropriate business type**.
-    Then, generate realistic simulated inventory items and sales transactions relevant to that **inferred business type**.
+    Then, generate realistic simulated inventory items relevant to that **inferred business type**.
 
     **Business Details:**
     - Name: {business_name}
@@ -551,17 +700,15 @@ def agent_generate_simulated_data(business_id: str) -> bool:
     - Owner Contact: {owner_contact}
 
     For inventory, create 5-10 distinct items relevant to the inferred business type. Include typical stock levels, reorder points, costs, and prices. Consider if items are perishable.
-    
-    For sales, generate 30-50 sales transactions over the last 60 days. Ensure the 'item_name' in sales transactions exactly matches an 'item_name' from your generated inventory items. Vary quantities, prices (slightly, if realistic), and timestamps to simulate trends. Include payment methods and optional customer IDs.
-    
+
     Provide the output as a JSON object strictly conforming to the following schema:
     """
 
     try:
-        # Call Gemini with the structured response schema
-        response = gemini_model.generate_content(
+        response = generate_content(
+            gemini_model,
             prompt,
-            generation_config={"response_mime_type": "application/json", "response_schema": response_schema}
+            generation_config={"response_mime_type": "application/json", "response_schema": _INVENTORY_RESPONSE_SCHEMA}
         )
 
         if not response.text:
@@ -569,105 +716,248 @@ def agent_generate_simulated_data(business_id: str) -> bool:
             return False
 
         generated_data = json.loads(response.text)
-
         inferred_business_type = generated_data.get("inferred_business_type", "unknown")
-        inventory_items = generated_data.get("inventory_items", [])
-        sales_transactions = generated_data.get("sales_transactions", [])
+        inventory_items = [item for item in generated_data.get("inventory_items", []) if item.get('item_name')]
+    except Exception as e:
+        print(f"Error in agent_generate_simulated_data: {e}")
+        return False
 
-        if not inventory_items and not sales_transactions:
-            print("Gemini generated empty inventory and sales data.")
-            return False
+    if not inventory_items:
+        print("Gemini generated empty inventory data.")
+        return False
+
+    print(f"Gemini inferred business type: {inferred_business_type}")
+    item_ids = {item['item_name']: str(uuid.uuid4()) for item in inventory_items}
+
+    # Step 3: Store inventory and generate each week of sales in parallel,
+    # loading every week as soon as it is ready.
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    history_start = today - datetime.timedelta(days=SIMULATED_DATA_DAYS)
+    chunks = []
+    chunk_start = history_start
+    while chunk_start < today:
+        chunk_end = min(today - datetime.timedelta(days=1), chunk_start + datetime.timedelta(days=SIMULATED_DATA_CHUNK_DAYS - 1))
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = chunk_end + datetime.timedelta(days=1)
+
+    rows_stored = 0
+    chunks_stored = 0
+    chunks_done = 0
+    # One worker per task (the inventory and every week), so all of them run in a single wave.
+    with ThreadPoolExecutor(max_workers=len(chunks) + 1) as pool:
+        # Each task runs in its own copy of the context so spans nest under this tool call.
+        inventory_future = pool.submit(contextvars.copy_context().run, _store_simulated_inventory,
+                                       business_id, inventory_items, item_ids)
+        chunk_futures = [
+            pool.submit(contextvars.copy_context().run, _generate_transaction_chunk, gemini_model, business_id,
+                        inferred_business_type, inventory_items, item_ids, start, end)
+            for start, end in chunks
+        ]
+        for future in as_completed(chunk_futures):
+            rows = future.result()
+            loaded = db_bulk_load_sales_transactions(rows, business_id)
+            rows_stored += loaded
+            chunks_stored += bool(loaded)
+            chunks_done += 1
+            jobs.report_progress(chunks_done / len(chunks), f"Generated {chunks_done} of {len(chunks)} weeks of sales.")
+        inventory_stored = inventory_future.result()
+
+    print(f"Stored {inventory_stored} inventory items and {rows_stored} sales transactions "
+          f"({chunks_stored}/{len(chunks)} weeks) for '{inferred_business_type}' business.")
+    prefetch.invalidate(business_id, "inventory_status", "daily_item_sales")
+    insights.invalidate(business_id)
+    return inventory_stored > 0 and chunks_stored > 0
 
-        print(f"Gemini inferred business type: {inferred_business_type}")
 
-        # Store Inventory Items
-        print(f"Storing {len(inventory_items)} generated inventory items...")
-        item_name_to_id_map = {} # To link sales transactions to item_ids
+# Not retried: the inventory and each finished week are inserted with fresh IDs, so a rerun would duplicate them.
+jobs.register("simulated_data", _generate_simulated_data, retry=False)
+
+
+@traced_tool
+def agent_generate_simulated_data(business_id: str, tool_context: Optional["ToolContext"] = None) -> Dict[str, Any]:
+    """
+    Starts generating simulated inventory and sales data for a business with Gemini.
+    Generation runs as a background job; this returns its job ID straight away.
+    Use `agent_get_job_status` to follow it.
+
+    Args:
+        business_id (str): The ID of the business for which to generate data.
+        tool_context (Optional[ToolContext]): Injected by the ADK (session business context).
+
+    Returns:
+        Dict[str, Any]: 'status' ('queued' or 'error'), 'job_id' and a 'message' for the user.
+    """
+    print(f"\n--- Tool Call: agent_generate_simulated_data ---")
+
+    business_details = db_get_business_details(business_id, tool_context)
+    if not business_details:
+        print(f"Error: Could not retrieve business details for business_id '{business_id}'. Cannot generate simulated data.")
+        return {"status": "error", "message": f"Business '{business_id}' was not found."}
+
+    job_id = jobs.enqueue("simulated_data", {"business_id": business_id}, business_id=business_id)
+    # Sales data is about to change; the watermark is reloaded on the next read.
+    session_context.invalidate(tool_context, business_id, "watermark")
+    print(f"Simulated data generation for business '{business_id}' queued as job '{job_id}'.")
+    return {
+        "status": "queued",
+        "job_id": job_id,
+        "message": f"Simulated data for {business_details.get('name', business_id)} is being generated in the background.",
+    }
+
+
+# --- Bulk simulated data (local generator) ---
+
+def db_get_inventory_items(business_id: str) -> List[Dict[str, Any]]:
+    """
+    Retrieves the inventory items of a business (item_id, item_name, category, unit_cost, unit_price, ...).
+    """
+    print(f"\n--- Tool Call: db_get_inventory_items ---")
+    bq_client = get_bq_client(PROJECT_ID)
+    if not bq_client:
+        print("BigQuery client not initialized. Cannot read inventory items.")
+        return []
+
+    query = f"""
+    SELECT item_id, item_name, category, unit_cost, unit_price, is_perishable, shelf_life_days
+    FROM `{TABLE_INVENTORY_ITEM}`
+    WHERE business_id = @business_id
+    """
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[bigquery.ScalarQueryParameter("business_id", "STRING", business_id)]
+    )
+    try:
+        query_job = run_query(bq_client, query, job_config=job_config, tool_name="db_get_inventory_items", business_id=business_id)
+        return [dict(row) for row in query_job.result()]
+    except Exception as e:
+        print(f"Error reading inventory items from BigQuery: {e}")
+        return []
+
+
+def db_bulk_load_sales_transactions(rows: List[Dict[str, Any]], business_id: Optional[str] = None) -> int:
+    """
+    Appends sales transaction rows to the `sales_transaction` table with a single
+    BigQuery load job (instead of one INSERT query per row).
+
+    Args:
+        rows (List[Dict[str, Any]]): Rows keyed by `sales_transaction` column name.
+        business_id (Optional[str]): The tenant the rows belong to (for logging and tracing).
+
+    Returns:
+        int: Number of rows loaded (0 on failure).
+    """
+    if not rows:
+        return 0
+    bq_client = get_bq_client(PROJECT_ID)
+    if not bq_client:
+        print("BigQuery client not initialized. Cannot bulk load sales transactions.")
+        return 0
+
+    job_config = bigquery.LoadJobConfig(
+        write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+        source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+    )
+    try:
+        with span("bigquery.load", **{"db.system": "bigquery", "profitpilot.business_id": business_id,
+                                      "db.bigquery.rows": len(rows)}):
+            load_job = bq_client.load_table_from_json(rows, TABLE_SALES_TRANSACTION, job_config=job_config)
+            load_job.result()
+        return len(rows)
+    except Exception as e:
+        print(f"Error bulk loading sales transactions to BigQuery: {e}")
+        return 0
+
+
+@traced_tool
+def agent_generate_bulk_simulated_data(business_id: str, days: int = 365, transactions_per_day: int = 300,
+                                       seed: int = 42, tool_context: Optional["ToolContext"] = None) -> Dict[str, Any]:
+    """
+    Generates a large, realistic sales history for a business locally (no LLM
+    calls for the transactions) and bulk loads it into the database.
+
+    The business's existing inventory is used if it has one (e.g. from
+    `agent_generate_simulated_data`); otherwise a template catalog for its
+    business type is stored first. Sales follow day-of-week and hour-of-day
+    patterns with a growth trend, promotions and price noise. The same seed
+    always produces the same data.
+
+    Args:
+        business_id (str): The ID of the business for which to generate data.
+        days (int): Number of days of history, ending yesterday. Defaults to 365.
+        transactions_per_day (int): Average transactions per day. Defaults to 300.
+        seed (int): Random seed for reproducible data. Defaults to 42.
+        tool_context (Optional[ToolContext]): Injected by the ADK (session business context).
+
+    Returns:
+        Dict[str, Any]: Summary with 'status', 'inventory_source', 'items',
+                        'rows_loaded', 'start_date' and 'end_date'.
+    """
+    from .synthetic_data import chunk_to_rows, generate_sales_chunks, template_inventory
+
+    print(f"\n--- Tool Call: agent_generate_bulk_simulated_data ---")
+    if days <= 0:
+        return {"status": "error", "message": f"days must be a positive number of days, got {days}."}
+    business_details = db_get_business_details(business_id, tool_context)
+    if not business_details:
+        print(f"Error: Could not retrieve business details for business_id '{business_id}'.")
+        return {"status": "error", "message": f"Business '{business_id}' not found."}
+    business_type = business_details.get('business_type') or business_details.get('name')
+
+    inventory_items = db_get_inventory_items(business_id)
+    inventory_source = "existing"
+    if not inventory_items:
+        inventory_source = "template"
+        inventory_items = template_inventory(business_type)
+        now_iso = datetime.datetime.now(datetime.timezone.utc).isoformat()
         for item in inventory_items:
-            item_id = str(uuid.uuid4())
-            item_name_to_id_map[item['item_name']] = item_id
-            
-            insert_data = {
+            item['item_id'] = f"{business_id}_{item['item_id']}"
+            db_insert_inventory_item({
                 "id": str(uuid.uuid4()),
                 "business_id": business_id,
-                "category": item.get('category'),
-                "current_stock_level": item.get('current_stock_level'),
-                "is_perishable": item.get('is_perishable', False),
-                "item_id": item_id,
-                "item_name": item.get('item_name'),
-                "last_updated": datetime.datetime.now(datetime.timezone.utc).isoformat(),
-                "reorder_threshold": item.get('reorder_threshold'),
-                "shelf_life_days": item.get('shelf_life_days'),
-                "supplier_id": str(uuid.uuid4())[:8], # Mock supplier ID
-                "unit_cost": item.get('unit_cost'),
-                "unit_price": item.get('unit_price'),
-            }
-            db_insert_inventory_item(insert_data)
-
-        # Store Sales Transactions
-        print(f"Storing {len(sales_transactions)} generated sales transactions...")
-        for transaction in sales_transactions:
-            item_name = transaction.get('item_name')
-            item_id = item_name_to_id_map.get(item_name) # Get item_id from map
-
-            if not item_id:
-                print(f"Warning: Skipping sales transaction for unknown item_name '{item_name}'.")
-                continue
-
-            quantity = transaction.get('quantity', 0)
-            price_per_unit = transaction.get('price_per_unit', 0.0)
-            cost_per_unit = 0.0 # Will try to derive from inventory if possible
-            
-            # Attempt to find unit_cost from generated inventory items
-            for inv_item in inventory_items:
-                if inv_item.get('item_name') == item_name:
-                    cost_per_unit = inv_item.get('unit_cost', 0.0)
-                    break
-
-            total_line_revenue = quantity * price_per_unit
-            total_line_cost = quantity * cost_per_unit
-            total_line_profit = total_line_revenue - total_line_cost
-
-            # Ensure timestamp is in correct format
-            timestamp_str = transaction.get('timestamp')
-            transaction_dt = None
-            if timestamp_str:
-                try:
-                    # Parse assuming ISO 8601, then convert to UTC and isoformat
-                    transaction_dt = datetime.datetime.now(datetime.timezone.utc).isoformat()
-                except ValueError:
-                    print(f"Warning: Could not parse timestamp '{timestamp_str}'. Using current time.")
-                    transaction_dt = datetime.datetime.now(datetime.timezone.utc).isoformat()
-            else:
-                transaction_dt = datetime.datetime.now(datetime.timezone.utc).isoformat()
-
-
-            insert_data = {
-                "id": str(uuid.uuid4()),
-                "business_id": business_id,
-                "cost_per_unit": cost_per_unit,
-                "customer_id": transaction.get('customer_id', str(uuid.uuid4())[:8]), # Mock customer ID
-                "item_id": item_id,
-                "item_name": item_name,
-                "line_item_id": str(uuid.uuid4()),
-                "payment_method": transaction.get('payment_method', 'Unknown'),
-                "price_per_unit": price_per_unit,
-                "quantity": quantity,
-                "timestamp": transaction_dt,
-                "total_line_cost": total_line_cost,
-                "total_line_profit": total_line_profit,
-                "total_line_revenue": total_line_revenue,
-                "transaction_date": transaction_dt.split('T')[0], # Extract date part
-                "transaction_id": str(uuid.uuid4()),
-            }
-            db_insert_sales_transaction(insert_data)
-
-        print(f"Simulated data generation and storage complete for '{inferred_business_type}' business.")
-        return True
+                "category": item['category'],
+                "current_stock_level": 100,
+                "is_perishable": item['is_perishable'],
+                "item_id": item['item_id'],
+                "item_name": item['item_name'],
+                "last_updated": now_iso,
+                "reorder_threshold": 20,
+                "shelf_life_days": item['shelf_life_days'],
+                "supplier_id": str(uuid.uuid4())[:8],
+                "unit_cost": item['unit_cost'],
+                "unit_price": item['unit_price'],
+            })
 
-    except Exception as e:
-        print(f"Error in agent_generate_simulated_data: {e}")
-        return False
+    end_date = datetime.date.today() - datetime.timedelta(days=1)
+    start_date = end_date - datetime.timedelta(days=days - 1)
+    print(f"  Generating {days} days x ~{transactions_per_day} transactions/day "
+          f"for {len(inventory_items)} items ({inventory_source} inventory), seed={seed}.")
+
+    rows_generated = 0
+    rows_loaded = 0
+    # Generate the next chunk while the previous one is being loaded.
+    with ThreadPoolExecutor(max_workers=2) as loader:
+        pending = []
+        for chunk in generate_sales_chunks(business_id, inventory_items, start_date, days,
+                                           transactions_per_day, business_type=business_type, seed=seed):
+            rows = chunk_to_rows(chunk)
+            rows_generated += len(rows)
+            pending.append(loader.submit(db_bulk_load_sales_transactions, rows, business_id))
+            if len(pending) >= 2:
+                rows_loaded += pending.pop(0).result()
+        for future in pending:
+            rows_loaded += future.result()
+
+    print(f"Bulk simulated data: loaded {rows_loaded:,} of {rows_generated:,} sales lines for '{business_id}'.")
+    session_context.invalidate(tool_context, business_id, "watermark")
+    prefetch.invalidate(business_id, "inventory_status", "daily_item_sales")
+    insights.invalidate(business_id)
+    return {
+        "status": "success" if rows_loaded == rows_generated else "partial",
+        "inventory_source": inventory_source,
+        "items": len(inventory_items),
+        "rows_loaded": rows_loaded,
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+    }
 
 
 # --- Main function for independent testing ---
@@ -767,7 +1057,7 @@ if __name__ == "__main__":
     created_business_id= 'biz_629fd84f'
     if created_business_id:
         print(f"\nGenerating simulated data for business ID '{created_business_id}' (Type: 'Coffee Shop')...")
-        simulated_data_generated = agent_generate_simulated_data(created_business_id, "Coffee Shop")
+        simulated_data_generated = _generate_simulated_data(created_business_id)
         if simulated_data_generated:
             print("Test 8 Passed: Simulated data generated and stored successfully.")
         else:
@@ -0,0 +1,181 @@
+"""
+Lazily created clients for the external services used by the agent tools.
+
+Importing the agent used to import every Google SDK, configure Gemini and
+build BigQuery, Maps and Gemini clients for all three sub-agents. Here the
+SDK modules are only imported the first time one of their attributes is
+used, and each client is built the first time a tool asks for it, then
+reused for the rest of the process.
+"""
+
+import importlib
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from ..shared_libraries import constants
+
+GEMINI_MODEL_NAME = "gemini-1.5-flash"
+
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access."""
+
+    def __init__(self, module_name: str):
+        self._module_name = module_name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._module_name)
+        return self._module
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._load(), name)
+
+
+# Heavy SDKs, imported on first use. Tool modules use these exactly like the
+# real modules (e.g. `bigquery.ScalarQueryParameter(...)`).
+bigquery = LazyModule("google.cloud.bigquery")
+googlemaps = LazyModule("googlemaps")
+genai = LazyModule("google.generativeai")
+google_genai = LazyModule("google.genai")   # the SDK the ADK agents call Gemini with
+
+_lock = threading.Lock()
+_clients: Dict[Any, Any] = {}
+_overrides: Dict[str, Any] = {}
+
+
+def _get_or_create(key: Any, factory) -> Any:
+    # Failed initializations are cached as None so a missing credential does
+    # not trigger a slow retry on every tool call.
+    if key in _clients:
+        return _clients[key]
+    with _lock:
+        if key not in _clients:
+            _clients[key] = factory()
+        return _clients[key]
+
+
+def get_bq_client(project: Optional[str] = None, location: str = "US") -> Optional[Any]:
+    """
+    Returns the shared BigQuery client for `project`, creating it on first use.
+
+    Args:
+        project (Optional[str]): GCP project ID. Defaults to `constants.PROJECT_ID`.
+        location (str): Default location for query jobs.
+
+    Returns:
+        Optional[Any]: A `bigquery.Client`, or None if it could not be created.
+    """
+    if "bigquery" in _overrides:
+        return _overrides["bigquery"]
+    project = project or constants.PROJECT_ID
+
+    def factory():
+        try:
+            client = bigquery.Client(project=project, location=location)
+            print(f"BigQuery client initialized for project: {project}")
+            return client
+        except Exception as e:
+            print(f"Error initializing BigQuery client: {e}")
+            return None
+
+    return _get_or_create(("bigquery", project, location), factory)
+
+
+def get_places_client() -> Optional[Any]:
+    """
+    Returns the shared Google Maps (Places API) client, creating it on first use.
+
+    Returns:
+        Optional[Any]: A `googlemaps.Client`, or None if no valid API key is configured.
+    """
+    if "places" in _overrides:
+        return _overrides["places"]
+
+    def factory():
+        api_key = constants.GOOGLE_MAP_API_KEY
+        if not api_key or api_key == "EMPTY":
+            print("WARNING: GOOGLE_MAP_API_KEY environment variable not set. Google Maps tools will not function.")
+            return None
+        try:
+            client = googlemaps.Client(key=api_key)
+            print("Google Places API (Older) client initialized.")
+            return client
+        except Exception as e:
+            print(f"Error initializing Google Places API client: {e}")
+            return None
+
+    return _get_or_create(("places",), factory)
+
+
+def get_gemini_model(model_name: str = GEMINI_MODEL_NAME) -> Optional[Any]:
+    """
+    Returns a shared Gemini `GenerativeModel`, configuring the SDK on first use.
+
+    Args:
+        model_name (str): The Gemini model to use for text generation.
+
+    Returns:
+        Optional[Any]: A `genai.GenerativeModel`, or None if initialization failed.
+    """
+    if "gemini" in _overrides:
+        return _overrides["gemini"]
+
+    def factory():
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            print("Warning: GOOGLE_API_KEY environment variable not set. Gemini API calls might fail.")
+        try:
+            if api_key:
+                genai.configure(api_key=api_key)
+            model = genai.GenerativeModel(model_name)
+            print("Gemini model initialized for text generation.")
+            return model
+        except Exception as e:
+            print(f"Error initializing Gemini model: {e}")
+            return None
+
+    return _get_or_create(("gemini", model_name), factory)
+
+
+def get_genai_client() -> Optional[Any]:
+    """
+    Returns the shared `google.genai` client, configured from the environment the
+    same way as the ADK's own (GOOGLE_API_KEY, or GOOGLE_GENAI_USE_VERTEXAI with the
+    project and location), so resources it creates are usable by the agents' model calls.
+
+    Returns:
+        Optional[Any]: A `genai.Client`, or None if it could not be created.
+    """
+    if "genai_client" in _overrides:
+        return _overrides["genai_client"]
+
+    def factory():
+        try:
+            return google_genai.Client()
+        except Exception as e:
+            print(f"Error initializing google-genai client: {e}")
+            return None
+
+    return _get_or_create(("genai_client",), factory)
+
+
+def override_clients(bigquery_client: Any = None, places_client: Any = None, gemini_model: Any = None,
+                     genai_client: Any = None) -> None:
+    """
+    Replaces the real clients with the given objects (used by benchmarks and
+    local testing). Arguments left as None keep their current behaviour.
+    """
+    for name, client in (("bigquery", bigquery_client), ("places", places_client), ("gemini", gemini_model),
+                         ("genai_client", genai_client)):
+        if client is not None:
+            _overrides[name] = client
+
+
+def reset_clients() -> None:
+    """Drops all cached clients and overrides; the next accessor call rebuilds them."""
+    with _lock:
+        _clients.clear()
+        _overrides.clear()
@@ -0,0 +1,214 @@
+"""
+Compaction of long conversations before each model call.
+
+Owners keep one conversation open for days, and the ADK sends every earlier
+turn and tool result with each model call, so each turn gets slower and
+more expensive. `before_model_callback` below keeps the request within
+`constants.COMPACTION_MAX_TOKENS` (estimated tokens of the contents):
+
+- the most recent turns, up to `constants.COMPACTION_KEEP_TOKENS`, are sent
+  as they are,
+- everything before them is replaced by a rolling summary with fixed
+  sections, written by Gemini from the previous summary plus the turns that
+  have just aged out of the kept window,
+- pinned facts (business_id, business name, competitor IDs, from the
+  session's business context, see `session_context`) are added to the
+  summary verbatim on every call, so no summary can lose them.
+
+The summary lives in session state under `state["conversation_summary"]`,
+one entry per agent (each agent sees a differently rendered history):
+
+    {"<agent name>": {"covered": <number of contents summarized>, "summary": "..."}}
+
+Only the request is changed; the session's events are kept in full. A new
+summary is written once the history has grown by about
+COMPACTION_MAX_TOKENS - COMPACTION_KEEP_TOKENS since the last one. If
+writing it fails, the request is sent with the previous summary instead.
+"""
+
+import json
+import threading
+from typing import Any, Dict, List, Optional
+
+from ..shared_libraries import constants
+from .api_clients import get_gemini_model
+from .llm_utils import generate_content
+from .session_context import STATE_KEY as BUSINESS_CONTEXT_KEY
+from .tracing import span
+
+STATE_KEY = "conversation_summary"
+SUMMARY_MAX_WORDS = 400
+TOOL_RESULT_MAX_CHARS = 1500   # of each aged-out tool result shown to the summarizer
+
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "compacted": 0, "summaries": 0, "failures": 0, "tokens_in": 0, "tokens_out": 0}
+
+
+def _count(**increments: int) -> None:
+    with _stats_lock:
+        for name, value in increments.items():
+            _stats[name] += value
+
+
+def get_compaction_stats() -> Dict[str, int]:
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_compaction_stats() -> None:
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+def _part_text(part: Any) -> str:
+    """A part as plain text: its text, or its function call or response as JSON."""
+    if getattr(part, "text", None):
+        return part.text
+    call = getattr(part, "function_call", None)
+    if call is not None:
+        return f"[called {call.name}({json.dumps(dict(call.args or {}), default=str)})]"
+    response = getattr(part, "function_response", None)
+    if response is not None:
+        return f"[{response.name} returned {json.dumps(response.response, default=str)}]"
+    return ""
+
+
+def content_tokens(content: Any) -> int:
+    """Rough token estimate of one `types.Content` (about four characters per token)."""
+    return (sum(len(_part_text(part)) for part in (content.parts or [])) + 3) // 4
+
+
+def is_turn_start(content: Any) -> bool:
+    """A user message (not a tool result), where a kept window can start."""
+    return content.role == "user" and not any(getattr(part, "function_response", None) for part in (content.parts or []))
+
+
+def _keep_from(contents: List[Any], start: int) -> int:
+    """
+    Index of the first content to send as it is: the earliest turn start after `start`
+    whose tail fits COMPACTION_KEEP_TOKENS, or the last turn start if none does.
+    """
+    tail = 0
+    keep = None
+    for i in range(len(contents) - 1, start, -1):
+        tail += content_tokens(contents[i])
+        if is_turn_start(contents[i]):
+            if keep is not None and tail > constants.COMPACTION_KEEP_TOKENS:
+                break
+            keep = i
+    return keep if keep is not None else len(contents)
+
+
+def pinned_facts(state: Any) -> str:
+    """The business the conversation is about and its competitors' IDs, from the session."""
+    context = state.get(BUSINESS_CONTEXT_KEY)
+    if not isinstance(context, dict) or not context.get("business_id"):
+        return ""
+    lines = [f"- business_id: {context['business_id']}"]
+    details = context.get("details") or {}
+    if details.get("name"):
+        lines.append(f"- business name: {details['name']}")
+    competitors = context.get("competitors") or []
+    if competitors:
+        lines.append("- competitors: " + ", ".join(
+            f"{c.get('name', '?')} (competitor_id {c.get('competitor_id')})" for c in competitors))
+    return "\n".join(lines)
+
+
+def _render(contents: List[Any]) -> str:
+    lines = []
+    for content in contents:
+        for part in content.parts or []:
+            text = _part_text(part)
+            if getattr(part, "function_response", None) is not None and len(text) > TOOL_RESULT_MAX_CHARS:
+                text = text[:TOOL_RESULT_MAX_CHARS] + " ...]"
+            if text:
+                lines.append(f"{content.role}: {text}")
+    return "\n".join(lines)
+
+
+def summarize(previous_summary: str, contents: List[Any], pinned: str) -> Optional[str]:
+    """Folds `contents` into `previous_summary` with Gemini; None if that fails."""
+    gemini_model = get_gemini_model()
+    if not gemini_model:
+        return None
+    prompt = f"""
+    You maintain the running summary of a long conversation between a small-business owner and
+    ProfitPilot AI (a business assistant with tools). Update the summary below with the newer
+    conversation turns that follow it. Keep it under {SUMMARY_MAX_WORDS} words, in exactly these sections:
+
+    ## Business
+    Business and competitor names and IDs mentioned (keep every ID exactly as written).
+    ## Questions and answers
+    What the owner asked and the key conclusions given, newest last.
+    ## Figures
+    Numbers the owner may refer back to (sales, prices, stock levels, ratings), with their dates.
+    ## Actions and open items
+    What was changed (data generated, competitors added, deliveries recorded, jobs started with their job_id)
+    and what is still pending or was promised.
+
+    Facts that always hold:
+    {pinned or "None yet."}
+
+    Current summary:
+    {previous_summary or "None yet."}
+
+    Newer turns:
+    {_render(contents)}
+    """
+    try:
+        response = generate_content(gemini_model, prompt)
+        return response.text.strip() or None
+    except Exception as e:
+        print(f"Could not summarize the conversation: {e}")
+        return None
+
+
+def _with_summary(summary: str, pinned: str, first: Any) -> Any:
+    """`first` (a user turn) with the summary and pinned facts in front of its parts."""
+    from google.genai import types
+
+    text = "Summary of the earlier conversation (the turns before this one are not shown):\n" + summary
+    if pinned:
+        text += "\n\nPinned facts:\n" + pinned
+    return types.Content(role=first.role, parts=[types.Part(text=text)] + list(first.parts or []))
+
+
+# --- ADK callback ---
+
+def before_model_callback(callback_context: Any, llm_request: Any) -> None:
+    """Replaces the older part of a long history in the request with the rolling summary."""
+    contents = list(llm_request.contents or [])
+    tokens = sum(content_tokens(content) for content in contents)
+    _count(requests=1, tokens_in=tokens)
+    summaries = callback_context.state.get(STATE_KEY)
+    summaries = summaries if isinstance(summaries, dict) else {}
+    agent = callback_context.agent_name
+    entry = summaries.get(agent)
+    if (not isinstance(entry, dict) or not 0 < entry.get("covered", 0) < len(contents)
+            or not is_turn_start(contents[entry["covered"]])):
+        entry = {"covered": 0, "summary": ""}   # nothing summarized yet, or a different history
+
+    covered, summary = entry["covered"], entry["summary"]
+    if sum(content_tokens(content) for content in contents[covered:]) > constants.COMPACTION_MAX_TOKENS:
+        keep = _keep_from(contents, covered)
+        if keep < len(contents):
+            pinned = pinned_facts(callback_context.state)
+            with span("compaction.summarize", **{"profitpilot.agent": agent, "profitpilot.contents": keep - covered}):
+                updated = summarize(summary, contents[covered:keep], pinned)
+            if updated:
+                covered, summary = keep, updated
+                # Assign a new dict rather than mutating the stored one, so ADK records the state change.
+                callback_context.state[STATE_KEY] = dict(summaries, **{agent: {"covered": covered, "summary": summary}})
+                _count(summaries=1)
+            else:
+                _count(failures=1)
+
+    if covered == 0:
+        _count(tokens_out=tokens)
+        return None
+    compacted = [_with_summary(summary, pinned_facts(callback_context.state), contents[covered])] + contents[covered + 1:]
+    llm_request.contents = compacted
+    _count(compacted=1, tokens_out=sum(content_tokens(content) for content in compacted))
+    return None
@@ -0,0 +1,306 @@
+"""
+Gemini context caching of the prefix every model call of an agent repeats.
+
+Each model call starts with the same blocks: the agent's instruction
+(`ROOT_PROMPT`, `ONBOARDING_PROMPT`, `COMPARISON_AGENT_PROMPT`,
+`BUSINESS_ANALYST_PROMPT`, plus what the ADK adds for agent transfer) and its
+tool declarations, then the conversation so far, whose tool results carry the
+business's data (sales rows, reviews, reports). Gemini bills and processes
+all of it again on every call. `before_model_callback` below moves that
+prefix into Gemini cached content (`client.caches`), which is billed at a
+reduced rate and is not processed again:
+
+- each agent's instruction and tools are cached once per process and shared
+  by all sessions,
+- once a session's finished turns (everything before the current user
+  message) add `constants.CONTEXT_CACHE_MIN_TOKENS` to what is cached, they
+  are cached too, with the instruction and tools, for that session and agent.
+
+The request then carries the cache name and only the contents after the
+cached prefix. Caches are created on a background thread and the request is
+sent uncached until one is ready, so no call waits for a cache to be
+created. Prefixes under CONTEXT_CACHE_MIN_TOKENS (estimated) are not cached:
+Gemini rejects small caches, and they would save little.
+
+Lifetime: caches are created with `constants.CONTEXT_CACHE_TTL_SECONDS`. A
+cache used within CACHE_REFRESH_SECONDS of its expiry has its TTL extended,
+one closer than CACHE_MIN_REMAINING_SECONDS is no longer used, and a session
+cache replaced by a longer one is deleted (one that was never used, because
+compaction changed the history first, expires on its own). A prefix whose cache could not be
+created is sent uncached for CACHE_RETRY_SECONDS before trying again.
+`delete_caches()` deletes every cache this process created.
+
+A session's cache is kept in state under `state["context_cache"]`, so any
+server process can use it:
+
+    {"session": "<random ID mixed into the session's cache keys>",
+     "agents": {"<agent name>": {"name": "cachedContents/...", "prefix": "<key>",
+                                 "contents": <number of contents cached>, "tokens": ..., "expires": <unix time>}}}
+
+Compaction (see `compaction`, which runs first) rewrites the start of the
+history, so the cached prefix stops matching and the agent's shared cache is
+used until a cache of the new history is ready. `after_model_callback`
+records the token counts Gemini reports (`prompt_token_count`,
+`cached_content_token_count`), so `get_cache_stats()` shows the real hit rate.
+"""
+
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..shared_libraries import constants
+from .api_clients import get_genai_client
+from .compaction import content_tokens, is_turn_start
+from .tracing import span
+
+STATE_KEY = "context_cache"
+CACHE_REFRESH_SECONDS = 600        # a cache used this close to its expiry gets a new TTL
+CACHE_MIN_REMAINING_SECONDS = 60   # a cache this close to its expiry is not used any more
+CACHE_RETRY_SECONDS = 900
+CACHE_MAX_ENTRIES = 256            # caches remembered by this process; older ones expire on their own
+CACHE_MAX_WORKERS = 2
+
+_lock = threading.Lock()
+# prefix key -> {"name", "prefix", "contents", "tokens", "expires"} of caches this process created
+_caches: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_expires: Dict[str, float] = {}     # cache name -> expiry, as extended by this process
+_pending: Dict[str, Future] = {}    # prefix key or cache name -> creation or refresh in flight
+_failed: Dict[str, float] = {}      # prefix key -> when its creation failed
+_executor: Optional[ThreadPoolExecutor] = None
+_stats = {"requests": 0, "hits": 0, "session_hits": 0, "creates": 0, "refreshes": 0, "deletes": 0, "failures": 0,
+          "tokens_cached": 0, "prompt_tokens": 0, "cached_content_tokens": 0}
+
+
+def _count(**increments: int) -> None:
+    with _lock:
+        for name, value in increments.items():
+            _stats[name] += value
+
+
+def get_cache_stats() -> Dict[str, int]:
+    """
+    Process-wide counters: requests seen, hits (sent with a cache; session_hits of them with
+    a session cache), creates, refreshes, deletes, failures, estimated tokens_cached, and the
+    prompt_tokens / cached_content_tokens Gemini reported.
+    """
+    with _lock:
+        return dict(_stats)
+
+
+def reset_cache_stats() -> None:
+    with _lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=CACHE_MAX_WORKERS, thread_name_prefix="context-cache")
+    return _executor
+
+
+def _json(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, default=lambda item: (
+        item.model_dump(mode="json", exclude_none=True) if hasattr(item, "model_dump") else str(item)))
+
+
+def _static_parts(config: Any) -> Dict[str, Any]:
+    """What a cached content must hold instead of the request: instruction, tools and tool config."""
+    return {"system_instruction": config.system_instruction, "tools": config.tools, "tool_config": config.tool_config}
+
+
+def _usable(entry: Optional[Dict[str, Any]]) -> bool:
+    if not isinstance(entry, dict) or not entry.get("name"):
+        return False
+    expires = max(entry.get("expires") or 0, _expires.get(entry["name"], 0))
+    return expires - time.time() > CACHE_MIN_REMAINING_SECONDS
+
+
+def _remember(entry: Dict[str, Any]) -> None:
+    with _lock:
+        _caches[entry["prefix"]] = entry
+        _caches.move_to_end(entry["prefix"])
+        _expires[entry["name"]] = entry["expires"]
+        while len(_caches) > CACHE_MAX_ENTRIES:
+            _, dropped = _caches.popitem(last=False)
+            _expires.pop(dropped["name"], None)
+
+
+def _create(model: str, static: Dict[str, Any], contents: List[Any], prefix: str, tokens: int,
+            display_name: str) -> None:
+    from google.genai import types
+
+    try:
+        client = get_genai_client()
+        if client is None:
+            raise RuntimeError("no google-genai client")
+        with span("context_cache.create", **{"gen_ai.request.model": model, "profitpilot.contents": len(contents),
+                                             "profitpilot.tokens": tokens}):
+            cache = client.caches.create(model=model, config=types.CreateCachedContentConfig(
+                display_name=display_name[:128], ttl=f"{constants.CONTEXT_CACHE_TTL_SECONDS}s",
+                contents=contents or None, **static))
+        expires = (cache.expire_time.timestamp() if getattr(cache, "expire_time", None)
+                   else time.time() + constants.CONTEXT_CACHE_TTL_SECONDS)
+        _remember({"name": cache.name, "prefix": prefix, "contents": len(contents), "tokens": tokens,
+                   "expires": expires})
+        _count(creates=1)
+    except Exception as e:
+        print(f"Could not create a Gemini context cache ({display_name}): {e}")
+        with _lock:
+            _failed[prefix] = time.monotonic()
+        _count(failures=1)
+    finally:
+        with _lock:
+            _pending.pop(prefix, None)
+
+
+def _refresh(name: str) -> None:
+    from google.genai import types
+
+    try:
+        client = get_genai_client()
+        if client is None:
+            raise RuntimeError("no google-genai client")
+        client.caches.update(name=name, config=types.UpdateCachedContentConfig(
+            ttl=f"{constants.CONTEXT_CACHE_TTL_SECONDS}s"))
+        with _lock:
+            _expires[name] = time.time() + constants.CONTEXT_CACHE_TTL_SECONDS
+        _count(refreshes=1)
+    except Exception as e:
+        print(f"Could not extend Gemini context cache '{name}': {e}")
+        with _lock:
+            _failed[name] = time.monotonic()
+    finally:
+        with _lock:
+            _pending.pop(name, None)
+
+
+def _delete(name: str) -> None:
+    try:
+        client = get_genai_client()
+        if client is not None:
+            client.caches.delete(name=name)
+            _count(deletes=1)
+    except Exception as e:
+        print(f"Could not delete Gemini context cache '{name}': {e}")
+
+
+def _submit(key: str, function: Any, *args: Any) -> None:
+    """Runs `function(*args)` in the background unless work for `key` is in flight or recently failed."""
+    with _lock:
+        failed_at = _failed.get(key)
+        if key in _pending or (failed_at is not None and time.monotonic() - failed_at < CACHE_RETRY_SECONDS):
+            return
+        _failed.pop(key, None)
+        _pending[key] = _get_executor().submit(function, *args)
+
+
+def wait_for_caches(timeout: Optional[float] = None) -> None:
+    """Waits for the cache creations and refreshes in flight (scripts, benchmarks)."""
+    with _lock:
+        futures = list(_pending.values())
+    wait(futures, timeout=timeout)
+
+
+def delete_caches() -> int:
+    """Deletes every cache this process created (e.g. at shutdown); returns how many."""
+    wait_for_caches()
+    with _lock:
+        names = [entry["name"] for entry in _caches.values()]
+        _caches.clear()
+        _expires.clear()
+    for name in names:
+        _delete(name)
+    return len(names)
+
+
+def _prefix_keys(model: str, static_json: str, salt: str, contents: List[Any],
+                 lengths: Tuple[int, ...]) -> Dict[int, str]:
+    """Cache keys of the agent prefix (length 0) and of the session prefixes `contents[:n]`."""
+    digest = hashlib.sha256(f"{model}\n{static_json}".encode())
+    keys = {0: digest.hexdigest()}
+    digest.update(salt.encode())
+    for i, content in enumerate(contents[:max(lengths, default=0)]):
+        digest.update(content.model_dump_json(exclude_none=True).encode())
+        if i + 1 in lengths:
+            keys[i + 1] = digest.hexdigest()
+    return keys
+
+
+# --- ADK callbacks ---
+
+def before_model_callback(callback_context: Any, llm_request: Any) -> None:
+    """Sends the cached part of the request as a Gemini cached content, creating caches as prefixes grow."""
+    config = llm_request.config
+    if not constants.CONTEXT_CACHE or config is None or config.cached_content or not llm_request.model:
+        return None
+    _count(requests=1)
+    model, agent = llm_request.model, callback_context.agent_name
+    contents = list(llm_request.contents or [])
+    static = _static_parts(config)
+    static_json = _json(static)
+    static_tokens = (len(static_json) + 3) // 4
+    # Turns before the current user message are finished and stay as they are until compacted.
+    boundary = max((i for i, content in enumerate(contents) if is_turn_start(content)), default=0)
+
+    state = callback_context.state.get(STATE_KEY)
+    state = state if isinstance(state, dict) and state.get("session") else {"session": uuid.uuid4().hex[:12], "agents": {}}
+    stored = (state.get("agents") or {}).get(agent)
+    stored_length = stored.get("contents", 0) if isinstance(stored, dict) else 0
+    lengths = tuple(n for n in (stored_length, boundary) if 0 < n <= boundary)
+    keys = _prefix_keys(model, static_json, state["session"], contents, lengths)
+
+    with _lock:
+        latest = _caches.get(keys[boundary]) if boundary else None
+        shared = _caches.get(keys[0])
+    if boundary and _usable(latest) and (not _usable(stored) or stored["name"] != latest["name"]):
+        # A longer session cache is ready: it replaces the one the session used so far.
+        if _usable(stored) and stored["name"] != latest["name"]:
+            _get_executor().submit(_delete, stored["name"])
+        stored = dict(latest)
+        state = dict(state, agents=dict(state.get("agents") or {}, **{agent: stored}))
+        callback_context.state[STATE_KEY] = state
+    elif state is not callback_context.state.get(STATE_KEY):
+        callback_context.state[STATE_KEY] = state
+
+    cache, session = shared if _usable(shared) else None, False
+    if (_usable(stored) and 0 < stored["contents"] <= boundary and keys.get(stored["contents"]) == stored["prefix"]):
+        cache, session = stored, True
+
+    # Cache what has grown since: the agent prefix once, the session's finished turns in steps.
+    covered = cache["tokens"] if cache else 0
+    if not shared and static_tokens >= constants.CONTEXT_CACHE_MIN_TOKENS:
+        _submit(keys[0], _create, model, static, [], keys[0], static_tokens, f"profitpilot {agent}")
+    if boundary and not _usable(latest):
+        tokens = static_tokens + sum(content_tokens(content) for content in contents[:boundary])
+        if tokens - covered >= constants.CONTEXT_CACHE_MIN_TOKENS:
+            _submit(keys[boundary], _create, model, static, contents[:boundary], keys[boundary], tokens,
+                    f"profitpilot {agent} session {state['session']}")
+
+    if cache is None:
+        return None
+    expires = max(cache.get("expires") or 0, _expires.get(cache["name"], 0))
+    if expires - time.time() < CACHE_REFRESH_SECONDS:
+        _submit(cache["name"], _refresh, cache["name"])
+    config.cached_content = cache["name"]
+    config.system_instruction = None
+    config.tools = None
+    config.tool_config = None
+    llm_request.contents = contents[cache["contents"]:]
+    _count(hits=1, session_hits=int(session), tokens_cached=cache["tokens"])
+    return None
+
+
+def after_model_callback(callback_context: Any, llm_response: Any) -> None:
+    """Adds the prompt and cached token counts Gemini reported to the stats."""
+    usage = getattr(llm_response, "usage_metadata", None)
+    if usage is not None and not getattr(llm_response, "partial", False):
+        _count(prompt_tokens=usage.prompt_token_count or 0,
+               cached_content_tokens=usage.cached_content_token_count or 0)
+    return None
@@ -0,0 +1,156 @@
+"""
+Shared helpers for running BigQuery jobs from the agent tools.
+
+Every query goes through `run_query`, which:
+- caps the scan with a per-tool `maximum_bytes_billed`
+  (`constants.BQ_TOOL_MAX_BYTES_BILLED`, default `BQ_DEFAULT_MAX_BYTES_BILLED`),
+- optionally dry-runs the query first and refuses it locally when the
+  estimate is over the cap (`constants.BQ_DRY_RUN_GUARD`),
+- labels the job with the tool name and business_id,
+- accumulates per-tenant bytes / slot-time counters (`get_query_usage`).
+"""
+
+import json
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+from ..shared_libraries import constants
+from . import tracing
+from .api_clients import bigquery
+
+
+class QueryCostExceededError(Exception):
+    """Raised when a dry run estimates more bytes than the tool is allowed to scan."""
+
+    def __init__(self, tool_name: Optional[str], estimated_bytes: int, limit_bytes: int):
+        self.tool_name = tool_name
+        self.estimated_bytes = estimated_bytes
+        self.limit_bytes = limit_bytes
+        super().__init__(
+            f"Query for '{tool_name}' would scan {estimated_bytes:,} bytes, "
+            f"over its limit of {limit_bytes:,} bytes. Narrow the date range or filters."
+        )
+
+
+_usage_lock = threading.Lock()
+_usage: Dict[str, Dict[str, int]] = {}
+
+_LABEL_INVALID = re.compile(r"[^a-z0-9_-]")
+
+
+def _label_value(value: Any) -> str:
+    # BigQuery label values: lowercase letters, digits, '_' and '-', at most 63 chars.
+    return _LABEL_INVALID.sub("_", str(value).lower())[:63]
+
+
+def max_bytes_billed_for(tool_name: Optional[str]) -> int:
+    """Returns the `maximum_bytes_billed` cap for a tool."""
+    return constants.BQ_TOOL_MAX_BYTES_BILLED.get(tool_name, constants.BQ_DEFAULT_MAX_BYTES_BILLED)
+
+
+def _record_usage(business_id: Optional[str], **counters: int) -> None:
+    tenant = business_id or "unknown"
+    with _usage_lock:
+        totals = _usage.setdefault(tenant, {
+            "queries": 0, "bytes_processed": 0, "bytes_billed": 0, "slot_ms": 0,
+            "cache_hits": 0, "dry_runs": 0, "rejected": 0,
+        })
+        for name, value in counters.items():
+            totals[name] += value
+
+
+def get_query_usage() -> Dict[str, Dict[str, int]]:
+    """Returns a snapshot of per-business query counters."""
+    with _usage_lock:
+        return {tenant: dict(totals) for tenant, totals in _usage.items()}
+
+
+def export_query_usage(path: str) -> None:
+    """Writes the per-business query counters to `path` as JSON."""
+    with open(path, "w") as f:
+        json.dump(get_query_usage(), f, indent=2, sort_keys=True)
+
+
+def reset_query_usage() -> None:
+    with _usage_lock:
+        _usage.clear()
+
+
+def dry_run_bytes(bq_client: Any, query: str, job_config: Any) -> int:
+    """Returns BigQuery's estimate of the bytes `query` would process."""
+    dry_config = bigquery.QueryJobConfig(
+        query_parameters=list(getattr(job_config, "query_parameters", None) or []),
+        dry_run=True,
+        use_query_cache=False,
+    )
+    dry_job = bq_client.query(query, job_config=dry_config)
+    return getattr(dry_job, "total_bytes_processed", None) or 0
+
+
+def run_query(bq_client: Any, query: str, job_config: Any = None,
+              query_parameters: Optional[List[Any]] = None, tool_name: Optional[str] = None,
+              business_id: Optional[str] = None) -> Any:
+    """
+    Runs a BigQuery query under the cost guard, waits for it to finish and
+    records a `bigquery.query` span with the job statistics.
+
+    Args:
+        bq_client (Any): The BigQuery client to run the job with.
+        query (str): The SQL text.
+        job_config (Any): A `bigquery.QueryJobConfig`. Built from `query_parameters` if omitted.
+        query_parameters (Optional[List[Any]]): Query parameters, used when `job_config` is None.
+        tool_name (Optional[str]): The tool issuing the query (job label, byte cap, span attribute).
+        business_id (Optional[str]): The tenant the query is for (job label and usage counters).
+
+    Returns:
+        Any: The finished `bigquery.QueryJob`; `.result()` returns the rows without waiting again.
+
+    Raises:
+        QueryCostExceededError: If the dry-run guard is on and the estimate is over the cap.
+    """
+    if job_config is None:
+        job_config = bigquery.QueryJobConfig(query_parameters=query_parameters or [])
+
+    limit_bytes = max_bytes_billed_for(tool_name)
+    job_config.maximum_bytes_billed = limit_bytes
+    labels = dict(getattr(job_config, "labels", None) or {})
+    if tool_name:
+        labels["tool"] = _label_value(tool_name)
+    if business_id:
+        labels["business_id"] = _label_value(business_id)
+    job_config.labels = labels
+
+    with tracing.span("bigquery.query", **{"db.system": "bigquery", "profitpilot.tool": tool_name}) as s:
+        if constants.BQ_DRY_RUN_GUARD:
+            estimated_bytes = dry_run_bytes(bq_client, query, job_config)
+            s.set_attribute("db.bigquery.estimated_bytes", estimated_bytes)
+            if estimated_bytes > limit_bytes:
+                _record_usage(business_id, dry_runs=1, rejected=1)
+                raise QueryCostExceededError(tool_name, estimated_bytes, limit_bytes)
+            _record_usage(business_id, dry_runs=1)
+
+        query_job = bq_client.query(query, job_config=job_config)
+        query_job.result()
+
+        bytes_processed = getattr(query_job, "total_bytes_processed", None) or 0
+        bytes_billed = getattr(query_job, "total_bytes_billed", None) or 0
+        slot_ms = getattr(query_job, "slot_millis", None) or 0
+        cache_hit = bool(getattr(query_job, "cache_hit", False))
+        _record_usage(business_id, queries=1, bytes_processed=bytes_processed, bytes_billed=bytes_billed,
+                      slot_ms=slot_ms, cache_hits=int(cache_hit))
+
+        if tracing.is_enabled():
+            s.set_attributes({
+                "db.statement": query.strip(),
+                "db.bigquery.parameters": json.dumps(
+                    {p.name: str(p.value) for p in getattr(job_config, "query_parameters", None) or []}),
+                "db.bigquery.job_id": getattr(query_job, "job_id", None),
+                "db.bigquery.bytes_processed": bytes_processed,
+                "db.bigquery.bytes_billed": bytes_billed,
+                "db.bigquery.slot_ms": slot_ms,
+                "db.bigquery.cache_hit": cache_hit,
+                "db.bigquery.maximum_bytes_billed": limit_bytes,
+                "profitpilot.business_id": business_id,
+            })
+        return query_job
@@ -0,0 +1,266 @@
+"""
+Persistent store of generated insights, keyed by the data they were built from.
+
+Most analyst answers are a BigQuery read plus a Gemini call over the result.
+Asked again before any new sale is recorded, the same question produces the
+same answer, so the tools keep each result here under
+
+    (business_id, insight_type, variant, data_watermark)
+
+- insight_type: the kind of answer ("sales_trends_report", "health_report", ...),
+- variant: the tool's resolved arguments (dates, item, flags), so different
+  questions of one kind do not overwrite each other,
+- data_watermark: the business's sales watermark (latest transaction plus
+  line count, see `db_get_data_watermark`) at computation time. Answers that
+  also read stock add the inventory version to it (`inventory_version`, the
+  latest `inventory_item` change plus the item count).
+
+A tool looks its answer up with the current watermark first. While the
+watermark has not moved the stored payload is returned without touching
+BigQuery (beyond the watermark itself, which the session usually holds) or
+Gemini; once it moves the lookup misses and the tool regenerates and stores
+a new entry. Besides the payload each entry keeps the structured metrics the
+answer was generated from, so a tool can also update its newest answer from
+the data recorded since (`get_latest_insight`) instead of starting over.
+
+Inputs no watermark covers (collected reviews) are handled by the tools that
+change them calling `invalidate`; recording a delivery does too, so the
+session's cached inventory version cannot serve the old stock.
+INSIGHT_MAX_AGE_HOURS bounds how long an entry is trusted regardless, and
+only the newest INSIGHT_KEEP_VERSIONS watermarks of each question are kept.
+
+Insights live in a SQLite file (`constants.INSIGHTS_DB_PATH`) shared by the
+agent processes and the nightly batch (`python -m PIAgent.batch`). The batch
+calls the same tools inside `batch_run()`, which tags what they store with
+the run ID; with `force` lookups miss, so everything is regenerated.
+"""
+
+import contextlib
+import contextvars
+import datetime
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+from ..shared_libraries import constants
+
+INSIGHT_MAX_AGE_HOURS = 7 * 24
+INSIGHT_KEEP_VERSIONS = 3   # newest watermarks kept per business, insight type and variant
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS insights (
+    business_id TEXT NOT NULL,
+    insight_type TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    data_watermark TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    metrics TEXT,
+    computed_at TEXT NOT NULL,
+    run_id TEXT,
+    PRIMARY KEY (business_id, insight_type, variant, data_watermark)
+);
+CREATE INDEX IF NOT EXISTS insights_latest ON insights (business_id, insight_type, variant, computed_at);
+"""
+
+_lock = threading.Lock()
+_initialized_path: Optional[str] = None
+_stats = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+
+# Set by `batch_run()`: {"run_id": ..., "force": ...}.
+_batch_run: contextvars.ContextVar = contextvars.ContextVar("insights_batch_run", default=None)
+
+
+def _count(name: str) -> None:
+    with _lock:
+        _stats[name] += 1
+
+
+def get_insight_stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_stats)
+
+
+def reset_insight_stats() -> None:
+    with _lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+def watermark_key(watermark: Optional[Dict[str, Any]]) -> Optional[str]:
+    """The store key of a `db_get_data_watermark` result; None when there is no sales data."""
+    if not watermark or not watermark.get("last_transaction"):
+        return None
+    key = f"{watermark['last_transaction']}|{watermark.get('line_items', '')}"
+    inventory = watermark.get("inventory_version")
+    if inventory:
+        key += f"|{inventory.get('last_updated')}|{inventory.get('item_count')}"
+    return key
+
+
+def _variant(variant: Any) -> str:
+    return variant if isinstance(variant, str) else json.dumps(variant, sort_keys=True, default=str)
+
+
+@contextlib.contextmanager
+def _connect():
+    global _initialized_path
+    connection = sqlite3.connect(constants.INSIGHTS_DB_PATH, timeout=30, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    # Under WAL this skips the fsync on each commit; a crash can at worst lose recent insights, which are recomputed.
+    connection.execute("PRAGMA synchronous=NORMAL")
+    try:
+        if _initialized_path != constants.INSIGHTS_DB_PATH:
+            connection.execute("PRAGMA journal_mode=WAL")
+            columns = {row["name"] for row in connection.execute("PRAGMA table_info(insights)")}
+            if columns and "data_watermark" not in columns:
+                # Stores from before watermark keying cannot be matched to their data; they are recomputed.
+                connection.execute("DROP TABLE insights")
+            connection.executescript(_SCHEMA)
+            _initialized_path = constants.INSIGHTS_DB_PATH
+        yield connection
+    finally:
+        connection.close()
+
+
+@contextlib.contextmanager
+def batch_run(run_id: str, force: bool = False):
+    """
+    Tags insights stored within this block with `run_id`. With `force`, `get_insight`
+    always misses, so callers recompute (and store) even for unchanged data.
+    """
+    token = _batch_run.set({"run_id": run_id, "force": force})
+    try:
+        yield
+    finally:
+        _batch_run.reset(token)
+
+
+def store_insight(business_id: str, insight_type: str, payload: Any, watermark: Optional[Dict[str, Any]],
+                  variant: Any = "", metrics: Any = None) -> bool:
+    """
+    Saves an insight computed from the data at `watermark`, with the structured
+    `metrics` it was generated from. Nothing is stored without a watermark.
+
+    Returns:
+        bool: True if stored.
+    """
+    key = watermark_key(watermark)
+    if key is None:
+        return False
+    variant = _variant(variant)
+    run = _batch_run.get()
+    try:
+        with _connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "INSERT OR REPLACE INTO insights (business_id, insight_type, variant, data_watermark, payload, "
+                "metrics, computed_at, run_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (business_id, insight_type, variant, key, json.dumps(payload, default=str),
+                 json.dumps(metrics, default=str) if metrics is not None else None,
+                 datetime.datetime.now(datetime.timezone.utc).isoformat(), run["run_id"] if run else None))
+            connection.execute(
+                "DELETE FROM insights WHERE business_id = ? AND insight_type = ? AND variant = ? AND data_watermark NOT IN "
+                "(SELECT data_watermark FROM insights WHERE business_id = ? AND insight_type = ? AND variant = ? "
+                " ORDER BY computed_at DESC LIMIT ?)",
+                (business_id, insight_type, variant, business_id, insight_type, variant, INSIGHT_KEEP_VERSIONS))
+            connection.execute("COMMIT")
+    except sqlite3.Error as e:
+        print(f"Could not store insight '{insight_type}' for business '{business_id}': {e}")
+        return False
+    _count("stores")
+    return True
+
+
+def _to_dict(row: sqlite3.Row, include_metrics: bool = True) -> Dict[str, Any]:
+    return {
+        "payload": json.loads(row["payload"]),
+        "metrics": json.loads(row["metrics"]) if include_metrics and row["metrics"] is not None else None,
+        "data_watermark": row["data_watermark"],
+        "computed_at": row["computed_at"],
+        "run_id": row["run_id"],
+    }
+
+
+def _fresh(row: sqlite3.Row, max_age_hours: float) -> bool:
+    age = datetime.datetime.now(datetime.timezone.utc) - datetime.datetime.fromisoformat(row["computed_at"])
+    return age <= datetime.timedelta(hours=max_age_hours)
+
+
+def get_insight(business_id: str, insight_type: str, watermark: Optional[Dict[str, Any]], variant: Any = "",
+                max_age_hours: float = INSIGHT_MAX_AGE_HOURS, include_metrics: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Returns the insight stored for exactly this data `watermark` as {'payload', 'metrics',
+    'data_watermark', 'computed_at', 'run_id'}, or None (new data, nothing stored yet,
+    older than `max_age_hours`, or inside a forced `batch_run()`). Without
+    `include_metrics`, 'metrics' is None (they are not decoded).
+    """
+    key = watermark_key(watermark)
+    run = _batch_run.get()
+    if key is None or (run and run["force"]) or not os.path.exists(constants.INSIGHTS_DB_PATH):
+        return None
+    try:
+        with _connect() as connection:
+            row = connection.execute(
+                "SELECT * FROM insights WHERE business_id = ? AND insight_type = ? AND variant = ? AND data_watermark = ?",
+                (business_id, insight_type, _variant(variant), key)).fetchone()
+    except sqlite3.Error as e:
+        print(f"Could not read stored insight '{insight_type}' for business '{business_id}': {e}")
+        row = None
+    if row is not None and _fresh(row, max_age_hours):
+        _count("hits")
+        return _to_dict(row, include_metrics)
+    _count("misses")
+    return None
+
+
+def get_latest_insight(business_id: str, insight_type: str, variant: Any = "",
+                       max_age_hours: float = INSIGHT_MAX_AGE_HOURS) -> Optional[Dict[str, Any]]:
+    """
+    The most recent insight of this kind and variant (any variant when `variant` is None),
+    whatever data it was built from; tools update it instead of starting over. None inside
+    a forced `batch_run()`.
+    """
+    run = _batch_run.get()
+    if (run and run["force"]) or not os.path.exists(constants.INSIGHTS_DB_PATH):
+        return None
+    query, params = "SELECT * FROM insights WHERE business_id = ? AND insight_type = ?", [business_id, insight_type]
+    if variant is not None:
+        query += " AND variant = ?"
+        params.append(_variant(variant))
+    try:
+        with _connect() as connection:
+            row = connection.execute(query + " ORDER BY computed_at DESC LIMIT 1", params).fetchone()
+    except sqlite3.Error as e:
+        print(f"Could not read stored insight '{insight_type}' for business '{business_id}': {e}")
+        return None
+    return _to_dict(row) if row is not None and _fresh(row, max_age_hours) else None
+
+
+def list_insights(business_id: str) -> List[Dict[str, Any]]:
+    """Type, variant, watermark, computation time and run of every insight stored for a business."""
+    if not os.path.exists(constants.INSIGHTS_DB_PATH):
+        return []
+    with _connect() as connection:
+        rows = connection.execute(
+            "SELECT insight_type, variant, data_watermark, computed_at, run_id FROM insights WHERE business_id = ? "
+            "ORDER BY insight_type, variant, computed_at", (business_id,)).fetchall()
+    return [dict(row) for row in rows]
+
+
+def invalidate(business_id: str, *insight_types: str) -> None:
+    """Drops every variant of the stored `insight_types` (all when none are given) of a business."""
+    if not os.path.exists(constants.INSIGHTS_DB_PATH):
+        return
+    try:
+        with _connect() as connection:
+            if insight_types:
+                connection.executemany("DELETE FROM insights WHERE business_id = ? AND insight_type = ?",
+                                       [(business_id, insight_type) for insight_type in insight_types])
+            else:
+                connection.execute("DELETE FROM insights WHERE business_id = ?", (business_id,))
+    except sqlite3.Error as e:
+        print(f"Could not invalidate stored insights for business '{business_id}': {e}")
+        return
+    _count("invalidations")
@@ -0,0 +1,281 @@
+"""
+Durable local job queue for long-running ingestion and seeding work.
+
+Review collection (Places fetches plus one insert per review) and simulated
+data generation (Gemini calls plus bulk loads) used to run inside the tool
+call and hold up the agent's turn. Those tools now `enqueue` a job and
+return its ID straight away; a small pool of worker threads runs it, and the
+agent reads its status and progress with `get_job` / `list_jobs`.
+
+Jobs live in a SQLite file (`constants.JOBS_DB_PATH`), so queued work
+survives a restart: jobs still marked running by a process that no longer
+exists are queued again on the next start, up to JOB_MAX_ATTEMPTS times.
+Kinds registered with `retry=False` (handlers that would store their data
+twice if run again after a partial run) fail instead of running again.
+
+Each job kind has a handler registered by the tool module that owns it
+(`register(kind, handler)`); the handler is called with the job's arguments
+as keywords. A handler that raises or returns False fails the job, anything
+else is stored as its JSON result. Handlers report progress with
+`report_progress`, which does nothing outside a job, so the same function
+can still be called inline.
+"""
+
+import contextlib
+import contextvars
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from ..shared_libraries import constants
+from .tracing import span
+
+JOB_MAX_ATTEMPTS = 3
+JOB_POLL_SECONDS = 5.0   # idle workers re-check the queue this often (enqueue also wakes them)
+ACTIVE_STATUSES = ("queued", "running")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    business_id TEXT,
+    args TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker_pid INTEGER,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_business ON jobs (business_id, created_at);
+"""
+
+_lock = threading.Lock()
+_init_lock = threading.Lock()
+_wakeup = threading.Condition(_lock)
+_handlers: Dict[str, Callable[..., Any]] = {}
+_retry: Dict[str, bool] = {}
+_workers: List[threading.Thread] = []
+_initialized_path: Optional[str] = None
+
+_current_job: contextvars.ContextVar = contextvars.ContextVar("current_job", default=None)
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+@contextlib.contextmanager
+def _connect():
+    # One short-lived connection per operation: sqlite3 connections are not shared across threads.
+    connection = sqlite3.connect(constants.JOBS_DB_PATH, timeout=30, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    try:
+        yield connection
+    finally:
+        connection.close()
+
+
+def _initialize() -> None:
+    """
+    Creates the table, re-queues jobs interrupted by a previous process and starts
+    the workers (once per DB path), so the first use of the queue resumes old work.
+    """
+    global _initialized_path
+    with _init_lock:
+        if _initialized_path == constants.JOBS_DB_PATH:
+            return
+        with _connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+            connection.execute("BEGIN IMMEDIATE")
+            running = connection.execute(
+                "SELECT job_id, attempts, worker_pid FROM jobs WHERE status = 'running'").fetchall()
+            for job in running:
+                if _process_alive(job["worker_pid"]):
+                    continue   # another process sharing this queue is still working on it
+                if job["attempts"] < JOB_MAX_ATTEMPTS:
+                    connection.execute(
+                        "UPDATE jobs SET status = 'queued', message = 'Restarted after an interruption.' "
+                        "WHERE job_id = ?", (job["job_id"],))
+                else:
+                    connection.execute(
+                        "UPDATE jobs SET status = 'failed', error = 'Interrupted too many times.', finished_at = ? "
+                        "WHERE job_id = ?", (_now(), job["job_id"]))
+            connection.execute("COMMIT")
+        _initialized_path = constants.JOBS_DB_PATH
+    _start_workers()
+
+
+def _process_alive(pid: Optional[int]) -> bool:
+    if not pid or pid == os.getpid():
+        return False   # this process only initializes once, so its own running jobs are left over
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def register(kind: str, handler: Callable[..., Any], retry: bool = True) -> None:
+    """
+    Sets the function that runs jobs of `kind`. Without `retry`, a job of this kind that
+    was interrupted part-way fails instead of being run again.
+    """
+    with _lock:
+        _handlers[kind] = handler
+        _retry[kind] = retry
+
+
+def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+    job = dict(row)
+    job["args"] = json.loads(job["args"])
+    job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+    job["progress"] = round(job["progress"], 3)
+    return job
+
+
+def enqueue(kind: str, args: Dict[str, Any], business_id: Optional[str] = None, dedupe: bool = True) -> str:
+    """
+    Queues a job that calls the `kind` handler with `args` and returns its ID. With
+    `dedupe`, a queued or running job of the same kind, business and arguments is
+    reused instead of adding another one.
+    """
+    _initialize()
+    encoded = json.dumps(args, sort_keys=True, default=str)
+    with _connect() as connection:
+        connection.execute("BEGIN IMMEDIATE")
+        if dedupe:
+            row = connection.execute(
+                "SELECT job_id FROM jobs WHERE kind = ? AND business_id IS ? AND args = ? "
+                "AND status IN ('queued', 'running') ORDER BY created_at LIMIT 1",
+                (kind, business_id, encoded)).fetchone()
+            if row is not None:
+                connection.execute("COMMIT")
+                return row["job_id"]
+        job_id = f"job_{uuid.uuid4().hex[:12]}"
+        connection.execute(
+            "INSERT INTO jobs (job_id, kind, business_id, args, status, created_at) VALUES (?, ?, ?, ?, 'queued', ?)",
+            (job_id, kind, business_id, encoded, _now()))
+        connection.execute("COMMIT")
+    with _wakeup:
+        _wakeup.notify()
+    return job_id
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Returns a job's status, progress (0-1), message, result or error, or None if unknown."""
+    _initialize()
+    with _connect() as connection:
+        row = connection.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return _to_dict(row) if row is not None else None
+
+
+def list_jobs(business_id: Optional[str] = None, status: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+    """The most recent jobs, optionally for one business and/or in one status."""
+    _initialize()
+    query, params = "SELECT * FROM jobs WHERE 1 = 1", []
+    if business_id is not None:
+        query += " AND business_id = ?"
+        params.append(business_id)
+    if status is not None:
+        query += " AND status = ?"
+        params.append(status)
+    query += " ORDER BY created_at DESC LIMIT ?"
+    params.append(int(limit))
+    with _connect() as connection:
+        return [_to_dict(row) for row in connection.execute(query, params).fetchall()]
+
+
+def report_progress(fraction: float, message: Optional[str] = None) -> None:
+    """Records the running job's progress (0-1); does nothing outside a job."""
+    job_id = _current_job.get()
+    if job_id is None:
+        return
+    with _connect() as connection:
+        connection.execute("UPDATE jobs SET progress = ?, message = COALESCE(?, message) WHERE job_id = ?",
+                           (min(max(float(fraction), 0.0), 1.0), message, job_id))
+
+
+def _claim() -> Optional[sqlite3.Row]:
+    with _connect() as connection:
+        connection.execute("BEGIN IMMEDIATE")
+        row = connection.execute(
+            "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1").fetchone()
+        if row is not None:
+            connection.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, worker_pid = ?, started_at = ? "
+                "WHERE job_id = ?", (os.getpid(), _now(), row["job_id"]))
+        connection.execute("COMMIT")
+    return row
+
+
+def _finish(job_id: str, status: str, result: Any = None, error: Optional[str] = None) -> None:
+    with _connect() as connection:
+        connection.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, "
+            "progress = CASE WHEN ? = 'succeeded' THEN 1 ELSE progress END WHERE job_id = ?",
+            (status, json.dumps(result, default=str) if result is not None else None, error, _now(), status, job_id))
+
+
+def _run(row: sqlite3.Row) -> None:
+    handler = _handlers.get(row["kind"])
+    if handler is None:
+        _finish(row["job_id"], "failed", error=f"No handler registered for job kind '{row['kind']}'.")
+        return
+    # The claimed row holds the attempts before this one.
+    if row["attempts"] > 0 and not _retry.get(row["kind"], True):
+        _finish(row["job_id"], "failed", error="Interrupted part-way; not run again, as that would store "
+                                               "its data twice. Check what was stored before starting it again.")
+        return
+    _current_job.set(row["job_id"])
+    with span(f"job.{row['kind']}", **{"profitpilot.job_id": row["job_id"], "business_id": row["business_id"]}):
+        try:
+            result = handler(**json.loads(row["args"]))
+        except Exception as e:
+            print(f"Job {row['job_id']} ({row['kind']}) failed: {e}")
+            _finish(row["job_id"], "failed", error=str(e))
+            return
+    if result is False:
+        _finish(row["job_id"], "failed", error="The job finished without completing its work.")
+    else:
+        _finish(row["job_id"], "succeeded", result=result)
+
+
+def _worker() -> None:
+    while True:
+        try:
+            row = _claim()
+        except sqlite3.Error as e:
+            print(f"Job queue error: {e}")
+            row = None
+        if row is None:
+            with _wakeup:
+                _wakeup.wait(JOB_POLL_SECONDS)
+            continue
+        # Every job gets a fresh context, so its current job ID and spans do not leak into the next one.
+        contextvars.Context().run(_run, row)
+
+
+def _start_workers() -> None:
+    with _lock:
+        while len(_workers) < constants.JOBS_MAX_WORKERS:
+            worker = threading.Thread(target=_worker, name=f"job-worker-{len(_workers)}", daemon=True)
+            worker.start()
+            _workers.append(worker)
+
+
+def start_workers() -> None:
+    """Starts the worker pool now (e.g. at deploy time) instead of on the first use of the queue."""
+    _initialize()
@@ -0,0 +1,35 @@
+"""
+Shared helpers for calling Gemini from the agent tools.
+"""
+
+from typing import Any
+
+from . import tracing
+
+
+def generate_content(gemini_model: Any, prompt: Any, **kwargs: Any) -> Any:
+    """
+    Calls `gemini_model.generate_content(prompt, **kwargs)` inside a
+    `gemini.generate_content` span carrying token usage.
+
+    Args:
+        gemini_model (Any): A `genai.GenerativeModel`.
+        prompt (Any): The prompt (string or contents list).
+        **kwargs: Passed through to `generate_content` (e.g. `generation_config`).
+
+    Returns:
+        Any: The Gemini response object.
+    """
+    with tracing.span("gemini.generate_content", **{
+        "gen_ai.system": "gemini",
+        "gen_ai.request.model": getattr(gemini_model, "model_name", None),
+    }) as s:
+        response = gemini_model.generate_content(prompt, **kwargs)
+        if tracing.is_enabled():
+            usage = getattr(response, "usage_metadata", None)
+            s.set_attributes({
+                "gen_ai.usage.input_tokens": getattr(usage, "prompt_token_count", None) or 0,
+                "gen_ai.usage.output_tokens": getattr(usage, "candidates_token_count", None) or 0,
+                "gen_ai.request.prompt_chars": len(prompt) if isinstance(prompt, str) else None,
+            })
+        return response
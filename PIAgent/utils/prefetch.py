@@ -0,0 +1,171 @@
+"""
+Background prefetch of the data most questions about a business start with.
+
+Once a conversation names a business (a tool is called with its
+business_id, or a tool returns one, e.g. `db_check_business_exists`), the
+next question is almost always about sales, pricing, inventory or reviews.
+`warm(business_id)` runs every registered loader for it on a small thread
+pool. Each tool module registers its own loaders at import time:
+
+- comparison agent: business details, competitor list,
+- business analyst agent: inventory snapshot, recent daily sales rollup.
+
+Results are kept in a process-local cache for PREFETCH_TTL_SECONDS. The db
+functions consult `cached(name, business_id)` before querying BigQuery; a
+load that is still running is waited for instead of being issued twice.
+Tools that change the data call `invalidate(business_id)`.
+
+The ADK callbacks at the bottom trigger the prefetch from the agents.
+"""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from .session_context import STATE_KEY
+from .tracing import span
+
+PREFETCH_TTL_SECONDS = 300
+PREFETCH_WAIT_SECONDS = 30   # longest a tool waits for a running prefetch before querying itself
+PREFETCH_MAX_WORKERS = 4
+BUSINESS_ID_ARGS = ("business_id", "main_business_id")
+
+_lock = threading.Lock()
+_loaders: Dict[str, Callable[[str], Any]] = {}
+_entries: Dict[Tuple[str, str], Tuple[float, Future]] = {}
+_executor: Optional[ThreadPoolExecutor] = None
+_stats = {"warms": 0, "loads": 0, "hits": 0, "misses": 0}
+
+# Set while a loader runs, so the db function it calls does not wait on its own future.
+_loading: contextvars.ContextVar = contextvars.ContextVar("prefetch_loading", default=None)
+
+
+def register(name: str, loader: Callable[[str], Any]) -> None:
+    """Adds a loader run by `warm`; `loader(business_id)` returns the value to cache."""
+    with _lock:
+        _loaders[name] = loader
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=PREFETCH_MAX_WORKERS, thread_name_prefix="prefetch")
+    return _executor
+
+
+def _run(name: str, business_id: str, loader: Callable[[str], Any]) -> Any:
+    _loading.set((name, business_id))
+    with span("prefetch.load", **{"profitpilot.prefetch": name, "business_id": business_id}):
+        try:
+            return loader(business_id)
+        except Exception as e:
+            print(f"Prefetch of '{name}' for business '{business_id}' failed: {e}")
+            return None
+
+
+def warm(business_id: str, names: Optional[Iterable[str]] = None) -> int:
+    """
+    Starts loading the registered data for `business_id` in the background.
+    Entries that are fresh or already loading are skipped.
+
+    Returns:
+        int: Number of loads started.
+    """
+    if not business_id:
+        return 0
+    now = time.monotonic()
+    started = 0
+    with _lock:
+        for name in (names or list(_loaders)):
+            loader = _loaders.get(name)
+            entry = _entries.get((name, business_id))
+            if loader is None or (entry is not None and now - entry[0] < PREFETCH_TTL_SECONDS):
+                continue
+            # Each load runs in a copy of the caller's context so its spans nest under the caller's trace.
+            future = _get_executor().submit(contextvars.copy_context().run, _run, name, business_id, loader)
+            _entries[(name, business_id)] = (now, future)
+            started += 1
+        _stats["warms"] += bool(started)
+        _stats["loads"] += started
+    return started
+
+
+def cached(name: str, business_id: str) -> Any:
+    """
+    Returns the prefetched value, waiting for it if the load is still running,
+    or None when there is no fresh entry (the caller then queries as usual).
+    """
+    if _loading.get() == (name, business_id):
+        return None
+    with _lock:
+        entry = _entries.get((name, business_id))
+        if entry is None or time.monotonic() - entry[0] >= PREFETCH_TTL_SECONDS:
+            _entries.pop((name, business_id), None)
+            _stats["misses"] += 1
+            return None
+    try:
+        value = entry[1].result(timeout=PREFETCH_WAIT_SECONDS)
+    except FutureTimeoutError:
+        value = None
+    with _lock:
+        _stats["hits" if value is not None else "misses"] += 1
+    return value
+
+
+def invalidate(business_id: Optional[str] = None, *names: str) -> None:
+    """Drops prefetched `names` (all when none are given) for one business, or everything."""
+    with _lock:
+        for key in list(_entries):
+            if (business_id is None or key[1] == business_id) and (not names or key[0] in names):
+                del _entries[key]
+
+
+def get_prefetch_stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_stats)
+
+
+def reset_prefetch_stats() -> None:
+    with _lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+# --- ADK callbacks ---
+
+def _business_ids(value: Any) -> Iterable[str]:
+    """business_id values found in tool arguments or a tool response (one level deep)."""
+    if isinstance(value, dict):
+        for key in BUSINESS_ID_ARGS:
+            if isinstance(value.get(key), str):
+                yield value[key]
+        if "result" in value:   # non-dict tool results are wrapped by the ADK
+            yield from _business_ids(value["result"])
+    elif isinstance(value, list) and len(value) == 1:
+        # A lookup that found exactly one business identifies it.
+        yield from _business_ids(value[0])
+
+
+def before_tool_callback(tool: Any, args: Dict[str, Any], tool_context: Any) -> None:
+    """Starts the prefetch as soon as a tool is called for a business."""
+    for business_id in _business_ids(args):
+        warm(business_id)
+    return None
+
+
+def after_tool_callback(tool: Any, args: Dict[str, Any], tool_context: Any, tool_response: Any) -> None:
+    """Starts the prefetch when a tool returns a business (found by name or just created)."""
+    for business_id in _business_ids(tool_response):
+        warm(business_id)
+    return None
+
+
+def before_agent_callback(callback_context: Any) -> None:
+    """Re-warms the business the session already knows at the start of each turn."""
+    context = callback_context.state.get(STATE_KEY)
+    if isinstance(context, dict) and context.get("business_id"):
+        warm(context["business_id"])
+    return None
@@ -0,0 +1,146 @@
+"""
+Per-conversation business context kept in ADK session state.
+
+`root_agent` keeps the business_id in the conversation, but every tool used
+to look the business up again (details, competitors) on each call. Tools
+that accept the ADK-injected `tool_context` now go through this module
+instead, which keeps one entry under `state["business_context"]`:
+
+    {
+        "business_id": "...",
+        "details": {...},          # db_get_business_details
+        "competitors": [...],      # db_get_competitors
+        "watermark": {...},        # latest sales transaction, see db_get_data_watermark
+        "inventory_version": {...},  # latest inventory_item change, see db_get_inventory_version
+        "loaded_at": {"details": "<iso time>", ...},
+    }
+
+Each part is loaded the first time a tool asks for it and then read from the
+session until a tool that changes it (adding a competitor, generating sales
+data, recording a delivery) calls `invalidate`. The watermark and the inventory
+version also move with sales and stock recorded outside the session (the POS,
+other sessions, the nightly batch), so they are re-read once older than
+PART_MAX_AGE_SECONDS. Switching to another business_id starts
+a fresh entry. Values are plain JSON so any ADK session service can persist them.
+
+Callers without a `tool_context` (scripts, benchmarks, tools calling each
+other outside an agent run) fall through to the loader every time.
+"""
+
+import datetime
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from .tracing import span
+
+STATE_KEY = "business_context"
+PARTS = ("details", "competitors", "watermark", "inventory_version")
+# Parts that change outside this session are re-loaded after this many seconds.
+PART_MAX_AGE_SECONDS = {"watermark": 300, "inventory_version": 300}
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "loads": 0, "invalidations": 0}
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def get_context_stats() -> Dict[str, int]:
+    """Returns the process-wide session context hit / load / invalidation counters."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_context_stats() -> None:
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+def _current(tool_context: Any, business_id: str) -> Dict[str, Any]:
+    context = tool_context.state.get(STATE_KEY)
+    if not isinstance(context, dict) or context.get("business_id") != business_id:
+        return {"business_id": business_id, "loaded_at": {}}
+    return context
+
+
+def _fresh(context: Dict[str, Any], part: str) -> bool:
+    max_age = PART_MAX_AGE_SECONDS.get(part)
+    if max_age is None:
+        return True
+    loaded_at = (context.get("loaded_at") or {}).get(part)
+    if not loaded_at:
+        return False
+    age = datetime.datetime.now(datetime.timezone.utc) - datetime.datetime.fromisoformat(loaded_at)
+    return age.total_seconds() < max_age
+
+
+def get_part(tool_context: Any, business_id: str, part: str, loader: Callable[[str], Any]) -> Any:
+    """
+    Returns one part of the business context, loading it with `loader(business_id)`
+    when the session does not hold it yet, or holds it for longer than its
+    PART_MAX_AGE_SECONDS.
+
+    Empty results (None, []) are not kept except for competitors, so a lookup
+    that failed is retried on the next call.
+    """
+    if tool_context is None:
+        return loader(business_id)
+    context = _current(tool_context, business_id)
+    if part in context and _fresh(context, part):
+        _count("hits")
+        return context[part]
+
+    with span("session_context.load", **{"profitpilot.context_part": part, "business_id": business_id}):
+        value = loader(business_id)
+    _count("loads")
+    if value is None or (part != "competitors" and not value):
+        return value
+    # Assign a new dict rather than mutating the stored one, so ADK records the state change.
+    updated = dict(context, **{part: value})
+    updated["loaded_at"] = dict(context.get("loaded_at") or {},
+                                **{part: datetime.datetime.now(datetime.timezone.utc).isoformat()})
+    tool_context.state[STATE_KEY] = updated
+    return value
+
+
+def get_business_details(tool_context: Any, business_id: str,
+                         loader: Callable[[str], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    return get_part(tool_context, business_id, "details", loader)
+
+
+def get_competitors(tool_context: Any, business_id: str, loader: Callable[[str], Any]) -> Any:
+    return get_part(tool_context, business_id, "competitors", loader)
+
+
+def get_data_watermark(tool_context: Any, business_id: str,
+                       loader: Callable[[str], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    return get_part(tool_context, business_id, "watermark", loader)
+
+
+def get_inventory_version(tool_context: Any, business_id: str,
+                          loader: Callable[[str], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    return get_part(tool_context, business_id, "inventory_version", loader)
+
+
+def invalidate(tool_context: Any, business_id: Optional[str] = None, *parts: str) -> None:
+    """
+    Drops `parts` (all of them when none are given) from the session's business
+    context, so the next read reloads them. With a `business_id`, only a context
+    for that business is touched.
+    """
+    if tool_context is None:
+        return
+    context = tool_context.state.get(STATE_KEY)
+    if not isinstance(context, dict):
+        return
+    if business_id is not None and context.get("business_id") != business_id:
+        return
+    dropped = parts or PARTS
+    updated = {key: value for key, value in context.items() if key not in dropped}
+    updated["loaded_at"] = {key: value for key, value in (context.get("loaded_at") or {}).items()
+                            if key not in dropped}
+    tool_context.state[STATE_KEY] = updated
+    _count("invalidations")
@@ -0,0 +1,223 @@
+"""
+Token budgets for the tool results that go back into the conversation.
+
+Every tool result becomes part of the session history and is re-sent to
+Gemini on each later model call of the conversation. Some results are
+large: `db_get_processed_reviews` returns every review with its full text
+and entity sentiment, `agent_query_sales` up to a few hundred rows. The ADK
+`after_tool_callback` below estimates each result's size (about four
+characters of JSON per token) and, when it is over its tool's budget
+(`constants.TOOL_OUTPUT_TOOL_MAX_TOKENS`, else `constants.TOOL_OUTPUT_MAX_TOKENS`),
+hands the model a shortened result instead:
+
+- a list keeps the first items that fit, with long strings cut, plus the
+  total count, a summary of the whole list and a `handle`,
+- a dict keeps its scalar fields; its largest lists are shortened the same way,
+- text keeps its beginning and a `handle`.
+
+`get_tool_output_page(handle, offset)` returns the next part of a shortened
+result, so the model pulls more only when it needs it. Tool modules register
+summarizers for their list results (`register_summarizer`), e.g. rating and
+sentiment statistics of reviews; other lists are summarized by item count.
+
+Full results are kept in a process-local store for TOOL_OUTPUT_HANDLE_TTL_SECONDS.
+An expired handle, or one issued by another server process, returns an error
+that tells the model to call the original tool again.
+"""
+
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..shared_libraries import constants
+from .tracing import span, traced_tool
+
+TOOL_OUTPUT_HANDLE_TTL_SECONDS = 1800
+TOOL_OUTPUT_MAX_HANDLES = 256
+TOOL_OUTPUT_MAX_STRING_CHARS = 400   # strings inside shortened items are cut to this length
+TOOL_OUTPUT_MAX_NESTED_ITEMS = 10    # lists inside shortened items keep this many entries
+PAGE_TOOL_NAME = "get_tool_output_page"
+NOTE = ("Shortened to keep the conversation small. Use the summary and the items shown; "
+        f"call {PAGE_TOOL_NAME}(handle, offset=next_offset) only if you need more.")
+
+_lock = threading.Lock()
+_summarizers: Dict[str, Callable[[List[Any]], Any]] = {}
+# handle -> (stored at, tool name, full result)
+_handles: "OrderedDict[str, Tuple[float, str, Any]]" = OrderedDict()
+_stats = {"results": 0, "shortened": 0, "tokens_in": 0, "tokens_out": 0, "pages": 0}
+
+
+def estimate_tokens(value: Any) -> int:
+    """Rough token estimate of a tool result (about four characters per token of its JSON)."""
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    return (len(text) + 3) // 4
+
+
+def budget_for(tool_name: str) -> int:
+    return constants.TOOL_OUTPUT_TOOL_MAX_TOKENS.get(tool_name, constants.TOOL_OUTPUT_MAX_TOKENS)
+
+
+def register_summarizer(tool_name: str, summarizer: Callable[[List[Any]], Any]) -> None:
+    """Sets the function that summarizes a shortened list result of `tool_name`."""
+    with _lock:
+        _summarizers[tool_name] = summarizer
+
+
+def get_output_stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_stats)
+
+
+def reset_output_stats() -> None:
+    with _lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+def _store(tool_name: str, value: Any) -> str:
+    handle = f"out_{uuid.uuid4().hex[:12]}"
+    now = time.monotonic()
+    with _lock:
+        _handles[handle] = (now, tool_name, value)
+        while _handles and (len(_handles) > TOOL_OUTPUT_MAX_HANDLES
+                            or now - next(iter(_handles.values()))[0] > TOOL_OUTPUT_HANDLE_TTL_SECONDS):
+            _handles.popitem(last=False)
+    return handle
+
+
+def _trim(value: Any) -> Any:
+    """A copy of `value` with long strings cut and nested lists shortened."""
+    if isinstance(value, str):
+        if len(value) <= TOOL_OUTPUT_MAX_STRING_CHARS:
+            return value
+        return f"{value[:TOOL_OUTPUT_MAX_STRING_CHARS]}... [{len(value) - TOOL_OUTPUT_MAX_STRING_CHARS} more characters]"
+    if isinstance(value, dict):
+        return {key: _trim(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        trimmed = [_trim(item) for item in value[:TOOL_OUTPUT_MAX_NESTED_ITEMS]]
+        if len(value) > TOOL_OUTPUT_MAX_NESTED_ITEMS:
+            trimmed.append(f"... {len(value) - TOOL_OUTPUT_MAX_NESTED_ITEMS} more")
+        return trimmed
+    return value
+
+
+def _fit(items: List[Any], offset: int, budget: int) -> List[Any]:
+    """Trimmed items from `offset` on, as many as fit in `budget` tokens (at least one)."""
+    page, used = [], 0
+    for item in items[offset:]:
+        trimmed = _trim(item)
+        cost = estimate_tokens(trimmed) + 1
+        if page and used + cost > budget:
+            break
+        page.append(trimmed)
+        used += cost
+    return page
+
+
+def _summary(tool_name: str, items: List[Any]) -> Any:
+    summarizer = _summarizers.get(tool_name)
+    if summarizer is not None:
+        try:
+            return summarizer(items)
+        except Exception as e:
+            print(f"Could not summarize the output of '{tool_name}': {e}")
+    return {"items": len(items)}
+
+
+def _text_page(text: str, offset: int, budget: int) -> Dict[str, Any]:
+    end = offset + budget * 4
+    return {"text": text[offset:end], "total_chars": len(text), "next_offset": end if end < len(text) else None}
+
+
+def _list_page(items: List[Any], offset: int, budget: int) -> Dict[str, Any]:
+    page = _fit(items, offset, budget)
+    end = offset + len(page)
+    return {"items": page, "total_items": len(items), "next_offset": end if end < len(items) else None}
+
+
+def shorten(tool_name: str, value: Any, budget: int) -> Any:
+    """`value` reduced to about `budget` estimated tokens, with a handle to the full result."""
+    if not isinstance(value, (str, list, tuple, dict)):
+        return value
+    handle = _store(tool_name, value)
+    if isinstance(value, str):
+        return dict(_text_page(value, 0, budget), handle=handle, note=NOTE)
+    if isinstance(value, (list, tuple)):
+        summary = _summary(tool_name, list(value))
+        page = _list_page(list(value), 0, max(1, budget - estimate_tokens(summary)))
+        return dict(page, summary=summary, handle=handle, note=NOTE)
+    # A dict: scalar fields stay (long strings cut), the budget left is shared by its lists, largest first.
+    lists = sorted((key for key, item in value.items() if isinstance(item, (list, tuple)) and item),
+                   key=lambda key: -estimate_tokens(value[key]))
+    result = {key: _trim(item) for key, item in value.items() if key not in lists}
+    remaining = max(1, budget - estimate_tokens(result))
+    shortened = {}
+    for i, key in enumerate(lists):
+        page = _list_page(list(value[key]), 0, remaining // (len(lists) - i))
+        result[key] = page["items"]
+        remaining -= estimate_tokens(page["items"])
+        if page["next_offset"] is not None:
+            shortened[key] = {"total_items": page["total_items"], "next_offset": page["next_offset"]}
+    return dict(result, shortened=shortened, handle=handle, note=NOTE)
+
+
+@traced_tool
+def get_tool_output_page(handle: str, offset: int = 0, key: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Returns more of a tool result that was shortened to keep the conversation small.
+
+    Args:
+        handle (str): The `handle` of the shortened result.
+        offset (int): Where to continue: the `next_offset` of the shortened result or of the previous page.
+        key (Optional[str]): For a shortened dict result, which of its lists to page through
+                             (a key of its `shortened` field). Defaults to the first one.
+
+    Returns:
+        Dict[str, Any]: 'items' (or 'text'), the total size and 'next_offset' (None at the end); or 'error'.
+    """
+    print(f"\n--- Tool Call: {PAGE_TOOL_NAME}(handle='{handle}', offset={offset}, key={key}) ---")
+    with _lock:
+        entry = _handles.get(handle)
+    if entry is None or time.monotonic() - entry[0] > TOOL_OUTPUT_HANDLE_TTL_SECONDS:
+        return {"error": f"Unknown or expired handle '{handle}'. Call the original tool again to get fresh data."}
+    with _lock:
+        _stats["pages"] += 1
+    _, tool_name, value = entry
+    offset = max(0, int(offset))
+    budget = constants.TOOL_OUTPUT_MAX_TOKENS
+    if isinstance(value, str):
+        return dict(_text_page(value, offset, budget), tool=tool_name)
+    if isinstance(value, dict):
+        lists = [name for name, item in value.items() if isinstance(item, (list, tuple))]
+        if key is None and lists:
+            key = max(lists, key=lambda name: estimate_tokens(value[name]))
+        if key not in lists:
+            return {"error": f"'{key}' is not a list in this result; choose one of {lists}."}
+        return dict(_list_page(list(value[key]), offset, budget), tool=tool_name, key=key)
+    return dict(_list_page(list(value), offset, budget), tool=tool_name)
+
+
+# --- ADK callback ---
+
+def after_tool_callback(tool: Any, args: Dict[str, Any], tool_context: Any, tool_response: Any) -> Optional[Any]:
+    """Replaces a tool result that is over its token budget with a shortened one."""
+    name = getattr(tool, "name", "")
+    tokens = estimate_tokens(tool_response)
+    budget = budget_for(name)
+    if tokens <= budget or name == PAGE_TOOL_NAME:
+        with _lock:
+            _stats["results"] += 1
+            _stats["tokens_in"] += tokens
+            _stats["tokens_out"] += tokens
+        return None
+    with span("tool_output.shorten", **{"tool.name": name, "profitpilot.tokens": tokens, "profitpilot.budget": budget}):
+        shortened = shorten(name, tool_response, budget)
+    with _lock:
+        _stats["results"] += 1
+        _stats["shortened"] += 1
+        _stats["tokens_in"] += tokens
+        _stats["tokens_out"] += estimate_tokens(shortened)
+    return shortened
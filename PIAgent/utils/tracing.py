@@ -0,0 +1,213 @@
+"""
+Lightweight tracing for tool calls, BigQuery jobs, Places requests and Gemini calls.
+
+Spans follow the OpenTelemetry data model (trace/span/parent IDs, nanosecond
+start/end times, attributes, status) and attribute names follow the OTel
+semantic conventions where one exists (`db.*`, `gen_ai.*`).
+
+Backends, selected with the `PP_TRACING` environment variable:
+- unset / "0" (default): disabled. `span()` hands back a shared no-op object
+  and `traced_tool` adds a single flag check per call.
+- "1" / "local": in-process spans written as JSON lines to `PP_TRACE_FILE`.
+- "otel": spans are created through the OpenTelemetry API, so they nest under
+  the ADK's own agent/tool spans and go to whatever exporter is configured.
+"""
+
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from ..shared_libraries import constants
+
+
+class _NoopSpan:
+    """Returned by `span()` while tracing is disabled."""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def record_exception(self, exception: BaseException) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("pp_current_span", default=None)
+
+
+class Span:
+    """A finished-on-exit span recorded by the local backend."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_span_id", "start_time_unix_nano",
+                 "end_time_unix_nano", "attributes", "status", "events", "_token")
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        parent = _current_span.get()
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent.span_id if parent else None
+        self.start_time_unix_nano = 0
+        self.end_time_unix_nano = 0
+        self.attributes = dict(attributes) if attributes else {}
+        self.status = "UNSET"
+        self.events: List[Dict[str, Any]] = []
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        self.attributes.update(attributes)
+
+    def record_exception(self, exception: BaseException) -> None:
+        self.events.append({
+            "name": "exception",
+            "time_unix_nano": time.time_ns(),
+            "attributes": {"exception.type": type(exception).__name__, "exception.message": str(exception)},
+        })
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        self.start_time_unix_nano = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.end_time_unix_nano = time.time_ns()
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.record_exception(exc)
+            self.status = "ERROR"
+        elif self.status == "UNSET":
+            self.status = "OK"
+        exporter = _state["exporter"]
+        if exporter is not None:
+            exporter.export(self)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "start_time_unix_nano": self.start_time_unix_nano,
+            "end_time_unix_nano": self.end_time_unix_nano,
+            "duration_ms": (self.end_time_unix_nano - self.start_time_unix_nano) / 1e6,
+            "attributes": self.attributes,
+            "status": self.status,
+            "events": self.events,
+        }
+
+
+class JsonlFileExporter:
+    """Appends one JSON object per finished span to a local file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+
+
+class InMemoryExporter:
+    """Keeps finished spans in a list (benchmarks and local debugging)."""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+
+
+_state: Dict[str, Any] = {"backend": None, "exporter": None, "otel_tracer": None}
+
+
+def configure_tracing(backend: Optional[str] = None, exporter: Any = None) -> None:
+    """
+    Selects the tracing backend.
+
+    Args:
+        backend (Optional[str]): None/"0" to disable, "local" for in-process spans,
+                                 or "otel" to use the OpenTelemetry API.
+        exporter (Any): Exporter for the local backend (anything with an
+                        `export(span)` method). Defaults to a `JsonlFileExporter`
+                        writing to `constants.TRACE_FILE`.
+    """
+    backend = (backend or "").strip().lower()
+    if backend in ("", "0", "false", "off", "none"):
+        _state.update(backend=None, exporter=None, otel_tracer=None)
+    elif backend == "otel":
+        from opentelemetry import trace
+        _state.update(backend="otel", exporter=None, otel_tracer=trace.get_tracer("profitpilot"))
+    else:
+        _state.update(backend="local", exporter=exporter or JsonlFileExporter(constants.TRACE_FILE),
+                      otel_tracer=None)
+
+
+def is_enabled() -> bool:
+    return _state["backend"] is not None
+
+
+def span(name: str, **attributes: Any):
+    """
+    Context manager for a span named `name`, nested under the current span.
+
+    Usage:
+        with span("bigquery.query", **{"db.system": "bigquery"}) as s:
+            ...
+            s.set_attribute("db.bigquery.bytes_processed", job.total_bytes_processed)
+    """
+    backend = _state["backend"]
+    if backend is None:
+        return _NOOP_SPAN
+    if backend == "otel":
+        # OpenTelemetry rejects None attribute values.
+        return _state["otel_tracer"].start_as_current_span(
+            name, attributes={k: v for k, v in attributes.items() if v is not None})
+    return Span(name, attributes)
+
+
+def traced_tool(func: Callable) -> Callable:
+    """
+    Decorator that wraps an agent tool in a `tool.<name>` span.
+
+    The wrapper keeps the original name, docstring and signature, so the ADK
+    builds the same function declaration for the model.
+    """
+    span_name = f"tool.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _state["backend"] is None:
+            return func(*args, **kwargs)
+        with span(span_name, **{"tool.name": func.__name__}):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+configure_tracing(constants.TRACING)
@@ -0,0 +1,12 @@
+"""Offline benchmark suite for the ProfitPilot agent tools.
+
+Every tool is driven against in-process fakes for BigQuery, the Google Maps
+Places API and Gemini, so the numbers reflect the cost of our own code
+(query assembly, row handling, JSON serialization, prompt building) at
+different data scales, without any network round trips.
+
+Run from the repository root:
+
+    python -m benchmarks.run                  # run and compare with baselines
+    python -m benchmarks.run --save-baseline  # record new baselines
+"""
@@ -0,0 +1,662 @@
+"""
+In-process fakes for the external services used by the agent tools.
+
+The fakes only implement the small surface the tools actually touch:
+`bigquery.Client.query(...).result()`, `googlemaps.Client.places/place` and
+`GenerativeModel.generate_content`. Query results are precomputed when a
+dataset is built so the fakes themselves add almost nothing to the measured
+latency.
+"""
+
+import bisect
+import datetime
+import json
+import random
+import re
+from typing import Any, Dict, List, Optional
+
+BENCH_BUSINESS_ID = "biz_bench_001"
+
+DONUT_SHOP_CATALOG = [
+    ("Glazed Donut", "Pastry", 0.35, 1.25, True, 2),
+    ("Chocolate Donut", "Pastry", 0.40, 1.50, True, 2),
+    ("Boston Cream Donut", "Pastry", 0.55, 2.00, True, 2),
+    ("Jelly Filled Donut", "Pastry", 0.50, 1.75, True, 2),
+    ("Donut Holes (Dozen)", "Pastry", 0.60, 3.00, True, 2),
+    ("Sausage Kolache", "Savory", 0.80, 2.50, True, 3),
+    ("Apple Fritter", "Pastry", 0.70, 2.75, True, 2),
+    ("Coffee", "Beverage", 0.30, 2.25, False, None),
+    ("Iced Coffee", "Beverage", 0.45, 3.25, False, None),
+    ("Orange Juice", "Beverage", 0.90, 2.95, True, 7),
+]
+
+PAYMENT_METHODS = ["Credit Card", "Cash", "Mobile Pay", "Debit Card"]
+
+REVIEW_SNIPPETS = [
+    "Fresh glazed donuts every morning, the drive-through is quick and the staff are friendly.",
+    "Coffee was lukewarm and the order was wrong, but the apple fritter made up for it.",
+    "Best kolaches in town. Lines are long on weekends so come early.",
+    "Clean store, consistent quality, prices went up a bit recently.",
+    "Staff seemed inattentive and we waited ten minutes for a dozen donuts.",
+]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about four characters per token for English/JSON)."""
+    return (len(text) + 3) // 4
+
+
+class FakeRow(dict):
+    """A dict that also supports attribute access, like `bigquery.Row`."""
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class FakeQueryJob:
+    """Mimics the parts of `bigquery.QueryJob` the tools read."""
+
+    def __init__(self, rows: List[FakeRow], total_bytes_processed: int = 0):
+        self._rows = rows
+        self.total_bytes_processed = total_bytes_processed
+        self.total_bytes_billed = total_bytes_processed
+        self.slot_millis = 0
+        self.cache_hit = False
+        self.job_id = "bench_job"
+
+    def result(self) -> List[FakeRow]:
+        return self._rows
+
+
+class FakeDataset:
+    """
+    Deterministic, precomputed data for one benchmark business.
+
+    Args:
+        n_sales_rows (int): Number of `sales_transaction` line items.
+        n_competitors (int): Number of competitors linked to the business.
+        reviews_per_entity (int): Processed reviews stored per business/competitor.
+        seed (int): Seed for the random generator, so runs are comparable.
+    """
+
+    def __init__(self, n_sales_rows: int = 10, n_competitors: int = 5,
+                 reviews_per_entity: int = 5, seed: int = 7):
+        self.business_id = BENCH_BUSINESS_ID
+        self.n_sales_rows = n_sales_rows
+        self.n_competitors = n_competitors
+        rng = random.Random(seed)
+
+        self.business = FakeRow({
+            "id": "bench-uuid",
+            "g_m_b_id": "ChIJbenchmarkPlace",
+            "address": "123 Main St, Fulshear, TX 77441",
+            "business_id": self.business_id,
+            "business_type": "Donut Shop",
+            "description": "A popular donut and coffee shop.",
+            "name": "Bench Do-Nuts",
+            "owner_contact_info": json.dumps({"primary": "owner@example.com"}),
+        })
+
+        self.inventory = []
+        for i, (name, category, cost, price, perishable, shelf_life) in enumerate(DONUT_SHOP_CATALOG):
+            self.inventory.append(FakeRow({
+                "item_id": f"item_{i:03d}",
+                "item_name": name,
+                "category": category,
+                "unit_cost": cost,
+                "unit_price": price,
+                "current_unit_price": price,
+                "reorder_threshold": 40,
+                "current_stock_level": rng.randint(10, 200),
+                "is_perishable": perishable,
+                "shelf_life_days": shelf_life,
+            }))
+
+        # Recorded deliveries of perishables: the last three days' receipts cover part of the stock.
+        self.inventory_lots = [
+            FakeRow({
+                "lot_id": f"lot_{item['item_id']}_{day}",
+                "item_id": item["item_id"],
+                "quantity": max(1, item["current_stock_level"] // 4),
+                "received_date": datetime.date(2025, 5, 31) - datetime.timedelta(days=day),
+            })
+            for item in self.inventory if item["is_perishable"]
+            for day in range(3)
+        ]
+
+        self.sales = self._build_sales(rng, n_sales_rows)
+        self.sales_by_item = self._aggregate_sales()
+        self._sales_daily: Optional[List[FakeRow]] = None
+        self._transaction_items: Optional[List[FakeRow]] = None
+        self._item_transactions: Optional[Dict[str, Dict[str, Any]]] = None
+        self._sales_cube_rows: Optional[List[FakeRow]] = None
+        self._customer_purchases: Optional[List[FakeRow]] = None
+
+        self.competitors = [
+            FakeRow({
+                "name": f"Competitor {i}",
+                "website_url": f"https://competitor{i}.example.com",
+                "google_place_id": f"ChIJcompetitor{i:03d}",
+                "competitor_id": f"comp_{i:04d}",
+            })
+            for i in range(n_competitors)
+        ]
+
+        self.reviews: Dict[str, List[FakeRow]] = {}
+        for entity_id, entity_type in [(self.business_id, "business")] + [
+            (c["competitor_id"], "competitor") for c in self.competitors
+        ]:
+            self.reviews[entity_id] = [
+                self._build_review(rng, entity_id, entity_type, j) for j in range(reviews_per_entity)
+            ]
+
+        self.place_reviews = [
+            {
+                "rating": rng.randint(3, 5),
+                "text": REVIEW_SNIPPETS[j % len(REVIEW_SNIPPETS)],
+                "author_name": f"Reviewer {j}",
+                "author_url": f"https://maps.example.com/reviewer/{j}",
+                "time": 1717200000 + j * 3600,
+            }
+            for j in range(5)
+        ]
+
+    def _build_sales(self, rng: random.Random, n_rows: int) -> List[FakeRow]:
+        start = datetime.datetime(2025, 5, 1, 6, 0, tzinfo=datetime.timezone.utc)
+        span_seconds = 30 * 24 * 3600
+        rows = []
+        for i in range(n_rows):
+            name, _, cost, price, _, _ = DONUT_SHOP_CATALOG[rng.randrange(len(DONUT_SHOP_CATALOG))]
+            quantity = rng.randint(1, 12)
+            unit_price = round(price * rng.uniform(0.95, 1.05), 2)
+            ts = start + datetime.timedelta(seconds=int(span_seconds * i / max(n_rows, 1)))
+            rows.append(FakeRow({
+                "timestamp": ts,
+                "item_name": name,
+                "quantity": quantity,
+                "price_per_unit": unit_price,
+                "total_line_revenue": round(quantity * unit_price, 2),
+                "total_line_profit": round(quantity * (unit_price - cost), 2),
+            }))
+        return rows
+
+    def new_sales(self, n_rows: int, seed: int = 11) -> List[FakeRow]:
+        """`n_rows` further line items, one minute apart after the last recorded sale (not added)."""
+        rng = random.Random(seed)
+        last = self.sales[-1]["timestamp"] if self.sales else datetime.datetime(2025, 5, 31, tzinfo=datetime.timezone.utc)
+        rows = []
+        for i in range(n_rows):
+            name, _, cost, price, _, _ = DONUT_SHOP_CATALOG[rng.randrange(len(DONUT_SHOP_CATALOG))]
+            quantity = rng.randint(1, 12)
+            unit_price = round(price * rng.uniform(0.95, 1.05), 2)
+            rows.append(FakeRow({
+                "timestamp": last + datetime.timedelta(minutes=i + 1),
+                "item_name": name,
+                "quantity": quantity,
+                "price_per_unit": unit_price,
+                "total_line_revenue": round(quantity * unit_price, 2),
+                "total_line_profit": round(quantity * (unit_price - cost), 2),
+            }))
+        return rows
+
+    def _aggregate_sales(self) -> List[FakeRow]:
+        item_ids = {row["item_name"]: row["item_id"] for row in self.inventory}
+        totals: Dict[str, Dict[str, float]] = {}
+        for row in self.sales:
+            agg = totals.setdefault(row["item_name"], {"price_sum": 0.0, "n": 0, "profit": 0.0, "qty": 0})
+            agg["price_sum"] += row["price_per_unit"]
+            agg["n"] += 1
+            agg["profit"] += row["total_line_profit"]
+            agg["qty"] += row["quantity"]
+        return [
+            FakeRow({
+                "item_id": item_ids[name],
+                "item_name": name,
+                "avg_sales_price": agg["price_sum"] / agg["n"],
+                "total_profit": agg["profit"],
+                "total_quantity_sold": agg["qty"],
+            })
+            for name, agg in totals.items()
+        ]
+
+    @property
+    def sales_daily(self) -> List[FakeRow]:
+        """Per item and day totals (built on first use; large datasets are slow to aggregate)."""
+        if self._sales_daily is None:
+            item_ids = {row["item_name"]: row["item_id"] for row in self.inventory}
+            totals: Dict[tuple, Dict[str, float]] = {}
+            for row in self.sales:
+                key = (row["item_name"], row["timestamp"].date())
+                agg = totals.setdefault(key, {"units": 0, "revenue": 0.0, "profit": 0.0, "price_sum": 0.0, "n": 0})
+                agg["units"] += row["quantity"]
+                agg["revenue"] += row["total_line_revenue"]
+                agg["profit"] += row["total_line_profit"]
+                agg["price_sum"] += row["price_per_unit"]
+                agg["n"] += 1
+            self._sales_daily = [
+                FakeRow({
+                    "item_id": item_ids[name],
+                    "item_name": name,
+                    "transaction_date": day,
+                    "units": agg["units"],
+                    "revenue": agg["revenue"],
+                    "profit": agg["profit"],
+                    "avg_price": agg["price_sum"] / agg["n"],
+                })
+                for (name, day), agg in sorted(totals.items(), key=lambda kv: kv[0][1])
+            ]
+        return self._sales_daily
+
+    @property
+    def transaction_items(self) -> List[FakeRow]:
+        """(transaction_id, item_id, item_name) line items; consecutive sales lines form baskets of 1-4 items."""
+        if self._transaction_items is None:
+            item_ids = {row["item_name"]: row["item_id"] for row in self.inventory}
+            rng = random.Random(7)
+            rows, txn, left = [], 0, 0
+            for row in self.sales:
+                if left == 0:
+                    txn += 1
+                    left = rng.choice((1, 1, 2, 2, 3, 4))
+                left -= 1
+                rows.append(FakeRow({
+                    "transaction_id": f"txn_{txn:08d}",
+                    "item_id": item_ids[row["item_name"]],
+                    "item_name": row["item_name"],
+                    "transaction_date": row["timestamp"].date(),
+                }))
+            self._transaction_items = rows
+        return self._transaction_items
+
+    @property
+    def item_transactions(self) -> Dict[str, Dict[str, Any]]:
+        """Per item ID: its name, and the day and integer key of each of its line items, in day order."""
+        if self._item_transactions is None:
+            grouped: Dict[str, Dict[str, Any]] = {}
+            for line in self.transaction_items:
+                entry = grouped.setdefault(line["item_id"], {"item_name": line["item_name"], "days": [], "keys": []})
+                entry["days"].append(line["transaction_date"])
+                entry["keys"].append(int(line["transaction_id"][4:]))
+            self._item_transactions = grouped
+        return self._item_transactions
+
+    def transactions_by_item(self, start: Optional[datetime.date], end: Optional[datetime.date]) -> List[FakeRow]:
+        """The bundles query's result: one row per item with its distinct transaction keys in the range."""
+        rows = []
+        for item_id, entry in sorted(self.item_transactions.items()):
+            first = bisect.bisect_left(entry["days"], start) if start else 0
+            last = bisect.bisect_right(entry["days"], end) if end else len(entry["days"])
+            if first < last:
+                rows.append(FakeRow({"item_id": item_id, "item_name": entry["item_name"],
+                                     "transactions": list(dict.fromkeys(entry["keys"][first:last]))}))
+        return rows
+
+    @property
+    def sales_cube_rows(self) -> List[FakeRow]:
+        """Totals per (date, hour, item, payment method), the grain of the analyst's sales cube."""
+        if self._sales_cube_rows is None:
+            items = {row["item_name"]: row for row in self.inventory}
+            totals: Dict[tuple, Dict[str, float]] = {}
+            for i, row in enumerate(self.sales):
+                ts = row["timestamp"]
+                key = (ts.date(), ts.hour, row["item_name"], PAYMENT_METHODS[i % len(PAYMENT_METHODS)])
+                agg = totals.setdefault(key, {"revenue": 0.0, "units": 0, "profit": 0.0, "line_items": 0})
+                agg["revenue"] += row["total_line_revenue"]
+                agg["units"] += row["quantity"]
+                agg["profit"] += row["total_line_profit"]
+                agg["line_items"] += 1
+            self._sales_cube_rows = [
+                FakeRow({
+                    "transaction_date": day,
+                    "hour": hour,
+                    "item_id": items[name]["item_id"],
+                    "item_name": name,
+                    "category": items[name]["category"],
+                    "payment_method": payment,
+                    **agg,
+                })
+                for (day, hour, name, payment), agg in totals.items()
+            ]
+        return self._sales_cube_rows
+
+    @property
+    def customer_purchases(self) -> List[FakeRow]:
+        """Per (customer, day) orders and spend; each basket of `transaction_items` belongs to one of ~1k customers."""
+        if self._customer_purchases is None:
+            totals: Dict[tuple, Dict[str, Any]] = {}
+            for row, line in zip(self.sales, self.transaction_items):
+                customer = f"cust_{int(line['transaction_id'][4:]) * 7919 % 1009:04d}"
+                agg = totals.setdefault((customer, line["transaction_date"]),
+                                        {"transactions": set(), "revenue": 0.0, "profit": 0.0})
+                agg["transactions"].add(line["transaction_id"])
+                agg["revenue"] += row["total_line_revenue"]
+                agg["profit"] += row["total_line_profit"]
+            first_purchase: Dict[str, Any] = {}
+            for customer, day in totals:
+                first_purchase[customer] = min(first_purchase.get(customer, day), day)
+            self._customer_purchases = [
+                FakeRow({
+                    "customer_id": customer,
+                    "transaction_date": day,
+                    "orders": len(agg["transactions"]),
+                    "revenue": agg["revenue"],
+                    "profit": agg["profit"],
+                    "first_purchase_date": first_purchase[customer],
+                })
+                for (customer, day), agg in totals.items()
+            ]
+        return self._customer_purchases
+
+    def _build_review(self, rng: random.Random, entity_id: str, entity_type: str, j: int) -> FakeRow:
+        posted = datetime.datetime(2025, 5, 1, tzinfo=datetime.timezone.utc) + datetime.timedelta(days=j)
+        return FakeRow({
+            "id": f"rev-{entity_id}-{j}",
+            "business_id": entity_id,
+            "entities": ["donuts", "coffee", "staff"],
+            "entity_sentiment": json.dumps({"donuts": 0.8, "coffee": -0.2, "staff": 0.1}),
+            "processed_timestamp": posted,
+            "rating": float(rng.randint(2, 5)),
+            "raw_text_hash": str(j),
+            "review_id": f"gmb_{entity_id}_{j}",
+            "sentiment_magnitude": 0.6,
+            "sentiment_score": 0.3,
+            "source": "Google Maps",
+            "text": REVIEW_SNIPPETS[j % len(REVIEW_SNIPPETS)],
+            "themes": ["freshness", "service"],
+            "timestamp_posted": posted,
+            "entity_type": entity_type,
+        })
+
+    def simulated_generation_payload(self, n_transactions: int) -> str:
+        """JSON body that Gemini would return for `agent_generate_simulated_data`."""
+        start = datetime.datetime(2025, 4, 1, 7, 0, tzinfo=datetime.timezone.utc)
+        transactions = []
+        for i in range(n_transactions):
+            name, _, _, price, _, _ = DONUT_SHOP_CATALOG[i % len(DONUT_SHOP_CATALOG)]
+            transactions.append({
+                "item_name": name,
+                "quantity": 1 + i % 6,
+                "price_per_unit": price,
+                "timestamp": (start + datetime.timedelta(hours=i)).isoformat(),
+                "payment_method": PAYMENT_METHODS[i % len(PAYMENT_METHODS)],
+                "customer_id": f"cust_{i % 97:03d}",
+            })
+        return json.dumps({
+            "inferred_business_type": "Donut Shop",
+            "inventory_items": [
+                {
+                    "item_name": row["item_name"],
+                    "category": row["category"],
+                    "current_stock_level": row["current_stock_level"],
+                    "reorder_threshold": row["reorder_threshold"],
+                    "unit_cost": row["unit_cost"],
+                    "unit_price": row["unit_price"],
+                    "is_perishable": row["is_perishable"],
+                    "shelf_life_days": row["shelf_life_days"],
+                }
+                for row in self.inventory
+            ],
+            "sales_transactions": transactions,
+        })
+
+
+class FakeBigQueryClient:
+    """Routes SQL text to the precomputed rows of a `FakeDataset`."""
+
+    _TABLE_PATTERN = re.compile(r"`[^`]*\.(\w+)`")
+
+    def __init__(self, dataset: FakeDataset):
+        self.dataset = dataset
+        self.queries = 0
+        self.inserts = 0
+        self.loaded_rows = 0
+
+    def query(self, query: str, job_config: Any = None, **kwargs) -> FakeQueryJob:
+        self.queries += 1
+        match = self._TABLE_PATTERN.search(query)
+        table = match.group(1) if match else ""
+        statement = query.lstrip().split(None, 1)[0].upper()
+
+        if statement in ("INSERT", "UPDATE", "MERGE"):
+            self.inserts += 1
+            return FakeQueryJob([])
+        if table == "business":
+            return FakeQueryJob([self.dataset.business])
+        if table == "competitor":
+            return FakeQueryJob(self.dataset.competitors)
+        if table == "inventory_lot":
+            since = _param_value(job_config, "since_date")
+            return FakeQueryJob([row for row in self.dataset.inventory_lots if since is None or row["received_date"] >= since])
+        if table == "inventory_item":
+            if "MAX(last_updated)" in query.split("FROM `", 1)[0]:
+                return FakeQueryJob([FakeRow({"last_updated": datetime.datetime(2025, 5, 31, 22, 0),
+                                              "item_count": len(self.dataset.inventory)})])
+            return FakeQueryJob(self.dataset.inventory)
+        if table == "sales_transaction":
+            if "MAX(timestamp)" in query.split("FROM `", 1)[0]:
+                last = self.dataset.sales[-1]["timestamp"] if self.dataset.sales else None
+                return FakeQueryJob([FakeRow({"last_transaction": last, "line_items": len(self.dataset.sales)})])
+            if query.split("FROM `", 1)[0].split() == ["SELECT", "COUNT(*)", "AS", "line_items"]:
+                start = _param_value(job_config, "start_date")
+                after = _param_value(job_config, "after_timestamp")
+                count = 0
+                for row in reversed(self.dataset.sales):
+                    if row["timestamp"] <= after:
+                        break
+                    count += row["timestamp"].date() >= start
+                return FakeQueryJob([FakeRow({"line_items": count})])
+            if "customer_id" in query.split("FROM `", 1)[0]:
+                start = _param_value(job_config, "start_date")
+                end = _param_value(job_config, "end_date")
+                return FakeQueryJob([
+                    row for row in self.dataset.customer_purchases
+                    if (start is None or row["transaction_date"] >= start) and (end is None or row["transaction_date"] <= end)
+                ])
+            if "payment_method" in query.split("FROM `", 1)[0]:
+                start = _param_value(job_config, "start_date")
+                return FakeQueryJob([
+                    row for row in self.dataset.sales_cube_rows if start is None or row["transaction_date"] >= start
+                ])
+            if "transaction_id" in query.split("FROM `", 1)[0]:
+                return FakeQueryJob(self.dataset.transactions_by_item(
+                    _param_value(job_config, "start_date"), _param_value(job_config, "end_date")))
+            if "GROUP BY" in query and "transaction_date" in query.split("GROUP BY", 1)[1]:
+                start = _param_value(job_config, "start_date")
+                end = _param_value(job_config, "end_date")
+                return FakeQueryJob([
+                    row for row in self.dataset.sales_daily
+                    if (start is None or row["transaction_date"] >= start) and (end is None or row["transaction_date"] <= end)
+                ])
+            if "GROUP BY" in query:
+                return FakeQueryJob(self.dataset.sales_by_item)
+            after = _param_value(job_config, "after_timestamp")
+            if after is not None:
+                # Sales are in timestamp order: walk back from the newest line.
+                start = _param_value(job_config, "start_date")
+                end = _param_value(job_config, "end_date")
+                newer = []
+                for row in reversed(self.dataset.sales):
+                    if row["timestamp"] <= after:
+                        break
+                    day = row["timestamp"].date()
+                    if (start is None or day >= start) and (end is None or day <= end):
+                        newer.append(row)
+                return FakeQueryJob(newer[::-1], total_bytes_processed=64 * len(newer))
+            return FakeQueryJob(self.dataset.sales, total_bytes_processed=64 * len(self.dataset.sales))
+        if table == "business_review":
+            entity_id = _param_value(job_config, "business_id")
+            return FakeQueryJob(self.dataset.reviews.get(entity_id, []))
+        return FakeQueryJob([])
+
+    def load_table_from_json(self, rows: List[Dict[str, Any]], destination: Any, job_config: Any = None,
+                             **kwargs) -> FakeQueryJob:
+        self.loaded_rows += len(rows)
+        return FakeQueryJob([])
+
+
+class FakePlacesClient:
+    """Mimics `googlemaps.Client.places` (text search) and `.place` (details)."""
+
+    def __init__(self, dataset: FakeDataset, n_search_results: int = 5):
+        self.dataset = dataset
+        self.search_results = [
+            {
+                "name": f"Search Result {i}",
+                "formatted_address": f"{100 + i} Main St, Houston, TX 770{i % 100:02d}",
+                "place_id": f"ChIJsearch{i:04d}",
+            }
+            for i in range(n_search_results)
+        ]
+
+    def places(self, query: str, location: Any = None, radius: Any = None, **kwargs) -> Dict[str, Any]:
+        return {"results": self.search_results, "status": "OK"}
+
+    def place(self, place_id: str, fields: Optional[List[str]] = None, **kwargs) -> Dict[str, Any]:
+        return {"result": {"reviews": self.dataset.place_reviews}, "status": "OK"}
+
+
+class FakeCallbackContext:
+    """The parts of an ADK `CallbackContext` the agent callbacks use: agent name and session state."""
+
+    def __init__(self, agent_name: str, business_id: str = BENCH_BUSINESS_ID, n_competitors: int = 5):
+        self.agent_name = agent_name
+        self.state = {"business_context": {
+            "business_id": business_id,
+            "details": {"name": "Bench Do-Nuts"},
+            "competitors": [{"name": f"Competitor {i}", "competitor_id": f"comp_{i:04d}"} for i in range(n_competitors)],
+        }}
+
+
+def conversation_history(n_turns: int) -> List[Any]:
+    """ADK contents of `n_turns` owner questions, each answered after one analyst tool call."""
+    from google.genai import types
+
+    contents = []
+    for i in range(n_turns):
+        contents.append(types.Content(role="user", parts=[types.Part(text=f"How did glazed donuts sell in week {i}?")]))
+        contents.append(types.Content(role="model", parts=[types.Part(function_call=types.FunctionCall(
+            name="agent_query_sales", args={"business_id": BENCH_BUSINESS_ID, "group_by": "weekday"}))]))
+        contents.append(types.Content(role="user", parts=[types.Part(function_response=types.FunctionResponse(
+            name="agent_query_sales",
+            response={"rows": [{"weekday": day, "revenue": 120.5 + j, "revenue_per_day": 30.1 + j}
+                               for j, day in enumerate(("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"))]}))]))
+        contents.append(types.Content(role="model", parts=[types.Part(
+            text=f"In week {i} glazed donuts sold best on Saturday. " + "Details of the breakdown follow. " * 20)]))
+    return contents
+
+
+class FakeUsageMetadata:
+    def __init__(self, prompt_token_count: int, candidates_token_count: int):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class FakeGeminiResponse:
+    def __init__(self, text: str, prompt_tokens: int):
+        self.text = text
+        self.parts = [text]
+        self.prompt_feedback = None
+        self.usage_metadata = FakeUsageMetadata(prompt_tokens, estimate_tokens(text))
+
+
+class FakeGeminiModel:
+    """
+    Records every prompt it receives and answers instantly.
+
+    Structured (JSON) requests are answered with `json_payload`; free-text
+    requests get a short canned analysis. When the prompt asks for sales
+    "between <date> and <date>", the payload's transactions are moved into
+    that window, as a model following the prompt would.
+    """
+
+    model_name = "models/fake-gemini"
+    _WINDOW_PATTERN = re.compile(r"between (\d{4}-\d{2}-\d{2}) and (\d{4}-\d{2}-\d{2})")
+
+    def __init__(self, json_payload: str = "{}"):
+        self.json_payload = json_payload
+        self.calls = 0
+        self.prompt_tokens = 0
+
+    def reset(self) -> None:
+        self.calls = 0
+        self.prompt_tokens = 0
+
+    def generate_content(self, contents: Any, generation_config: Any = None, **kwargs) -> FakeGeminiResponse:
+        prompt = contents if isinstance(contents, str) else str(contents)
+        tokens = estimate_tokens(prompt)
+        self.calls += 1
+        self.prompt_tokens += tokens
+        if generation_config and "json" in str(generation_config):
+            window = self._WINDOW_PATTERN.search(prompt)
+            if window and "sales_transactions" in self.json_payload:
+                return FakeGeminiResponse(self._in_window(*window.groups()), tokens)
+            return FakeGeminiResponse(self.json_payload, tokens)
+        return FakeGeminiResponse("## Analysis\n- Sales are stable.\n- Glazed donuts lead revenue.", tokens)
+
+
+    def _in_window(self, first: str, last: str) -> str:
+        payload = json.loads(self.json_payload)
+        start = datetime.datetime.fromisoformat(first).replace(hour=7, tzinfo=datetime.timezone.utc)
+        hours = ((datetime.date.fromisoformat(last) - start.date()).days + 1) * 24 - 7
+        for i, transaction in enumerate(payload["sales_transactions"]):
+            transaction["timestamp"] = (start + datetime.timedelta(hours=i % hours)).isoformat()
+        return json.dumps(payload)
+
+
+class FakeCachedContent:
+    def __init__(self, name: str, ttl_seconds: int):
+        self.name = name
+        self.expire_time = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=ttl_seconds)
+
+
+class FakeCaches:
+    """The `client.caches` service of `google.genai`: records what is created, extended and deleted."""
+
+    def __init__(self):
+        self.created: List[Any] = []
+        self.updated: List[str] = []
+        self.deleted: List[str] = []
+
+    def create(self, model: str, config: Any) -> FakeCachedContent:
+        self.created.append(config)
+        return FakeCachedContent(f"cachedContents/fake-{len(self.created)}", int(str(config.ttl).rstrip("s")))
+
+    def update(self, name: str, config: Any) -> FakeCachedContent:
+        self.updated.append(name)
+        return FakeCachedContent(name, int(str(config.ttl).rstrip("s")))
+
+    def delete(self, name: str) -> None:
+        self.deleted.append(name)
+
+
+class FakeGenaiClient:
+    """A `google.genai.Client` with only the context cache service."""
+
+    def __init__(self):
+        self.caches = FakeCaches()
+
+
+def daily_item_matrix(n_items: int, days: int, seed: int = 7) -> Any:
+    """
+    Synthetic (n_items, days) daily unit sales with weekly seasonality and a
+    mild trend, plus the start date, for benchmarking the analytics engines.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    start = datetime.date(2024, 6, 3)  # a Monday
+    weekday_factor = np.array([0.9, 0.9, 0.95, 1.0, 1.1, 1.35, 1.2])
+    base = rng.uniform(1.0, 60.0, size=(n_items, 1))
+    t = np.arange(days)
+    return rng.poisson(base * weekday_factor[t % 7] * (1 + 0.0005 * t)).astype(float), start
+
+
+def _param_value(job_config: Any, name: str) -> Any:
+    for param in getattr(job_config, "query_parameters", None) or []:
+        if param.name == name:
+            return param.value
+    return None
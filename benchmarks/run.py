@@ -0,0 +1,459 @@
+"""
+Benchmark runner for the agent tools.
+
+Each scenario calls one tool against the fakes in `benchmarks.fakes` at a
+given data scale and records:
+- p50 / p95 wall-clock latency over several iterations,
+- peak traced Python memory for a single call (`tracemalloc`),
+- estimated prompt tokens sent to Gemini per call.
+
+Results can be saved as baselines (`benchmarks/baselines.json`) and later
+runs are compared against them; a regression beyond the tolerance makes the
+run exit with status 1.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from PIAgent.shared_libraries import constants
+from PIAgent.utils import api_clients, insights, tracing
+
+from . import fakes
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+DEFAULT_SALES_SCALES = [10, 10_000, 1_000_000]
+DEFAULT_COMPETITOR_SCALES = [5, 50]
+DEFAULT_GENERATED_TRANSACTIONS = [50, 1_000]
+DEFAULT_BULK_DAYS = [30, 365]
+DEFAULT_FORECAST_SKUS = [1_000, 5_000]
+DEFAULT_REVIEW_SCALES = [100, 1_000]
+DEFAULT_HISTORY_TURNS = [50, 500]
+
+class Scenario:
+    """
+    One tool invocation at one data scale. Calls regenerate their answer every
+    time unless `stored_insights` is set, in which case repeat calls are answered
+    from the insight store.
+    """
+
+    def __init__(self, name: str, scale: int, setup: Callable[[], Callable[[], Any]],
+                 iterations: int, stored_insights: bool = False):
+        self.name = name
+        self.scale = scale
+        self.setup = setup
+        self.iterations = iterations
+        self.stored_insights = stored_insights
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}@{self.scale}"
+
+
+def _tool_modules():
+    from PIAgent.sub_agents.business_analyst_agent import tools as analyst_tools
+    from PIAgent.sub_agents.comparision_agent import tools as comparison_tools
+    from PIAgent.sub_agents.onboarding_agent import tools as onboarding_tools
+    return analyst_tools, comparison_tools, onboarding_tools
+
+
+def install_fakes(dataset: fakes.FakeDataset, n_search_results: int = 5,
+                  json_payload: str = "{}") -> fakes.FakeGeminiModel:
+    """Points the shared client accessors at fresh fakes built on `dataset`."""
+    gemini = fakes.FakeGeminiModel(json_payload)
+    api_clients.reset_clients()
+    api_clients.override_clients(
+        bigquery_client=fakes.FakeBigQueryClient(dataset),
+        places_client=fakes.FakePlacesClient(dataset, n_search_results),
+        gemini_model=gemini,
+        genai_client=fakes.FakeGenaiClient(),
+    )
+    return gemini
+
+
+def build_scenarios(sales_scales: List[int], competitor_scales: List[int],
+                    generated_scales: List[int], bulk_days: List[int] = (),
+                    forecast_skus: List[int] = (), review_scales: List[int] = (),
+                    history_turns: List[int] = ()) -> List[Scenario]:
+    def iterations_for(scale: int) -> int:
+        return 3 if scale >= 100_000 else 10
+
+    scenarios = []
+
+    for scale in sales_scales:
+        def setup_trends(scale=scale):
+            dataset = fakes.FakeDataset(n_sales_rows=scale)
+            dataset.sales_daily  # the anomaly detector reads daily rows; aggregate them outside the timed call
+            install_fakes(dataset)
+            analyst_tools = _tool_modules()[0]
+            analyst_tools.anomalies.clear_cache()
+            return lambda: analyst_tools.agent_analyze_sales_trends(
+                fakes.BENCH_BUSINESS_ID, start_date="2025-05-01", end_date="2025-05-31")
+
+        def setup_trends_update(scale=scale):
+            dataset = fakes.FakeDataset(n_sales_rows=scale)
+            dataset.sales_daily
+            install_fakes(dataset)
+            analyst_tools = _tool_modules()[0]
+            analyst_tools.anomalies.clear_cache()
+            # Before each call another day's sales (1/30 of the dataset) are recorded, so each call
+            # updates the report the previous one stored.
+            day = max(1, scale // 30)
+            new_rows = dataset.new_sales(day * (iterations_for(scale) + 3))
+            days = iter(range(0, len(new_rows), day))
+
+            def call():
+                offset = next(days)
+                dataset.sales.extend(new_rows[offset:offset + day])
+                return analyst_tools.agent_analyze_sales_trends(
+                    fakes.BENCH_BUSINESS_ID, start_date="2025-05-01", end_date="2025-06-30")
+            return call
+
+        def setup_pricing(scale=scale):
+            install_fakes(fakes.FakeDataset(n_sales_rows=scale))
+            analyst_tools = _tool_modules()[0]
+            return lambda: analyst_tools.agent_provide_pricing_advice(fakes.BENCH_BUSINESS_ID, as_of_date="2025-06-01")
+
+        def setup_inventory(scale=scale):
+            install_fakes(fakes.FakeDataset(n_sales_rows=scale))
+            analyst_tools = _tool_modules()[0]
+            analyst_tools.fefo.clear_cache()
+            return lambda: analyst_tools.agent_check_inventory_levels(fakes.BENCH_BUSINESS_ID, as_of_date="2025-06-01")
+
+        def setup_expiring(scale=scale):
+            install_fakes(fakes.FakeDataset(n_sales_rows=scale))
+            analyst_tools = _tool_modules()[0]
+            analyst_tools.fefo.clear_cache()
+            return lambda: analyst_tools.agent_check_expiring_stock(fakes.BENCH_BUSINESS_ID, as_of_date="2025-06-01")
+
+        def setup_forecast(scale=scale):
+            install_fakes(fakes.FakeDataset(n_sales_rows=scale))
+            analyst_tools = _tool_modules()[0]
+            analyst_tools.forecasting.clear_cache()
+            return lambda: analyst_tools.agent_forecast_sales(fakes.BENCH_BUSINESS_ID, as_of_date="2025-06-01")
+
+        def setup_bundles(scale=scale):
+            dataset = fakes.FakeDataset(n_sales_rows=scale)
+            dataset.transaction_items  # build the line items outside the timed call
+            install_fakes(dataset)
+            analyst_tools = _tool_modules()[0]
+            return lambda: analyst_tools.agent_find_product_bundles(fakes.BENCH_BUSINESS_ID, as_of_date="2025-06-01")
+
+        def setup_anomalies(scale=scale):
+            install_fakes(fakes.FakeDataset(n_sales_rows=scale))
+            analyst_tools = _tool_modules()[0]
+            analyst_tools.anomalies.clear_cache()
+            return lambda: analyst_tools.agent_detect_sales_anomalies(fakes.BENCH_BUSINESS_ID, as_of_date="2025-06-01")
+
+        def setup_cube(scale=scale):
+            dataset = fakes.FakeDataset(n_sales_rows=scale)
+            dataset.sales_cube_rows  # aggregate the fake cube rows outside the timed call
+            install_fakes(dataset)
+            analyst_tools = _tool_modules()[0]
+            analyst_tools.cube.clear_cache()
+            return lambda: analyst_tools.agent_query_sales(
+                fakes.BENCH_BUSINESS_ID, group_by="weekday,hour", start_date="2025-05-01", end_date="2025-05-31")
+
+        def setup_cohorts(scale=scale):
+            dataset = fakes.FakeDataset(n_sales_rows=scale)
+            dataset.customer_purchases  # aggregate the fake customer days outside the timed call
+            install_fakes(dataset)
+            analyst_tools = _tool_modules()[0]
+            return lambda: analyst_tools.agent_analyze_customer_cohorts(
+                fakes.BENCH_BUSINESS_ID, period="week", as_of_date="2025-06-01")
+
+        def setup_health(scale=scale):
+            dataset = fakes.FakeDataset(n_sales_rows=scale)
+            dataset.sales_daily  # aggregate the fake daily rows outside the timed call
+            install_fakes(dataset)
+            analyst_tools = _tool_modules()[0]
+            analyst_tools.anomalies.clear_cache()
+            analyst_tools.fefo.clear_cache()
+            return lambda: analyst_tools.agent_business_health_report(fakes.BENCH_BUSINESS_ID, as_of_date="2025-06-01")
+
+        scenarios.append(Scenario("agent_analyze_sales_trends", scale, setup_trends, iterations_for(scale)))
+        scenarios.append(Scenario("agent_analyze_sales_trends (stored insight)", scale, setup_trends,
+                                  iterations_for(scale), stored_insights=True))
+        scenarios.append(Scenario("agent_analyze_sales_trends (update)", scale, setup_trends_update,
+                                  iterations_for(scale), stored_insights=True))
+        scenarios.append(Scenario("agent_provide_pricing_advice", scale, setup_pricing, iterations_for(scale)))
+        scenarios.append(Scenario("agent_check_inventory_levels", scale, setup_inventory, iterations_for(scale)))
+        scenarios.append(Scenario("agent_forecast_sales", scale, setup_forecast, iterations_for(scale)))
+        scenarios.append(Scenario("agent_check_expiring_stock", scale, setup_expiring, iterations_for(scale)))
+        scenarios.append(Scenario("agent_find_product_bundles", scale, setup_bundles, iterations_for(scale)))
+        scenarios.append(Scenario("agent_detect_sales_anomalies", scale, setup_anomalies, iterations_for(scale)))
+        scenarios.append(Scenario("agent_query_sales", scale, setup_cube, iterations_for(scale)))
+        scenarios.append(Scenario("agent_analyze_customer_cohorts", scale, setup_cohorts, iterations_for(scale)))
+        scenarios.append(Scenario("agent_business_health_report", scale, setup_health, iterations_for(scale)))
+
+    for scale in competitor_scales:
+        def setup_edge(scale=scale):
+            install_fakes(fakes.FakeDataset(n_competitors=scale))
+            comparison_tools = _tool_modules()[1]
+            return lambda: comparison_tools.agent_call_competitive_edge_analyst(fakes.BENCH_BUSINESS_ID)
+
+        def setup_maps(scale=scale):
+            install_fakes(fakes.FakeDataset(), n_search_results=scale)
+            onboarding_tools = _tool_modules()[2]
+            return lambda: onboarding_tools.Maps_search_business("Southern Maid Donuts Houston TX")
+
+        scenarios.append(Scenario("agent_call_competitive_edge_analyst", scale, setup_edge, 10))
+        scenarios.append(Scenario("Maps_search_business", scale, setup_maps, 10))
+
+    for scale in generated_scales:
+        def setup_generate(scale=scale):
+            dataset = fakes.FakeDataset()
+            install_fakes(dataset, json_payload=dataset.simulated_generation_payload(scale))
+            onboarding_tools = _tool_modules()[2]
+            # The tool only enqueues a job; measure the generation the job runs.
+            return lambda: onboarding_tools._generate_simulated_data(fakes.BENCH_BUSINESS_ID)
+
+        scenarios.append(Scenario("agent_generate_simulated_data", scale, setup_generate, iterations_for(scale)))
+
+    for scale in bulk_days:
+        def setup_bulk(scale=scale):
+            install_fakes(fakes.FakeDataset())
+            onboarding_tools = _tool_modules()[2]
+            return lambda: onboarding_tools.agent_generate_bulk_simulated_data(
+                fakes.BENCH_BUSINESS_ID, days=scale, transactions_per_day=300)
+
+        scenarios.append(Scenario("agent_generate_bulk_simulated_data", scale, setup_bulk, 3))
+
+    for scale in forecast_skus:
+        def setup_forecast_fit(scale=scale):
+            from PIAgent.sub_agents.business_analyst_agent import forecasting
+            y, start = fakes.daily_item_matrix(scale, days=365)
+            item_ids = [f"item_{i:05d}" for i in range(scale)]
+            return lambda: forecasting.forecast(forecasting.fit(y, item_ids, {}, start), 14)
+
+        scenarios.append(Scenario("forecasting.fit_and_forecast", scale, setup_forecast_fit, 3))
+
+        def setup_simulation(scale=scale):
+            import numpy as np
+            from PIAgent.sub_agents.business_analyst_agent import simulation
+            ones = np.ones(scale)
+            return lambda: simulation.simulate_price_changes(
+                ones * 3.0, ones, ones * 20, -1.2 * ones, 0.2 * ones, 0.3 * ones, 0.05 * ones,
+                days=30, n_simulations=max(1000, 5_000_000 // scale))
+
+        scenarios.append(Scenario("simulation.simulate_price_changes", scale, setup_simulation, 3))
+
+    for scale in review_scales:
+        def setup_output_budget(scale=scale):
+            from google.adk.tools import FunctionTool
+            from PIAgent.utils import tool_output
+            install_fakes(fakes.FakeDataset(reviews_per_entity=scale))
+            comparison_tools = _tool_modules()[1]
+            reviews = comparison_tools.db_get_processed_reviews(fakes.BENCH_BUSINESS_ID, entity_type="business")
+            tool = FunctionTool(comparison_tools.db_get_processed_reviews)
+            return lambda: tool_output.after_tool_callback(tool=tool, args={}, tool_context=None, tool_response=reviews)
+
+        scenarios.append(Scenario("tool_output (db_get_processed_reviews)", scale, setup_output_budget, 10))
+
+    for scale in history_turns:
+        def setup_compaction(scale=scale):
+            from google.adk.models.llm_request import LlmRequest
+            from PIAgent.utils import compaction
+            install_fakes(fakes.FakeDataset())
+            history = fakes.conversation_history(scale)
+            callback_context = fakes.FakeCallbackContext("business_analyst_agent")
+            # The first call writes the summary; later ones reuse it, as between two summaries.
+            return lambda: compaction.before_model_callback(
+                callback_context=callback_context, llm_request=LlmRequest(contents=list(history)))
+
+        scenarios.append(Scenario("compaction.before_model_callback", scale, setup_compaction, 10))
+
+        def setup_context_cache(scale=scale):
+            from google.genai import types
+            from google.adk.models.llm_request import LlmRequest
+            from google.adk.tools import FunctionTool
+            from PIAgent.sub_agents.business_analyst_agent.agent import business_analyst_agent
+            from PIAgent.utils import context_cache
+            install_fakes(fakes.FakeDataset())
+            instruction = business_analyst_agent.instruction
+            tools = [types.Tool(function_declarations=[
+                FunctionTool(tool)._get_declaration() for tool in business_analyst_agent.tools])]
+            history = fakes.conversation_history(scale)
+            callback_context = fakes.FakeCallbackContext(business_analyst_agent.name)
+
+            def call():
+                request = LlmRequest(model=constants.MODEL, contents=list(history), config=types.GenerateContentConfig(
+                    system_instruction=instruction, tools=tools))
+                context_cache.before_model_callback(callback_context=callback_context, llm_request=request)
+                return request
+
+            # Create the agent and session caches outside the timed calls, as later turns find them.
+            for _ in range(2):
+                call()
+                context_cache.wait_for_caches()
+            return call
+
+        scenarios.append(Scenario("context_cache.before_model_callback", scale, setup_context_cache, 10))
+
+    return scenarios
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def run_scenario(scenario: Scenario) -> Dict[str, Any]:
+    """Runs one scenario and returns its metrics."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), \
+            insights.batch_run("benchmark", force=not scenario.stored_insights):
+        call = scenario.setup()
+        gemini = api_clients.get_gemini_model()
+        if scenario.stored_insights:
+            call()   # stores the insight the measured calls read
+
+        # Warm-up call, also used to count prompt tokens for a single invocation.
+        gemini.reset()
+        call()
+        prompt_tokens = gemini.prompt_tokens
+        llm_calls = gemini.calls
+
+        latencies = []
+        for _ in range(scenario.iterations):
+            start = time.perf_counter()
+            call()
+            latencies.append((time.perf_counter() - start) * 1000.0)
+
+        tracemalloc.start()
+        try:
+            call()
+            _, peak_bytes = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(_percentile(latencies, 95), 3),
+        "peak_mem_kb": round(peak_bytes / 1024.0, 1),
+        "prompt_tokens": prompt_tokens,
+        "llm_calls": llm_calls,
+        "iterations": scenario.iterations,
+    }
+
+
+def compare_with_baseline(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+                          tolerance: float, min_delta_ms: float = 1.0) -> List[str]:
+    """
+    Returns a human readable line for every metric that regressed past `tolerance`.
+    Latency changes smaller than `min_delta_ms` are treated as timer noise.
+    """
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        for metric in ("p50_ms", "p95_ms", "peak_mem_kb", "prompt_tokens"):
+            before, after = previous.get(metric), current.get(metric)
+            if not before or after is None:
+                continue
+            if metric.endswith("_ms") and after - before < min_delta_ms:
+                continue
+            if after > before * (1.0 + tolerance):
+                regressions.append(f"{key} {metric}: {before} -> {after} (+{(after / before - 1.0) * 100:.0f}%)")
+    return regressions
+
+
+def load_baseline(path: str) -> Dict[str, Dict[str, Any]]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path: str, results: Dict[str, Dict[str, Any]]) -> None:
+    baseline = load_baseline(path)
+    baseline.update(results)
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def print_table(results: Dict[str, Dict[str, Any]]) -> None:
+    header = f"{'scenario':<48} {'p50 ms':>10} {'p95 ms':>10} {'peak KiB':>12} {'prompt tok':>12} {'llm':>4}"
+    print(header)
+    print("-" * len(header))
+    for key, m in results.items():
+        print(f"{key:<48} {m['p50_ms']:>10.2f} {m['p95_ms']:>10.2f} {m['peak_mem_kb']:>12.1f} "
+              f"{m['prompt_tokens']:>12} {m['llm_calls']:>4}")
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark ProfitPilot agent tools against local fakes.")
+    parser.add_argument("--sales-scales", type=_int_list, default=DEFAULT_SALES_SCALES,
+                        help="Comma separated sales_transaction row counts (default: 10,10000,1000000).")
+    parser.add_argument("--competitor-scales", type=_int_list, default=DEFAULT_COMPETITOR_SCALES,
+                        help="Comma separated competitor / search result counts (default: 5,50).")
+    parser.add_argument("--generated-scales", type=_int_list, default=DEFAULT_GENERATED_TRANSACTIONS,
+                        help="Comma separated transaction counts returned by the simulated-data LLM call.")
+    parser.add_argument("--bulk-days", type=_int_list, default=DEFAULT_BULK_DAYS,
+                        help="Comma separated day counts for the local bulk generator at 300 transactions/day.")
+    parser.add_argument("--forecast-skus", type=_int_list, default=DEFAULT_FORECAST_SKUS,
+                        help="Comma separated item counts for the forecasting and what-if simulation engines.")
+    parser.add_argument("--review-scales", type=_int_list, default=DEFAULT_REVIEW_SCALES,
+                        help="Comma separated review counts for the tool output budget on db_get_processed_reviews.")
+    parser.add_argument("--history-turns", type=_int_list, default=DEFAULT_HISTORY_TURNS,
+                        help="Comma separated conversation lengths (turns with a tool call) for history compaction.")
+    parser.add_argument("--tracing", action="store_true",
+                        help="Run with local tracing enabled (in-memory exporter) to measure its overhead.")
+    parser.add_argument("--only", default=None, help="Only run scenarios whose tool name contains this text.")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON file.")
+    parser.add_argument("--save-baseline", action="store_true", help="Write results into the baseline file.")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative regression before failing (default: 0.25).")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="Ignore latency regressions smaller than this many milliseconds (default: 1.0).")
+    args = parser.parse_args(argv)
+
+    if args.tracing:
+        tracing.configure_tracing("local", exporter=tracing.InMemoryExporter())
+
+    scenarios = build_scenarios(args.sales_scales, args.competitor_scales, args.generated_scales,
+                                args.bulk_days, args.forecast_skus, args.review_scales, args.history_turns)
+    if args.only:
+        scenarios = [s for s in scenarios if args.only in s.name]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep the tools' stored insights out of the working directory.
+        constants.INSIGHTS_DB_PATH = os.path.join(tmp, "insights.sqlite3")
+        for scenario in scenarios:
+            print(f"running {scenario.key} ...", file=sys.stderr)
+            results[scenario.key] = run_scenario(scenario)
+
+    print_table(results)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    regressions = compare_with_baseline(results, load_baseline(args.baseline), args.tolerance,
+                                        args.min_delta_ms)
+    if regressions:
+        print("\nRegressions against baseline:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Cold-start benchmark: `import PIAgent.agent` plus the first tool call.
+
+Each sample runs in a fresh interpreter so module caches are cold, the same
+way a serverless instance starts. External services are replaced by the
+fakes in `benchmarks.fakes`, so the first call still pays for the lazily
+imported SDK modules but not for network round trips.
+
+    python -m benchmarks.startup                    # check against the default budget
+    python -m benchmarks.startup --budget-ms 3000   # enforce a tighter budget
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import List, Optional
+
+# Cold start budget (import + first tool call, median of the samples).
+# Override with --budget-ms or PP_STARTUP_BUDGET_MS.
+DEFAULT_BUDGET_MS = float(os.getenv("PP_STARTUP_BUDGET_MS", "6000"))
+
+_PROBE = r"""
+import contextlib, json, os, time
+t0 = time.perf_counter()
+import PIAgent.agent
+t1 = time.perf_counter()
+from benchmarks import fakes
+from PIAgent.utils import api_clients
+from PIAgent.sub_agents.business_analyst_agent import tools
+dataset = fakes.FakeDataset()
+api_clients.override_clients(
+    bigquery_client=fakes.FakeBigQueryClient(dataset),
+    places_client=fakes.FakePlacesClient(dataset),
+    gemini_model=fakes.FakeGeminiModel(),
+)
+with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+    t2 = time.perf_counter()
+    tools.agent_check_inventory_levels(fakes.BENCH_BUSINESS_ID)
+    t3 = time.perf_counter()
+print(json.dumps({"import_ms": (t1 - t0) * 1000.0, "first_call_ms": (t3 - t2) * 1000.0}))
+"""
+
+
+def measure_once() -> dict:
+    """Runs the probe in a fresh interpreter and returns its timings."""
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    completed = subprocess.run(
+        [sys.executable, "-c", _PROBE],
+        cwd=repo_root, capture_output=True, text=True, check=True,
+    )
+    # Import-time prints from the agent may precede the JSON line.
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure agent cold start (import + first tool call).")
+    parser.add_argument("--samples", type=int, default=5, help="Number of fresh interpreters to start (default: 5).")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help=f"Fail if the median total exceeds this (default: {DEFAULT_BUDGET_MS:.0f}).")
+    args = parser.parse_args(argv)
+
+    samples = [measure_once() for _ in range(args.samples)]
+    import_ms = statistics.median(s["import_ms"] for s in samples)
+    first_call_ms = statistics.median(s["first_call_ms"] for s in samples)
+    total_ms = statistics.median(s["import_ms"] + s["first_call_ms"] for s in samples)
+
+    print(f"import PIAgent.agent : {import_ms:9.1f} ms")
+    print(f"first tool call      : {first_call_ms:9.1f} ms")
+    print(f"total (median)       : {total_ms:9.1f} ms   budget {args.budget_ms:.0f} ms")
+
+    if total_ms > args.budget_ms:
+        print("Cold start is over budget.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())